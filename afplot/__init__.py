@@ -6,6 +6,17 @@ afplot
 :license: MIT
 """
 
-import matplotlib
-matplotlib.use('Agg')
-from .afplot import *
+from importlib import import_module
+
+
+def __getattr__(name):
+    # names of the legacy afplot.afplot module are loaded on first use,
+    # so that importing the package (and the command line) stays fast
+    if name.startswith("__"):
+        raise AttributeError(name)
+    legacy = import_module(".afplot", __name__)
+    try:
+        return getattr(legacy, name)
+    except AttributeError:
+        raise AttributeError("module {0!r} has no attribute "
+                             "{1!r}".format(__name__, name))
@@ -12,8 +12,8 @@ import re
 import seaborn as sns
 import vcf
 
-from .utils import _is_vcf_version_at_least_0_6_8, \
-    NEW_VCF, get_longest_contig_list
+from .reader import NEW_VCF
+from .utils import _is_vcf_version_at_least_0_6_8, get_longest_contig_list
 from .variation import get_all_allele_freqs, \
     get_variant_type, get_distance_to_exp
 from .whole_genome import get_array_for_chrom_all, build_dataframe, \
@@ -0,0 +1,149 @@
+"""
+afplot.cache
+~~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+
+import hashlib
+import json
+import os
+from os.path import abspath, exists, join
+from tempfile import NamedTemporaryFile
+
+import numpy as np
+
+from .columns import AlleleTable
+
+# bump when the layout of cached tables changes
+CACHE_VERSION = 1
+INDEX_SUFFIXES = (".tbi", ".csi")
+
+
+def _file_signature(path):
+    """
+    Get a signature of a file that changes when the file changes
+    :param path: path to file
+    :return: list of [path, size, mtime], or None if path does not exist
+    """
+    if not exists(path):
+        return None
+    stat = os.stat(path)
+    return [abspath(path), stat.st_size, stat.st_mtime_ns]
+
+
+class TableCache(object):
+    """
+    Persistent cache of extracted AlleleTables.
+
+    Every table is stored as an uncompressed .npz file in `directory`,
+    keyed on the VCF file and its index (path, size and mtime),
+    the contig, the sample, the label and any extraction options.
+    When the total size exceeds `max_size` bytes,
+    least recently used tables are removed.
+    """
+
+    def __init__(self, directory, max_size=None):
+        """
+        :param directory: cache directory. Created if it does not exist
+        :param max_size: maximum size of the cache in bytes
+        """
+        self.directory = directory
+        self.max_size = max_size
+        if not exists(directory):
+            os.makedirs(directory)
+
+    def key(self, path, chromosome, sample, label, **options):
+        """
+        Compute cache key of an extracted table
+        :param path: path to VCF file
+        :param chromosome: contig name
+        :param sample: sample name
+        :param label: label of table, or None for call types
+        :param options: any other options influencing extraction
+        :return: hex digest
+        """
+        description = {
+            "version": CACHE_VERSION,
+            "vcf": _file_signature(path),
+            "index": [_file_signature(path + x) for x in INDEX_SUFFIXES],
+            "chromosome": chromosome,
+            "sample": sample,
+            "label": label,
+            "options": options
+        }
+        blob = json.dumps(description, sort_keys=True).encode("utf-8")
+        return hashlib.sha1(blob).hexdigest()
+
+    def _path(self, key):
+        return join(self.directory, "{0}.npz".format(key))
+
+    def get(self, path, chromosome, sample, label, **options):
+        """
+        Get a cached table
+        :return: AlleleTable, or None if not in cache
+        """
+        fpath = self._path(self.key(path, chromosome, sample,
+                                    label, **options))
+        try:
+            with np.load(fpath, allow_pickle=False) as data:
+                table = AlleleTable([str(x) for x in data["labels"]],
+                                    capacity=len(data["pos"]))
+                table.extend(data["pos"], data["af"],
+                             data["code"], data["distance"])
+        except (IOError, OSError, KeyError, ValueError):
+            return None
+        # mark as recently used
+        os.utime(fpath, None)
+        return table
+
+    def put(self, path, chromosome, sample, label, table, **options):
+        """
+        Store a table in the cache and evict old tables if needed
+        """
+        fpath = self._path(self.key(path, chromosome, sample,
+                                    label, **options))
+        with NamedTemporaryFile(dir=self.directory, suffix=".tmp",
+                                delete=False) as handle:
+            np.savez(handle,
+                     labels=np.array(table.labels, dtype=str),
+                     pos=table.pos, af=table.af,
+                     code=table.code, distance=table.distance)
+        os.replace(handle.name, fpath)
+        self.evict()
+
+    def entries(self):
+        """
+        List cached tables
+        :return: list of (path, size, mtime), least recently used first
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".npz"):
+                continue
+            fpath = join(self.directory, name)
+            try:
+                stat = os.stat(fpath)
+            except OSError:
+                continue
+            entries.append((fpath, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda x: x[2])
+
+    def size(self):
+        return sum(x[1] for x in self.entries())
+
+    def evict(self):
+        """Remove least recently used tables until cache fits max_size"""
+        if self.max_size is None:
+            return
+        entries = self.entries()
+        total = sum(x[1] for x in entries)
+        for fpath, size, _ in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(fpath)
+            except OSError:
+                continue
+            total -= size
@@ -7,15 +7,18 @@ afplot.cli
 """
 
 import re
+from contextlib import contextmanager
+from functools import wraps
 
 import click
-import seaborn as sns
-import vcf
 
-from .utils import Region, get_contigs, bed_reader
-from .whole_genome import histogram_main, scatter_main, distance_main
-from .region import region_histogram_main, \
-    region_scatter_main, region_distance_main
+# modules depending on numpy, pandas, matplotlib, seaborn, pysam or PyVCF
+# are imported by the commands using them, so that --help and
+# usage errors do not pay for loading them
+from .constants import BACKENDS, CALL_TYPES, KINDS, RENDERERS
+from .profiling import profiling
+from .utils import Region, get_contigs, bed_reader, exclude_contigs, \
+    drop_empty_contigs, contig_sizes, group_small_contigs, facet_order
 
 
 def validate_region_str(ctx, param, value):
@@ -32,7 +35,20 @@ def validate_region_str(ctx, param, value):
                                  'valid region string'.format(value))
 
 
-shared_options_all = [
+profile_options = [
+    click.option("--profile",
+                 type=click.Path(dir_okay=False),
+                 help="Write a JSON report of wall time, CPU time and peak "
+                      "memory of every stage, contig and region to this "
+                      "path. Memory tracing slows down the run"),
+    click.option("--cprofile",
+                 type=click.Path(dir_okay=False),
+                 help="Write a cProfile dump of the command to this path, "
+                      "readable with pstats")
+]
+
+
+shared_options_all = profile_options + [
     click.option("--dpi",
                  type=int,
                  help="DPI for output PNGs (default: 300)",
@@ -44,12 +60,56 @@ shared_options_all = [
 ]
 
 
+backend_option = click.option(
+    "--backend",
+    type=click.Choice(BACKENDS),
+    default="pysam",
+    help="Library used to read VCF files (default: pysam)"
+)
+
+
+table_option = click.option(
+    "--table",
+    "-t",
+    type=click.Path(exists=True),
+    help="Path to table created with `afplot extract`. "
+         "Can be used instead of a VCF file"
+)
+
+
+filter_options = [
+    click.option("--min-depth",
+                 type=click.IntRange(min=0),
+                 help="Only use calls with at least this total AD depth"),
+    click.option("--min-gq",
+                 type=click.IntRange(min=0),
+                 help="Only use calls with at least this genotype quality. "
+                      "Calls without GQ are not used"),
+    click.option("--pass-only",
+                 is_flag=True,
+                 help="Only use records of which FILTER is PASS"),
+    click.option("--call-type",
+                 type=click.Choice(CALL_TYPES),
+                 multiple=True,
+                 help="Only use calls of this type. May be repeated "
+                      "(default: all call types)"),
+    click.option("--snv-only",
+                 is_flag=True,
+                 help="Only use records of which all alleles are "
+                      "single bases"),
+    click.option("--biallelic-only",
+                 is_flag=True,
+                 help="Only use records with a single alternative allele")
+]
+
+
 shared_options_regions = shared_options_all + [
+    backend_option,
     click.option("--vcf",
                  "-v",
                  type=click.Path(exists=True),
-                 required=True,
                  help="Path to input VCF file"),
+    table_option,
     click.option("--output-dir",
                  "-o",
                  type=click.Path(exists=True),
@@ -71,21 +131,26 @@ shared_options_regions = shared_options_all + [
                  "-m",
                  type=int,
                  help="Margin around regions to plot",
-                 default=0)
-]
-
-
-shared_options_genome = shared_options_all + [
+                 default=0),
+    click.option("--jobs",
+                 "-j",
+                 type=click.IntRange(min=1),
+                 default=1,
+                 help="Number of processes used to plot regions "
+                      "(default: 1)")
+] + filter_options
+
+
+shared_options_extract = [
+    backend_option,
     click.option("--vcf",
                  "-v",
                  type=click.Path(exists=True),
-                 required=True,
                  multiple=True,
                  help="Path(s) to input VCF file(s)"),
     click.option("--label",
                  "-l",
                  type=str,
-                 required=True,
                  multiple=True,
                  help="Label(s) to VCF file(s)"),
     click.option("--sample",
@@ -93,20 +158,120 @@ shared_options_genome = shared_options_all + [
                  type=str,
                  multiple=True,
                  help="Sample name(s) of VCF file(s). "
-                      "If not given, will use fist sample in each VCF File"),
+                      "If not given, will use fist sample in each VCF File. "
+                      "If only one VCF file is given, multiple samples "
+                      "are read from it in a single pass"),
     click.option("--exclude-pattern",
                  "-e",
                  type=str,
                  multiple=True,
                  help="Regex pattern(s) to exclude from contig list"),
-    click.option("--output",
-                 "-o",
-                 type=click.Path(exists=False),
-                 required=True,
-                 help="Path to output file")
+    click.option("--threads",
+                 "-j",
+                 type=click.IntRange(min=1),
+                 default=1,
+                 help="Number of processes used to read contigs (default: 1)"),
+    click.option("--chunk-size",
+                 type=click.IntRange(min=1),
+                 help="With multiple threads, split contigs into "
+                      "windows of this many bases, so that large contigs "
+                      "are read in parallel"),
+    click.option("--cache-dir",
+                 type=click.Path(file_okay=False),
+                 help="Directory to cache extracted allele frequencies in. "
+                      "Every whole-genome command (histogram, scatter, "
+                      "distance and all) and extract fill and read the "
+                      "same cache, so a VCF is only parsed once for all "
+                      "of them. Region commands do not use the cache"),
+    click.option("--cache-size",
+                 type=click.IntRange(min=0),
+                 default=10240,
+                 help="Maximum size of the cache directory in MB. "
+                      "Least recently used entries are removed "
+                      "(default: 10240)")
+] + filter_options
+
+
+output_option = click.option(
+    "--output",
+    "-o",
+    type=click.Path(exists=False),
+    required=True,
+    help="Path to output file"
+)
+
+
+shared_options_genome = shared_options_all + shared_options_extract + [
+    table_option,
+    output_option
+]
+
+
+renderer_option = click.option(
+    "--renderer",
+    type=click.Choice(RENDERERS),
+    default="raster",
+    help="How to draw points. 'raster' draws binned point counts as an "
+         "image, which is fast for any number of variants. 'points' draws "
+         "every variant as a marker (default: raster)"
+)
+
+
+plot_option = click.option(
+    "--plot",
+    "-p",
+    type=click.Choice(KINDS),
+    multiple=True,
+    help="Kind of plot to write. May be repeated "
+         "(default: histogram, scatter and distance)"
+)
+
+
+kde_only_option = click.option(
+    "--kde-only",
+    "-k",
+    is_flag=True,
+    help="Only show kernel density plot"
+)
+
+
+max_points_options = [
+    click.option("--max-points-per-contig",
+                 type=click.IntRange(min=1),
+                 help="Plot at most this many points per contig (or per "
+                      "region), using a label-stratified random sample. "
+                      "Limits memory use and drawing time"),
+    click.option("--seed",
+                 type=int,
+                 default=0,
+                 help="Seed of the sample of --max-points-per-contig. "
+                      "The same seed and input give the same plot "
+                      "(default: 0)")
 ]
 
 
+contig_group_options = [
+    click.option("--min-contig-length",
+                 type=click.IntRange(min=1),
+                 help="Plot contigs shorter than this many bases together "
+                      "in one combined 'other' panel"),
+    click.option("--min-contig-records",
+                 type=click.IntRange(min=1),
+                 help="Plot contigs with fewer VCF records (or table rows) "
+                      "than this together in one combined 'other' panel. "
+                      "Records are counted from the tabix or CSI index")
+]
+
+
+memory_limit_option = click.option(
+    "--memory-limit",
+    type=click.IntRange(min=1),
+    help="Maximum memory in MB used to hold extracted allele frequencies. "
+         "Beyond this, they are kept in temporary files on disk "
+         "(default: no limit)"
+)
+
+
 def generic_option(options):
     """
     Decorator to add generic options to Click CLI's
@@ -121,25 +286,159 @@ def generic_option(options):
     return __generic_option
 
 
+def profiled(func):
+    """
+    Decorator running a command under the profiler
+    requested with profile_options
+    :param func: command function taking **kwargs
+    :return: decorated function
+    """
+    @wraps(func)
+    def __profiled(**kwargs):
+        with profiling(kwargs.pop("profile", None),
+                       kwargs.pop("cprofile", None)):
+            return func(**kwargs)
+    return __profiled
+
+
+def _set_palette(palette, n_colors):
+    if palette is not None:
+        import seaborn as sns
+        sns.set_palette(palette, n_colors)
+
+
 def _setup_genome_values(**kwargs):
     """Setup values used for whole-genome plotting."""
-    readers = [vcf.Reader(filename=x) for x in kwargs.get("vcf", [])]
-    contigs = get_contigs(readers, kwargs.get("exclude_pattern", []))
+    from .reader import open_reader
+    if len(kwargs.get("vcf", [])) == 0:
+        raise click.UsageError("At least one VCF file is required")
+    if len(kwargs.get("label", [])) == 0:
+        raise click.UsageError("At least one label is required")
+    backend = kwargs.get("backend", "pysam")
+    readers = [open_reader(x, backend) for x in kwargs.get("vcf", [])]
+    # contigs without records in the index are never fetched
+    contigs = drop_empty_contigs(
+        get_contigs(readers, kwargs.get("exclude_pattern", [])), readers)
     if len(kwargs.get('sample', [])) == 0:
         samples = [x.samples[0] for x in readers]
     else:
         samples = kwargs.get('sample', [])
-    if kwargs.get('color_palette') is not None:
-        if len(samples) == 1:
-            sns.set_palette(kwargs.get('color_palette'), 4)
-        else:
-            sns.set_palette(kwargs.get('color_palette'), len(samples))
+        if len(readers) == 1:
+            # samples of one VCF file are extracted in a single pass
+            readers = readers * len(samples)
+    if len(samples) == 1:
+        _set_palette(kwargs.get('color_palette'), 4)
+    else:
+        _set_palette(kwargs.get('color_palette'), len(samples))
     return readers, contigs, samples
 
 
+def _call_filter(**kwargs):
+    """
+    Setup the filter of calls applied while reading VCF files.
+    :return: CallFilter, or None if no filter option is given
+    """
+    from .variation import CallFilter, is_active
+    call_filter = CallFilter(
+        min_depth=kwargs.get("min_depth"),
+        min_gq=kwargs.get("min_gq"),
+        pass_only=kwargs.get("pass_only", False),
+        call_types=tuple(kwargs.get("call_type") or ()) or None,
+        snv_only=kwargs.get("snv_only", False),
+        biallelic_only=kwargs.get("biallelic_only", False)
+    )
+    if not is_active(call_filter):
+        return None
+    if kwargs.get("table") is not None:
+        raise click.UsageError("Filter options only apply to VCF files, "
+                               "not to --table")
+    return call_filter
+
+
+def _genome_options(**kwargs):
+    """Setup keyword arguments controlling whole-genome extraction."""
+    from .cache import TableCache
+    cache = None
+    if kwargs.get("cache_dir") is not None:
+        cache = TableCache(kwargs.get("cache_dir"),
+                           kwargs.get("cache_size", 10240) * 1024 * 1024)
+    return {
+        "threads": kwargs.get("threads", 1),
+        "chunk_size": kwargs.get("chunk_size"),
+        "cache": cache,
+        "call_filter": _call_filter(**kwargs)
+    }
+
+
+def _genome_facets(contigs, lengths, counts, **kwargs):
+    """Get facets of contigs grouped by their length or number of records"""
+    return group_small_contigs(contigs, lengths, counts,
+                               min_length=kwargs.get("min_contig_length"),
+                               min_records=kwargs.get("min_contig_records"))
+
+
+@contextmanager
+def _genome_source(kinds, **kwargs):
+    """
+    Get data and contigs for whole-genome plotting.
+    Data of VCF files is extracted into an AlleleStore holding
+    only the columns needed by the plot kinds, which is closed
+    when the context exits; data of a table is read as a dataframe.
+    Yielded contigs are facets: contigs grouped by
+    --min-contig-length or --min-contig-records are
+    replaced by a single 'other' facet.
+    With --max-points-per-contig, histograms are counted from all
+    observations and yielded next to the sampled data;
+    otherwise no histograms are yielded.
+    """
+    from .columns import as_categorical, histograms_from_dataframe
+    from .sampling import downsample_dataframe
+    from .table import read_table, table_contigs
+    from .whole_genome import build_store, kind_columns
+    table = kwargs.get("table")
+    max_points = kwargs.get("max_points_per_contig")
+    if table is None:
+        readers, contigs, samples = _setup_genome_values(**kwargs)
+        facets = _genome_facets(contigs, *contig_sizes(readers), **kwargs)
+        memory_limit = kwargs.get("memory_limit")
+        if memory_limit is not None:
+            memory_limit *= 1024 * 1024
+        store = build_store(readers, kwargs.get("label", []), samples,
+                            contigs, memory_limit=memory_limit,
+                            max_points=max_points, seed=kwargs.get("seed", 0),
+                            columns=kind_columns(kinds),
+                            histograms="histogram" in kinds, facets=facets,
+                            **_genome_options(**kwargs))
+        with store:
+            yield store, facet_order(contigs, facets), store.histograms
+        return
+    if len(kwargs.get("vcf", [])) > 0:
+        raise click.UsageError("--vcf and --table are mutually exclusive")
+    _call_filter(**kwargs)
+    contigs = exclude_contigs(table_contigs(table),
+                              kwargs.get("exclude_pattern", []))
+    df = read_table(table, contigs)
+    # tables have no contig lengths; only row counts are used
+    facets = _genome_facets(contigs, None,
+                            df.chromosome.value_counts().to_dict(),
+                            **dict(kwargs, min_contig_length=None))
+    if facets:
+        df["chromosome"] = as_categorical(
+            df.chromosome.astype(str).map(lambda c: facets.get(c, c)))
+        contigs = facet_order(contigs, facets)
+    hists = None
+    if max_points is not None:
+        if "histogram" in kinds:
+            hists = histograms_from_dataframe(df, contigs)
+        df = downsample_dataframe(df, max_points, kwargs.get("seed", 0))
+    _set_palette(kwargs.get('color_palette'), max(df.label.nunique(), 4))
+    yield df, contigs, hists
+
+
 def _setup_region_values(**kwargs):
     """Setup values for region plotting."""
-    reader = vcf.Reader(filename=kwargs.get("vcf"))
+    from .reader import open_reader
+    from .table import read_table
     region = kwargs.get("region")
     region_file = kwargs.get("region_file")
     margin = kwargs.get("margin", 0)
@@ -150,6 +449,17 @@ def _setup_region_values(**kwargs):
         nrs = bed_reader(region_file, margin)
     else:
         nrs = []
+    if kwargs.get("table") is not None:
+        if kwargs.get("vcf") is not None:
+            raise click.UsageError("--vcf and --table are mutually exclusive")
+        _call_filter(**kwargs)
+        nrs = list(nrs)
+        reader = read_table(kwargs.get("table"), set(x.chr for x in nrs))
+    elif kwargs.get("vcf") is not None:
+        reader = open_reader(kwargs.get("vcf"),
+                             kwargs.get("backend", "pysam"))
+    else:
+        raise click.UsageError("Either --vcf or --table is required")
     return reader, nrs
 
 
@@ -161,7 +471,8 @@ def cli_whole_genome(**kwargs):
     If only one VCF is supplied, plots will be colored
     on call type (het/hom_ref/hom_alt).
     If multiple VCF files are supplied, plots will be colored per file/label.
-    Only *one* sample per VCF file can be plotted.
+    Multiple samples of a single multi-sample VCF can be plotted by
+    supplying one VCF and repeating the -s parameter, once per label.
 
     Your VCF file *MUST* contain an AD column in the FORMAT field.
     Your VCF file *MUST* have contig names and lengths placed in the header.
@@ -174,55 +485,112 @@ def cli_whole_genome(**kwargs):
 
     You may exclude contigs by supplying a regex pattern to the -e parameter.
     This parameter may be repeated.
+
+    Instead of VCF files, a table created with `afplot extract` may be
+    supplied with the -t parameter.
     """
     pass
 
 
-@click.option("--kde-only", "-k", is_flag=True,
-              help="Only show kernel density plot")
-@generic_option(shared_options_genome)
+@kde_only_option
+@generic_option(shared_options_genome + contig_group_options)
 @click.command(short_help="Whole-genome histogram")
+@profiled
 def whole_genome_histogram(**kwargs):
     """Create histograms over every chromosome."""
+    from .whole_genome import build_histograms, plot_histogram, \
+        plot_histogram_counts
+    if kwargs.get("table") is not None:
+        with _genome_source(["histogram"], **kwargs) as (df, contigs, _):
+            plot_histogram(df, contigs, kwargs.get('output'),
+                           dpi=kwargs.get('dpi', 300),
+                           kde_only=kwargs.get('kde_only', False))
+        return
+    # only binned counts are kept while streaming the VCF files
     readers, contigs, samples = _setup_genome_values(**kwargs)
-    labels = kwargs.get('label', [])
-    dpi = kwargs.get('dpi', None)
-    kde = kwargs.get('kde-only', False)
-    output = kwargs.get('output')
-    if dpi is None:
-        histogram_main(readers, labels, samples,
-                       contigs, output, kde_only=kde)
-    else:
-        histogram_main(readers, labels, samples,
-                       contigs, output, kde_only=kde, dpi=dpi)
-
-
-@generic_option(shared_options_genome)
+    facets = _genome_facets(contigs, *contig_sizes(readers), **kwargs)
+    hists = build_histograms(readers, kwargs.get("label", []), samples,
+                             contigs, facets=facets,
+                             **_genome_options(**kwargs))
+    plot_histogram_counts(hists, kwargs.get('output'),
+                          dpi=kwargs.get('dpi', 300),
+                          kde_only=kwargs.get('kde_only', False))
+
+
+@renderer_option
+@memory_limit_option
+@generic_option(shared_options_genome + max_points_options +
+                contig_group_options)
 @click.command(short_help="Whole-genome scatter plot")
+@profiled
 def whole_genome_scatter(**kwargs):
     """Create scatter plot of allele frequencies over every chromosome."""
-    readers, contigs, samples = _setup_genome_values(**kwargs)
-    labels = kwargs.get('label', [])
-    dpi = kwargs.get('dpi', None)
-    output = kwargs.get('output')
-    if dpi is None:
-        scatter_main(readers, labels, samples, contigs, output)
-    else:
-        scatter_main(readers, labels, samples, contigs, output, dpi=dpi)
+    from .whole_genome import plot_scatter
+    with _genome_source(["scatter"], **kwargs) as (df, _, _):
+        plot_scatter(df, kwargs.get('output'), dpi=kwargs.get('dpi', 300),
+                     renderer=kwargs.get('renderer', 'raster'))
 
 
-@generic_option(shared_options_genome)
+@renderer_option
+@memory_limit_option
+@generic_option(shared_options_genome + max_points_options +
+                contig_group_options)
 @click.command(short_help="Whole-genome distance plot")
+@profiled
 def whole_genome_distance(**kwargs):
     """Create scatter plot distance to theoretical AF over very chromosome."""
+    from .whole_genome import plot_distance
+    with _genome_source(["distance"], **kwargs) as (df, _, _):
+        plot_distance(df, kwargs.get('output'), dpi=kwargs.get('dpi', 300),
+                      renderer=kwargs.get('renderer', 'raster'))
+
+
+@plot_option
+@kde_only_option
+@renderer_option
+@memory_limit_option
+@generic_option(shared_options_genome + max_points_options +
+                contig_group_options)
+@click.command(short_help="All whole-genome plots")
+@profiled
+def whole_genome_all(**kwargs):
+    """
+    Create several kinds of plots over every chromosome,
+    extracting allele frequencies only once.
+
+    Every plot is written to the output path with its kind inserted
+    before the extension, e.g. plot.png becomes plot.histogram.png,
+    plot.scatter.png and plot.distance.png.
+    """
+    from .whole_genome import plot_kinds
+    kinds = kwargs.get('plot') or KINDS
+    with _genome_source(kinds, **kwargs) as (df, contigs, hists):
+        plot_kinds(df, contigs, kwargs.get('output'), kinds=kinds,
+                   dpi=kwargs.get('dpi', 300),
+                   renderer=kwargs.get('renderer', 'raster'),
+                   kde_only=kwargs.get('kde_only', False), hists=hists)
+
+
+@generic_option(profile_options + shared_options_extract + [output_option])
+@click.command(short_help="Extract allele frequencies to a table")
+@profiled
+def extract(**kwargs):
+    """
+    Extract allele frequencies of VCF file(s) to a table.
+
+    The table is written as Parquet, with one row group per contig,
+    or as Feather if the output path ends in .feather or .arrow.
+    It can be plotted with the --table parameter of the whole-genome
+    and regions commands. Requires pyarrow.
+
+    VCF files, labels and samples are given as for whole-genome plots.
+    """
+    from .table import write_table
+    from .whole_genome import iter_dataframes
     readers, contigs, samples = _setup_genome_values(**kwargs)
-    labels = kwargs.get('label', [])
-    dpi = kwargs.get('dpi', None)
-    output = kwargs.get('output')
-    if dpi is None:
-        distance_main(readers, labels, samples, contigs, output)
-    else:
-        distance_main(readers, labels, samples, contigs, output, dpi=dpi)
+    frames = iter_dataframes(readers, kwargs.get("label", []), samples,
+                             contigs, **_genome_options(**kwargs))
+    write_table(frames, kwargs.get("output"))
 
 
 @click.group(short_help="Region plots")
@@ -235,16 +603,20 @@ def cli_regions(**kwargs):
     Your VCF file *MUST* contain an AD column in the FORMAT field.
     Your VCF file *MUST* have contig names and lengths placed in the header.
     Your VCF file *MUST* be indexed with tabix.
+
+    Instead of a VCF file, a table created with `afplot extract` may be
+    supplied with the -t parameter.
     """
     pass
 
 
-@click.option("--kde-only", "-k", is_flag=True,
-              help="Only show kernel density plot")
+@kde_only_option
 @generic_option(shared_options_regions)
 @click.command(short_help="Region histogram")
+@profiled
 def region_histogram(**kwargs):
     """Create histograms of allele frequencies over every region."""
+    from .region import region_histogram_main
     reader, regions = _setup_region_values(**kwargs)
     region_histogram_main(
         reader,
@@ -252,35 +624,76 @@ def region_histogram(**kwargs):
         regions,
         kwargs.get("name"),
         kwargs.get("dpi"),
-        kwargs.get("kde-only")
+        kwargs.get("kde_only", False),
+        jobs=kwargs.get("jobs", 1),
+        call_filter=_call_filter(**kwargs)
     )
 
 
-@generic_option(shared_options_regions)
+@generic_option(shared_options_regions + max_points_options)
 @click.command(short_help="Region scatter plot")
+@profiled
 def region_scatter(**kwargs):
     """Create scatter plot of allele frequencies over every region."""
+    from .region import region_scatter_main
     reader, regions = _setup_region_values(**kwargs)
     region_scatter_main(
         reader,
         kwargs.get("output_dir"),
         regions,
         kwargs.get("name"),
-        kwargs.get("dpi")
+        kwargs.get("dpi"),
+        jobs=kwargs.get("jobs", 1),
+        max_points=kwargs.get("max_points_per_contig"),
+        seed=kwargs.get("seed", 0),
+        call_filter=_call_filter(**kwargs)
     )
 
 
-@generic_option(shared_options_regions)
+@generic_option(shared_options_regions + max_points_options)
 @click.command(short_help="Region distance plot")
+@profiled
 def region_distance(**kwargs):
     """Create scatter plot of distance to theoretical AF over every region."""
+    from .region import region_distance_main
     reader, regions = _setup_region_values(**kwargs)
     region_distance_main(
         reader,
         kwargs.get("output_dir"),
         regions,
         kwargs.get("name"),
-        kwargs.get("dpi")
+        kwargs.get("dpi"),
+        jobs=kwargs.get("jobs", 1),
+        max_points=kwargs.get("max_points_per_contig"),
+        seed=kwargs.get("seed", 0),
+        call_filter=_call_filter(**kwargs)
+    )
+
+
+@plot_option
+@kde_only_option
+@generic_option(shared_options_regions)
+@click.command(short_help="All region plots")
+@profiled
+def region_all(**kwargs):
+    """
+    Create several kinds of plots for every region,
+    extracting allele frequencies only once.
+
+    Plots are written as <region>.<kind>.png in the output directory.
+    """
+    from .region import region_all_main
+    reader, regions = _setup_region_values(**kwargs)
+    region_all_main(
+        reader,
+        kwargs.get("output_dir"),
+        regions,
+        kwargs.get("name"),
+        kwargs.get("plot") or KINDS,
+        kwargs.get("dpi"),
+        kwargs.get("kde_only", False),
+        jobs=kwargs.get("jobs", 1),
+        call_filter=_call_filter(**kwargs)
     )
 
 
@@ -295,6 +708,10 @@ def cli():
         user-specified region.
       - whole-genome: Plot histogram, scatter or distance plots over the
         entire genome.
+
+    \b
+    Allele frequencies may also be extracted once to a table with
+    `extract`, and plotted from that table with either mode.
     """
     pass
 
@@ -303,11 +720,14 @@ def _setup_cli():
     cli_regions.add_command(region_histogram, "histogram")
     cli_regions.add_command(region_scatter, "scatter")
     cli_regions.add_command(region_distance, "distance")
+    cli_regions.add_command(region_all, "all")
     cli_whole_genome.add_command(whole_genome_histogram, "histogram")
     cli_whole_genome.add_command(whole_genome_scatter, "scatter")
     cli_whole_genome.add_command(whole_genome_distance, "distance")
+    cli_whole_genome.add_command(whole_genome_all, "all")
     cli.add_command(cli_regions, "regions")
     cli.add_command(cli_whole_genome, "whole-genome")
+    cli.add_command(extract, "extract")
 
 
 def main():
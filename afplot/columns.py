@@ -0,0 +1,366 @@
+"""
+afplot.columns
+~~~~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from .kde import KDE_GRID, linear_binning
+
+POS_DTYPE = np.int32
+AF_DTYPE = np.float32
+DISTANCE_DTYPE = np.float32
+CODE_DTYPE = np.int8
+
+# number of equally sized allele frequency bins on [0, 1]
+HISTOGRAM_BINS = 50
+
+# histogram counts and linearly binned KDE weights of one label
+BinnedFrequencies = namedtuple("BinnedFrequencies", ["counts", "grid"])
+
+
+def _flatten_matrix(pos, counts, af, code, distance):
+    """
+    Flatten records with a variable number of alleles to one row per allele
+    :return: tuple of (pos, af, code, distance) arrays
+    """
+    mask = np.arange(af.shape[1])[None, :] < counts[:, None]
+    if np.ndim(code) > 0:
+        code = np.repeat(code, counts)
+    return np.repeat(pos, counts), af[mask], code, distance[mask]
+
+
+class AlleleTable(object):
+    """
+    Growable typed columns of per-allele observations.
+
+    Positions are stored as int32, allele frequencies and distances
+    as float32, and the call type or label of every observation as a
+    small integer code indexing into `labels`.
+    Storage is preallocated and doubled when full, so appending
+    does not create a Python object per observation.
+    """
+
+    def __init__(self, labels, capacity=4096):
+        """
+        :param labels: sequence of label names the codes refer to
+        :param capacity: initial number of rows to allocate
+        """
+        self.labels = tuple(labels)
+        self._size = 0
+        capacity = max(int(capacity), 1)
+        self._pos = np.empty(capacity, dtype=POS_DTYPE)
+        self._af = np.empty(capacity, dtype=AF_DTYPE)
+        self._code = np.empty(capacity, dtype=CODE_DTYPE)
+        self._distance = np.empty(capacity, dtype=DISTANCE_DTYPE)
+
+    def __len__(self):
+        return self._size
+
+    def __getstate__(self):
+        # only ship the filled part of the buffers between processes
+        state = self.__dict__.copy()
+        for attr in ("_pos", "_af", "_code", "_distance"):
+            state[attr] = state[attr][:self._size].copy()
+        return state
+
+    @classmethod
+    def concatenate(cls, tables):
+        """
+        Concatenate tables sharing the same labels
+        :param tables: non-empty list of AlleleTable
+        :return: AlleleTable
+        """
+        labels = tables[0].labels
+        assert all(t.labels == labels for t in tables)
+        table = cls(labels, capacity=sum(len(t) for t in tables))
+        for t in tables:
+            table.extend(t.pos, t.af, t.code, t.distance)
+        return table
+
+    def _reserve(self, n):
+        """Make sure there is room for n more rows"""
+        needed = self._size + n
+        if needed <= len(self._pos):
+            return
+        capacity = max(len(self._pos), 1)
+        while capacity < needed:
+            capacity *= 2
+        for attr in ("_pos", "_af", "_code", "_distance"):
+            old = getattr(self, attr)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, attr, new)
+
+    def append(self, pos, freqs, distances, code):
+        """
+        Append all alleles of a single record
+        :param pos: position of the record
+        :param freqs: list of allele frequencies
+        :param distances: list of distances to expected frequencies
+        :param code: label code for the record
+        """
+        n = len(freqs)
+        self._reserve(n)
+        s, e = self._size, self._size + n
+        self._pos[s:e] = pos
+        self._af[s:e] = freqs
+        self._code[s:e] = code
+        self._distance[s:e] = distances
+        self._size = e
+
+    def extend(self, pos, af, code, distance):
+        """
+        Append equally sized arrays of observations
+        :param pos: array of positions
+        :param af: array of allele frequencies
+        :param code: array (or scalar) of label codes
+        :param distance: array of distances to expected frequencies
+        """
+        n = len(pos)
+        self._reserve(n)
+        s, e = self._size, self._size + n
+        self._pos[s:e] = pos
+        self._af[s:e] = af
+        self._code[s:e] = code
+        self._distance[s:e] = distance
+        self._size = e
+
+    def extend_matrix(self, pos, counts, af, code, distance):
+        """
+        Append records with a variable number of alleles
+        :param pos: (n,) array of record positions
+        :param counts: (n,) array of number of alleles per record
+        :param af: (n, k) array of allele frequencies
+        :param code: (n,) array of label codes, or a scalar code
+        :param distance: (n, k) array of distances
+        """
+        self.extend(*_flatten_matrix(pos, counts, af, code, distance))
+
+    @property
+    def pos(self):
+        return self._pos[:self._size]
+
+    @property
+    def af(self):
+        return self._af[:self._size]
+
+    @property
+    def code(self):
+        return self._code[:self._size]
+
+    @property
+    def distance(self):
+        return self._distance[:self._size]
+
+    def label_array(self):
+        """
+        Decode label codes
+        :return: array of label names
+        """
+        return np.asarray(self.labels, dtype=object)[self.code]
+
+    def to_dataframe(self, chromosome, column="chromosome"):
+        """
+        Create a dataframe of this table.
+        Labels and chromosome are categorical, positions int32
+        and frequencies and distances float32.
+        :param chromosome: value to place in the chromosome column
+        :param column: name of the chromosome column
+        :return: pandas DataFrame
+        """
+        n = len(self)
+        return pd.DataFrame(
+            {"pos": self.pos,
+             "af": self.af,
+             "label": pd.Categorical.from_codes(self.code, self.labels),
+             "distance": self.distance,
+             column: pd.Categorical.from_codes(np.zeros(n, dtype=np.int8),
+                                               [chromosome])
+             }
+        )
+
+
+class AlleleHistogram(object):
+    """
+    Counts of allele frequencies in fixed bins on [0, 1], per label,
+    along with their linearly binned weights on the KDE grid.
+
+    Has the same `extend` and `extend_matrix` methods as AlleleTable,
+    so it can be filled while records are streamed,
+    but its size does not depend on the number of observations.
+    """
+
+    def __init__(self, labels, bins=HISTOGRAM_BINS):
+        """
+        :param labels: sequence of label names the codes refer to
+        :param bins: number of bins
+        """
+        self.labels = tuple(labels)
+        self.bins = bins
+        self.counts = np.zeros((len(self.labels), bins), dtype=np.int64)
+        # number of non-zero frequencies per label
+        self.nonzero = np.zeros(len(self.labels), dtype=np.int64)
+        self.grid = np.zeros((len(self.labels), KDE_GRID))
+
+    def __len__(self):
+        return int(self.counts.sum())
+
+    @property
+    def edges(self):
+        return np.linspace(0, 1, self.bins + 1)
+
+    @classmethod
+    def concatenate(cls, tables):
+        """
+        Sum histograms sharing the same labels and bins
+        :param tables: non-empty list of AlleleHistogram
+        :return: AlleleHistogram
+        """
+        labels = tables[0].labels
+        assert all(t.labels == labels for t in tables)
+        hist = cls(labels, tables[0].bins)
+        for t in tables:
+            hist.counts += t.counts
+            hist.nonzero += t.nonzero
+            hist.grid += t.grid
+        return hist
+
+    @classmethod
+    def from_table(cls, table, bins=HISTOGRAM_BINS):
+        """
+        Count the allele frequencies of an AlleleTable
+        :param table: AlleleTable
+        :param bins: number of bins
+        :return: AlleleHistogram
+        """
+        hist = cls(table.labels, bins)
+        hist.extend(table.pos, table.af, table.code, table.distance)
+        return hist
+
+    def extend(self, pos, af, code, distance):
+        """
+        Count equally sized arrays of observations.
+        Positions and distances are accepted for compatibility
+        with AlleleTable, but not used.
+        :param pos: array of positions
+        :param af: array of allele frequencies
+        :param code: array (or scalar) of label codes
+        :param distance: array of distances to expected frequencies
+        """
+        af = np.asarray(af)
+        code = np.broadcast_to(np.asarray(code, dtype=np.int64), af.shape)
+        keep = np.isfinite(af)
+        af, code = af[keep], code[keep]
+        idx = np.clip((af * self.bins).astype(np.int64), 0, self.bins - 1)
+        n_labels = len(self.labels)
+        self.counts += np.bincount(
+            code * self.bins + idx, minlength=n_labels * self.bins
+        ).reshape(n_labels, self.bins)
+        self.nonzero += np.bincount(code[af != 0], minlength=n_labels)
+        self.grid += linear_binning(af, code, n_labels, KDE_GRID)
+
+    def extend_matrix(self, pos, counts, af, code, distance):
+        """
+        Count records with a variable number of alleles
+        :param pos: (n,) array of record positions
+        :param counts: (n,) array of number of alleles per record
+        :param af: (n, k) array of allele frequencies
+        :param code: (n,) array of label codes, or a scalar code
+        :param distance: (n, k) array of distances
+        """
+        self.extend(*_flatten_matrix(pos, counts, af, code, distance))
+
+
+def as_categorical(values):
+    """
+    Convert values to a categorical, with categories
+    in order of first appearance
+    :param values: array-like or Series
+    :return: pandas Categorical
+    """
+    if isinstance(getattr(values, "dtype", None), pd.CategoricalDtype):
+        values = pd.Categorical(values)
+        used = pd.unique(values)
+        return values.set_categories(list(used))
+    return pd.Categorical(values, categories=pd.unique(values))
+
+
+def concat_frames(frames):
+    """
+    Concatenate dataframes, keeping categorical columns categorical
+    by unifying their categories in order of first appearance
+    :param frames: list of DataFrames with the same columns
+    :return: pandas DataFrame
+    """
+    frames = list(frames)
+    for col in frames[0].columns:
+        if not isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            continue
+        categories = []
+        seen = set()
+        for f in frames:
+            for x in f[col].cat.categories:
+                if x not in seen:
+                    seen.add(x)
+                    categories.append(x)
+        frames = [f.assign(**{col: f[col].cat.set_categories(categories)})
+                  for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def merge_histograms(items, drop_zero=True):
+    """
+    Merge histograms per chromosome and label.
+    :param items: iterable of (chromosome, AlleleHistogram)
+    :param drop_zero: drop labels of which all frequencies in a
+    chromosome are 0, as clean_df does for whole-genome plots
+    :return: OrderedDict of (chromosome, label) to BinnedFrequencies
+    """
+    binned = OrderedDict()
+    nonzero = {}
+    for chromosome, hist in items:
+        for i, label in enumerate(hist.labels):
+            key = (chromosome, label)
+            if key in binned:
+                binned[key] = BinnedFrequencies(
+                    binned[key].counts + hist.counts[i],
+                    binned[key].grid + hist.grid[i])
+                nonzero[key] += hist.nonzero[i]
+            else:
+                binned[key] = BinnedFrequencies(hist.counts[i].copy(),
+                                                hist.grid[i].copy())
+                nonzero[key] = hist.nonzero[i]
+    return OrderedDict((k, v) for k, v in binned.items()
+                       if nonzero[k] > 0 or not drop_zero)
+
+
+def histograms_from_dataframe(df, contigs=None, column="chromosome",
+                              bins=HISTOGRAM_BINS, drop_zero=True):
+    """
+    Count allele frequencies of a dataframe per chromosome and label
+    :param df: dataframe with af, label and chromosome columns
+    :param contigs: optional list of chromosomes to count, in order
+    :param column: name of the chromosome column
+    :param bins: number of bins
+    :param drop_zero: drop labels of which all frequencies
+    in a chromosome are 0
+    :return: OrderedDict of (chromosome, label) to BinnedFrequencies
+    """
+    if contigs is None:
+        contigs = pd.unique(df[column])
+    items = []
+    for chrom in contigs:
+        t = df[df[column] == chrom]
+        labels = as_categorical(t.label)
+        hist = AlleleHistogram(labels.categories, bins)
+        hist.extend(t.pos.values, t.af.values, labels.codes,
+                    t.distance.values)
+        items.append((chrom, hist))
+    return merge_histograms(items, drop_zero)
@@ -0,0 +1,23 @@
+"""
+afplot.constants
+~~~~~~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+
+Choices shared by the command line and the modules implementing them.
+This module must not import anything heavy,
+as it is loaded on every invocation of the command line.
+"""
+
+# libraries used to read VCF files
+BACKENDS = ("pysam", "pyvcf")
+
+# ways of drawing scatter and distance plots
+RENDERERS = ("raster", "points")
+
+# kinds of plots
+KINDS = ("histogram", "scatter", "distance")
+
+# call types of a sample at a record
+CALL_TYPES = ("hom_ref", "het", "hom_alt", "no_call")
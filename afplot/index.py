@@ -0,0 +1,104 @@
+"""
+afplot.index
+~~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+
+Reading of record counts per contig from tabix (.tbi) and CSI indexes,
+without fetching any records.
+"""
+
+import gzip
+import struct
+from collections import OrderedDict
+from os.path import exists
+
+# bin holding the numbers of mapped and unmapped records of a tbi index
+TBI_PSEUDO_BIN = 37450
+
+
+def _csi_pseudo_bin(depth):
+    return ((1 << ((depth + 1) * 3)) - 1) // 7 + 1
+
+
+def _parse_names(data, offset):
+    """
+    Parse the tabix header at offset
+    :return: tuple of (list of names, offset after header)
+    """
+    # format, col_seq, col_beg, col_end, meta, skip, l_nm
+    l_nm = struct.unpack_from("<7i", data, offset)[6]
+    offset += 28
+    names = data[offset:offset + l_nm].split(b"\0")
+    return [x.decode() for x in names if x], offset + l_nm
+
+
+def _parse_bins(data, offset, n_ref, pseudo_bin, csi):
+    """
+    Parse the bins of every reference, keeping only mapped record counts
+    :return: list of number of records, or None if not recorded
+    """
+    counts = []
+    for _ in range(n_ref):
+        n_bin, = struct.unpack_from("<i", data, offset)
+        offset += 4
+        n_records = None
+        for _ in range(n_bin):
+            bin_id, = struct.unpack_from("<I", data, offset)
+            offset += 12 if csi else 4  # csi bins have a loffset
+            n_chunk, = struct.unpack_from("<i", data, offset)
+            offset += 4
+            if bin_id == pseudo_bin and n_chunk == 2:
+                n_records, = struct.unpack_from("<Q", data, offset + 16)
+            offset += 16 * n_chunk
+        if not csi:
+            n_intv, = struct.unpack_from("<i", data, offset)
+            offset += 4 + 8 * n_intv
+        counts.append(n_records)
+    return counts
+
+
+def parse_index(data):
+    """
+    Parse a decompressed tbi or csi index
+    :param data: bytes
+    :return: OrderedDict of contig name to number of records,
+    or None if the number is not in the index. Only contigs
+    with records are listed. None if contig names are not in the index,
+    as in CSI indexes of BCF files
+    """
+    magic = data[:4]
+    if magic == b"TBI\1":
+        n_ref, = struct.unpack_from("<i", data, 4)
+        names, offset = _parse_names(data, 8)
+        counts = _parse_bins(data, offset, n_ref, TBI_PSEUDO_BIN, csi=False)
+    elif magic == b"CSI\1":
+        _, depth, l_aux = struct.unpack_from("<3i", data, 4)
+        if l_aux < 28:
+            return None
+        names, _ = _parse_names(data, 16)
+        offset = 16 + l_aux
+        n_ref, = struct.unpack_from("<i", data, offset)
+        counts = _parse_bins(data, offset + 4, n_ref,
+                             _csi_pseudo_bin(depth), csi=True)
+    else:
+        raise ValueError("Not a tabix or CSI index")
+    return OrderedDict(zip(names, counts))
+
+
+def read_index(path):
+    """
+    Read record counts per contig from the index of a VCF file
+    :param path: path to bgzipped VCF file; path.tbi or path.csi is read
+    :return: OrderedDict of contig name to number of records (or None),
+    or None if there is no readable index
+    """
+    for suffix in (".tbi", ".csi"):
+        if exists(path + suffix):
+            try:
+                with gzip.open(path + suffix, "rb") as handle:
+                    return parse_index(handle.read())
+            except (IOError, OSError, ValueError, struct.error):
+                return None
+    return None
@@ -0,0 +1,86 @@
+"""
+afplot.kde
+~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+
+import numpy as np
+
+# number of points of the grid on [0, 1] that frequencies are binned on
+KDE_GRID = 512
+# bandwidths are never smaller than this, so that data sets
+# without variance still get a (narrow) density
+MIN_BANDWIDTH = 0.01
+# the density is evaluated this many bandwidths beyond [0, 1]
+CUT = 3
+
+
+def linear_binning(x, codes=0, n_codes=1, gridsize=KDE_GRID):
+    """
+    Distribute values on [0, 1] over the two nearest points of a grid,
+    proportional to their distance to those points
+    :param x: array of values. Values outside [0, 1] are clipped
+    :param codes: array (or scalar) of group codes of every value
+    :param n_codes: number of groups
+    :param gridsize: number of grid points
+    :return: (n_codes, gridsize) array of weights
+    """
+    x = np.clip(np.asarray(x, dtype=np.float64), 0, 1) * (gridsize - 1)
+    codes = np.broadcast_to(np.asarray(codes, dtype=np.int64), x.shape)
+    lo = np.minimum(np.floor(x).astype(np.int64), gridsize - 2)
+    frac = x - lo
+    offset = codes * gridsize + lo
+    size = n_codes * gridsize
+    weights = np.bincount(offset, weights=1 - frac, minlength=size)
+    weights += np.bincount(offset + 1, weights=frac, minlength=size)
+    return weights.reshape(n_codes, gridsize)
+
+
+def scott_bandwidth(grid):
+    """
+    Scott's rule of thumb bandwidth of linearly binned data
+    :param grid: array of weights on an equally spaced grid on [0, 1]
+    :return: bandwidth, at least MIN_BANDWIDTH
+    """
+    n = grid.sum()
+    points = np.linspace(0, 1, len(grid))
+    mean = np.dot(points, grid) / n
+    std = np.sqrt(np.dot((points - mean) ** 2, grid) / n)
+    return max(std * n ** (-1. / 5), MIN_BANDWIDTH)
+
+
+def binned_kde(grid, bandwidth=None):
+    """
+    Gaussian kernel density estimate of linearly binned data.
+    The kernel is convolved with the binned weights through an FFT,
+    so the cost depends only on the grid size,
+    not on the number of observations.
+    :param grid: array of weights on an equally spaced grid on [0, 1],
+    as returned by linear_binning
+    :param bandwidth: standard deviation of the kernel.
+    Defaults to Scott's rule
+    :return: tuple of (x, density) arrays
+    """
+    grid = np.asarray(grid, dtype=np.float64)
+    n = grid.sum()
+    if n <= 0:
+        return np.array([]), np.array([])
+    if bandwidth is None:
+        bandwidth = scott_bandwidth(grid)
+    delta = 1.0 / (len(grid) - 1)
+    pad = int(np.ceil(CUT * bandwidth / delta))
+    weights = np.concatenate([np.zeros(pad), grid, np.zeros(pad)])
+    offsets = np.arange(-2 * pad, 2 * pad + 1) * delta
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2)
+    kernel /= bandwidth * np.sqrt(2 * np.pi)
+
+    size = len(weights) + len(kernel) - 1
+    nfft = 1 << int(np.ceil(np.log2(size)))
+    full = np.fft.irfft(np.fft.rfft(weights, nfft) *
+                        np.fft.rfft(kernel, nfft), nfft)[:size]
+    # the kernel is centred on its middle element
+    density = full[2 * pad:2 * pad + len(weights)] / n
+    x = (np.arange(len(weights)) - pad) * delta
+    return x, np.maximum(density, 0)
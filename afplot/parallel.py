@@ -0,0 +1,62 @@
+"""
+afplot.parallel
+~~~~~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from .reader import open_reader
+
+# readers opened by a worker process, keyed on (path, backend)
+_worker_readers = {}
+
+
+def worker_reader(path, backend):
+    """
+    Get a reader private to the current worker process.
+    Readers are opened once per process and reused for later tasks.
+    :param path: path to VCF file
+    :param backend: reader backend
+    :return: VariantReader
+    """
+    key = (path, backend)
+    if key not in _worker_readers:
+        _worker_readers[key] = open_reader(path, backend)
+    return _worker_readers[key]
+
+
+def ordered_map(func, tasks, processes=1, max_pending=None):
+    """
+    Apply func to every task, optionally in a process pool.
+    Results are returned in the order of tasks.
+    Only max_pending tasks are submitted ahead of the result that is
+    returned next, so that results finishing out of order are not
+    buffered for all tasks, and results are only computed about as
+    fast as they are consumed.
+    :param func: picklable function of a single argument
+    :param tasks: list of picklable arguments
+    :param processes: number of worker processes
+    :param max_pending: maximum number of submitted tasks of which
+    the result has not been returned. Defaults to twice processes
+    :return: generator of results
+    """
+    if processes is None or processes <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield func(task)
+        return
+    if max_pending is None:
+        max_pending = 2 * processes
+    tasks = iter(tasks)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        pending = deque(executor.submit(func, x)
+                        for x in islice(tasks, max(max_pending, 1)))
+        while pending:
+            result = pending.popleft().result()
+            for task in islice(tasks, 1):
+                pending.append(executor.submit(func, task))
+            yield result
@@ -0,0 +1,235 @@
+"""
+afplot.profiling
+~~~~~~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+
+import json
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+
+MB = 1024.0 * 1024.0
+
+# profiler of the running command, if any
+_active = None
+
+
+class StageStats(object):
+    """Accumulated wall time, CPU time and peak memory of a stage"""
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak = 0
+
+    def add(self, wall, cpu, peak):
+        self.calls += 1
+        self.wall += wall
+        self.cpu += cpu
+        self.peak = max(self.peak, peak)
+
+    def to_dict(self):
+        return OrderedDict([("calls", self.calls),
+                            ("wall_seconds", round(self.wall, 6)),
+                            ("cpu_seconds", round(self.cpu, 6)),
+                            ("peak_memory_mb", round(self.peak / MB, 3))])
+
+
+class _Frame(object):
+    """A stage that is being measured"""
+
+    def __init__(self, memory):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        self.memory = memory
+        self.peak = memory
+
+
+class Profiler(object):
+    """
+    Collects wall time, CPU time and peak memory of pipeline stages,
+    in total and per contig or region.
+
+    Memory is traced with tracemalloc. The peak memory of a stage is
+    the largest growth of traced memory while the stage runs, including
+    the stages nested in it. Stages running in worker processes are
+    not seen; with several processes, only the time spent waiting for
+    their results is measured.
+    """
+
+    def __init__(self, memory=True):
+        """
+        :param memory: whether to trace memory with tracemalloc
+        """
+        self.memory = memory
+        self.stages = OrderedDict()
+        self.contigs = OrderedDict()
+        self.regions = OrderedDict()
+        self._stack = []
+        self._total = None
+        self._started_tracing = False
+
+    def _traced(self):
+        """Get current and peak traced memory, and reset the peak"""
+        if not self.memory:
+            return 0, 0
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        return current, peak
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._total = self._enter()
+
+    def stop(self):
+        self._total = self._exit(self._total)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _enter(self):
+        current, peak = self._traced()
+        # the peak so far belongs to every stage already running
+        for frame in self._stack:
+            frame.peak = max(frame.peak, peak)
+        frame = _Frame(current)
+        self._stack.append(frame)
+        return frame
+
+    def _exit(self, frame):
+        _, peak = self._traced()
+        self._stack.remove(frame)
+        for f in self._stack + [frame]:
+            f.peak = max(f.peak, peak)
+        return (time.perf_counter() - frame.wall,
+                time.process_time() - frame.cpu,
+                frame.peak - frame.memory)
+
+    @contextmanager
+    def stage(self, name, contig=None, region=None):
+        """
+        Measure a stage
+        :param name: name of the stage, e.g. read or savefig
+        :param contig: optional contig the stage works on
+        :param region: optional region key the stage works on
+        """
+        frame = self._enter()
+        try:
+            yield
+        finally:
+            measured = self._exit(frame)
+            self.stages.setdefault(name, StageStats()).add(*measured)
+            for key, items in ((contig, self.contigs),
+                               (region, self.regions)):
+                if key is not None:
+                    stages = items.setdefault(key, OrderedDict())
+                    stages.setdefault(name, StageStats()).add(*measured)
+
+    def report(self):
+        """
+        Get the report of all measured stages
+        :return: OrderedDict, serializable to JSON
+        """
+        def _stages(stages):
+            return OrderedDict((k, v.to_dict()) for k, v in stages.items())
+
+        total = StageStats()
+        if isinstance(self._total, tuple):
+            total.add(*self._total)
+        return OrderedDict([
+            ("command", sys.argv),
+            ("memory_traced", self.memory),
+            ("total", total.to_dict()),
+            ("stages", _stages(self.stages)),
+            ("contigs", OrderedDict((k, _stages(v))
+                                    for k, v in self.contigs.items())),
+            ("regions", OrderedDict((k, _stages(v))
+                                    for k, v in self.regions.items()))
+        ])
+
+    def write(self, path):
+        """Write the report as JSON"""
+        with open(path, "w") as handle:
+            json.dump(self.report(), handle, indent=2)
+
+
+@contextmanager
+def stage(name, contig=None, region=None):
+    """
+    Measure a stage with the active profiler.
+    Does nothing when no profiler is active.
+    :param name: name of the stage
+    :param contig: optional contig the stage works on
+    :param region: optional region key the stage works on
+    """
+    if _active is None:
+        yield
+        return
+    with _active.stage(name, contig, region):
+        yield
+
+
+def profile_iter(name, iterable, contig=None, region=None):
+    """
+    Generator yielding from iterable, measuring the time
+    spent producing every item as a stage
+    :param name: name of the stage
+    :param iterable: any iterable
+    :return: generator
+    """
+    if _active is None:
+        for x in iterable:
+            yield x
+        return
+    iterator = iter(iterable)
+    while True:
+        with _active.stage(name, contig, region):
+            try:
+                x = next(iterator)
+            except StopIteration:
+                return
+        yield x
+
+
+@contextmanager
+def profiling(path=None, cprofile_path=None, memory=True):
+    """
+    Profile the code run in this context
+    :param path: path of the JSON report. Nothing is profiled if
+    neither path nor cprofile_path are given
+    :param cprofile_path: optional path of a cProfile dump,
+    readable with pstats or snakeviz
+    :param memory: whether to trace memory
+    :return: Profiler, or None
+    """
+    global _active
+    if path is None and cprofile_path is None:
+        yield None
+        return
+    profiler = Profiler(memory and path is not None)
+    cprofiler = None
+    if cprofile_path is not None:
+        import cProfile
+        cprofiler = cProfile.Profile()
+    _active = profiler
+    profiler.start()
+    if cprofiler is not None:
+        cprofiler.enable()
+    try:
+        yield profiler
+    finally:
+        if cprofiler is not None:
+            cprofiler.disable()
+            cprofiler.dump_stats(cprofile_path)
+        profiler.stop()
+        _active = None
+        if path is not None:
+            profiler.write(path)
@@ -0,0 +1,175 @@
+"""
+afplot.progress
+~~~~~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+
+import sys
+import time
+from collections import OrderedDict
+
+# seconds between redraws of the progress line on a terminal
+TTY_INTERVAL = 0.5
+
+# seconds between progress log lines when not writing to a terminal
+LOG_INTERVAL = 30.0
+
+
+def _isatty(stream):
+    try:
+        return stream.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+
+def format_duration(seconds):
+    """
+    Format a duration as H:MM:SS
+    :param seconds: number of seconds, or None
+    :return: str
+    """
+    if seconds is None:
+        return "--:--:--"
+    seconds = int(round(seconds))
+    return "{0}:{1:02d}:{2:02d}".format(seconds // 3600,
+                                        seconds // 60 % 60, seconds % 60)
+
+
+class Progress(object):
+    """
+    Progress of extraction over all contigs and samples.
+
+    Progress is measured in bases of the contigs to read, and reported
+    with the number of VCF records read, records per second, the number
+    of allele frequencies kept and an estimated time of arrival.
+    Updates are cheap; output is throttled by time. On a terminal,
+    a single status line is redrawn; otherwise, a structured
+    key=value log line is written every LOG_INTERVAL seconds.
+    """
+
+    def __init__(self, total=None, stream=None, enabled=True, interval=None,
+                 clock=time.monotonic):
+        """
+        :param total: total number of bases to read, if known
+        :param stream: output stream. Defaults to stderr
+        :param enabled: whether to report progress.
+        If not, progress is only counted
+        :param interval: minimum seconds between reports.
+        Defaults to TTY_INTERVAL or LOG_INTERVAL
+        :param clock: function returning the current time in seconds
+        """
+        self.total = total
+        self.stream = stream if stream is not None else sys.stderr
+        self.enabled = enabled
+        self.tty = enabled and _isatty(self.stream)
+        if interval is None:
+            interval = TTY_INTERVAL if self.tty else LOG_INTERVAL
+        self.interval = interval
+        self.clock = clock
+        self.contig = None
+        self.records = 0
+        self.kept = 0
+        self.done = 0
+        self._start = clock()
+        self._last = self._start
+        self._drawn = False
+
+    def start_contig(self, contig):
+        """Set the contig that is being read"""
+        self.contig = contig
+
+    def update(self, records=0, kept=0, done=0):
+        """
+        Add to the counts, and report if the interval has passed
+        :param records: number of VCF records read
+        :param kept: number of allele frequencies kept
+        :param done: number of bases read
+        """
+        self.records += records
+        self.kept += kept
+        self.done += done
+        if not self.enabled:
+            return
+        now = self.clock()
+        if now - self._last >= self.interval:
+            self._last = now
+            self._report(now)
+
+    def status(self, now=None):
+        """
+        Get the current progress
+        :return: OrderedDict of contig, fraction done, records,
+        records per second, kept, elapsed and ETA in seconds
+        """
+        if now is None:
+            now = self.clock()
+        elapsed = now - self._start
+        fraction = None
+        eta = None
+        if self.total:
+            fraction = min(self.done / float(self.total), 1.0)
+            if self.done > 0:
+                eta = elapsed * (1 - fraction) / fraction
+        return OrderedDict([
+            ("contig", self.contig),
+            ("done", fraction),
+            ("records", self.records),
+            ("records_per_s", self.records / elapsed if elapsed > 0 else 0),
+            ("kept", self.kept),
+            ("elapsed_s", elapsed),
+            ("eta_s", eta)
+        ])
+
+    def _line(self, status):
+        done = "--" if status["done"] is None else \
+            "{0:.1f}".format(status["done"] * 100)
+        return ("{0} {1}% | {2} records | {3:.0f} records/s | {4} kept | "
+                "elapsed {5} | ETA {6}").format(
+                    status["contig"] or "", done, status["records"],
+                    status["records_per_s"], status["kept"],
+                    format_duration(status["elapsed_s"]),
+                    format_duration(status["eta_s"]))
+
+    @staticmethod
+    def _log_line(status):
+        fields = []
+        for key, value in status.items():
+            if value is None:
+                value = "NA"
+            elif isinstance(value, float):
+                value = "{0:.3f}".format(value) if key == "done" \
+                    else "{0:.1f}".format(value)
+            fields.append("{0}={1}".format(key, value))
+        return "afplot progress " + " ".join(fields)
+
+    def _report(self, now):
+        status = self.status(now)
+        if self.tty:
+            self.stream.write("\r" + self._line(status) + "\x1b[K")
+            self._drawn = True
+        else:
+            self.stream.write(self._log_line(status) + "\n")
+        self.stream.flush()
+
+    def _clear(self):
+        if self._drawn:
+            self.stream.write("\r\x1b[K")
+            self._drawn = False
+
+    def message(self, text):
+        """Write a message, on its own line"""
+        self._clear()
+        self.stream.write(text + "\n")
+        self.stream.flush()
+
+    def finish(self):
+        """Report the final progress"""
+        if not self.enabled:
+            return
+        self._report(self.clock())
+        if self.tty:
+            self.stream.write("\n")
+            self._drawn = False
+        self.stream.flush()
@@ -0,0 +1,274 @@
+"""
+afplot.reader
+~~~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pysam
+import vcf
+
+from .index import read_index
+from .utils import _is_vcf_version_at_least_0_6_8, chunked
+from .variation import BATCH_SIZE, build_call_arrays, is_active, is_snv, \
+    record_mask, record_passed, records_to_arrays
+
+Contig = namedtuple("Contig", ["id", "length"])
+
+NEW_VCF = _is_vcf_version_at_least_0_6_8(vcf)
+
+
+def _keep_records(records, passed, snv, call_filter):
+    """
+    Get indices of records meeting the conditions of a CallFilter
+    that do not depend on the sample
+    :param records: list of records with alleles
+    :param passed: list of booleans, True if FILTER is PASS
+    :param snv: list of booleans, True if all alleles are single bases
+    :param call_filter: CallFilter
+    :return: array of indices
+    """
+    n_alleles = np.array([len(x.alleles) for x in records])
+    return np.flatnonzero(record_mask(n_alleles, np.array(passed, dtype=bool),
+                                      np.array(snv, dtype=bool), call_filter))
+
+
+class VariantReader(object):
+    """
+    Base class of VCF readers.
+
+    A reader exposes the `samples` and `contigs` of a tabix-indexed
+    VCF file, and yields the call data of one or more samples
+    as CallArrays through `fetch_arrays` and `fetch_sample_arrays`.
+    """
+
+    backend = None
+
+    def __init__(self, path):
+        self.path = path
+        self._record_counts = None
+        self._index_read = False
+
+    @property
+    def samples(self):
+        raise NotImplementedError
+
+    @property
+    def contigs(self):
+        """OrderedDict of contig name to Contig"""
+        raise NotImplementedError
+
+    @property
+    def record_counts(self):
+        """
+        OrderedDict of contig name to number of records, read from
+        the tabix or CSI index. Only contigs with records are listed;
+        counts are None if the index does not record them.
+        None if the index cannot be read.
+        """
+        if not self._index_read:
+            self._record_counts = read_index(self.path)
+            self._index_read = True
+        return self._record_counts
+
+    def fetch_arrays(self, chromosome, start=None, end=None,
+                     sample=None, batch_size=BATCH_SIZE, call_filter=None):
+        """
+        Generator of CallArrays for records in a region
+        :param chromosome: contig name
+        :param start: 0-based start. If not given, fetch entire contig
+        :param end: 0-based, exclusive end
+        :param sample: sample name. Defaults to first sample
+        :param batch_size: maximum number of records per CallArrays
+        :param call_filter: optional CallFilter, see fetch_sample_arrays
+        :return: generator of CallArrays
+        """
+        if sample is None:
+            sample = self.samples[0]
+        for arrays in self.fetch_sample_arrays(chromosome, [sample],
+                                               start, end, batch_size,
+                                               call_filter):
+            yield arrays[0]
+
+    def fetch_sample_arrays(self, chromosome, samples, start=None,
+                            end=None, batch_size=BATCH_SIZE,
+                            call_filter=None):
+        """
+        Generator of CallArrays of several samples in a single pass
+        :param chromosome: contig name
+        :param samples: list of sample names
+        :param start: 0-based start. If not given, fetch entire contig
+        :param end: 0-based, exclusive end. If not given, fetch
+        up to the end of the contig, including records beyond
+        the contig length in the header
+        :param batch_size: maximum number of records per batch
+        :param call_filter: optional CallFilter. Records failing its
+        FILTER, SNV and biallelic conditions are dropped before their
+        samples are decoded; conditions on calls are left to filter_calls.
+        Batches without records left are not yielded
+        :return: generator of lists of CallArrays, one per sample
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PyVCFReader(VariantReader):
+    """Reader backed by PyVCF"""
+
+    backend = "pyvcf"
+
+    def __init__(self, path, reader=None):
+        super(PyVCFReader, self).__init__(path)
+        if reader is None:
+            reader = vcf.Reader(filename=path)
+        self._reader = reader
+
+    @property
+    def samples(self):
+        return self._reader.samples
+
+    @property
+    def contigs(self):
+        return self._reader.contigs
+
+    def _fetch(self, chromosome, start, end):
+        # the coordinate convention of fetch changed in PyVCF 0.6.8
+        if start is None:
+            if NEW_VCF:
+                return self._reader.fetch(chromosome, 0)
+            length = self.contigs.get(chromosome).length
+            return self._reader.fetch(chromosome, 1, length)
+        if end is None:
+            if NEW_VCF:
+                return self._reader.fetch(chromosome, int(start))
+            end = self.contigs.get(chromosome).length
+        if NEW_VCF:
+            return self._reader.fetch(chromosome, int(start), int(end))
+        return self._reader.fetch(chromosome, int(start) + 1, int(end))
+
+    def fetch_sample_arrays(self, chromosome, samples, start=None,
+                            end=None, batch_size=BATCH_SIZE,
+                            call_filter=None):
+        try:
+            iterator = self._fetch(chromosome, start, end)
+        except ValueError:
+            return
+        for records in chunked(iterator, batch_size):
+            if is_active(call_filter):
+                keep = _keep_records(
+                    records, [record_passed(x.FILTER) for x in records],
+                    [is_snv(x.REF, x.ALT) for x in records], call_filter)
+                if len(keep) == 0:
+                    continue
+                records = [records[i] for i in keep]
+            yield [records_to_arrays(records, x) for x in samples]
+
+
+class PysamReader(VariantReader):
+    """
+    Reader backed by htslib through pysam.
+
+    Records are only decoded for the requested samples,
+    and only the AD, GT and GQ fields are read.
+    """
+
+    backend = "pysam"
+
+    def __init__(self, path):
+        super(PysamReader, self).__init__(path)
+        self._header_file = pysam.VariantFile(path)
+        self._files = {}
+
+    @property
+    def samples(self):
+        return list(self._header_file.header.samples)
+
+    @property
+    def contigs(self):
+        return OrderedDict(
+            (name, Contig(name, contig.length))
+            for name, contig in self._header_file.header.contigs.items()
+        )
+
+    def _file_for(self, samples):
+        """Get a file handle that only parses the given samples"""
+        key = tuple(sorted(set(samples)))
+        if key not in self._files:
+            handle = pysam.VariantFile(self.path)
+            handle.subset_samples(list(key))
+            self._files[key] = handle
+        return self._files[key]
+
+    def fetch_sample_arrays(self, chromosome, samples, start=None,
+                            end=None, batch_size=BATCH_SIZE,
+                            call_filter=None):
+        handle = self._file_for(samples)
+        try:
+            iterator = handle.fetch(chromosome, start, end)
+        except ValueError:
+            return
+        for records in chunked(iterator, batch_size):
+            # a missing FILTER has no keys, PASS has a PASS key
+            passed = [record_passed(list(x.filter.keys()) or None)
+                      for x in records]
+            snv = [is_snv(x.ref, x.alts) for x in records]
+            if is_active(call_filter):
+                keep = _keep_records(records, passed, snv, call_filter)
+                if len(keep) == 0:
+                    continue
+                records = [records[i] for i in keep]
+                passed = [passed[i] for i in keep]
+                snv = [snv[i] for i in keep]
+            pos = [x.pos for x in records]
+            ref_len = [len(x.ref) for x in records]
+            n_alleles = [len(x.alleles) for x in records]
+            batch = []
+            for sample in samples:
+                ads = []
+                gts = []
+                gq = []
+                for record in records:
+                    call = record.samples[sample]
+                    ads.append(call.get("AD") or [])
+                    gts.append(call.get("GT") or [])
+                    gq.append(call.get("GQ"))
+                batch.append(build_call_arrays(pos, ref_len, n_alleles,
+                                               ads, gts, gq, passed, snv))
+            yield batch
+
+    def close(self):
+        self._header_file.close()
+        for handle in self._files.values():
+            handle.close()
+        self._files = {}
+
+
+def open_reader(path, backend="pysam"):
+    """
+    Open a VCF reader
+    :param path: path to tabix-indexed VCF file
+    :param backend: name of backend; one of afplot.constants.BACKENDS
+    :return: VariantReader
+    """
+    if backend == "pysam":
+        return PysamReader(path)
+    elif backend == "pyvcf":
+        return PyVCFReader(path)
+    raise ValueError("Unknown backend {0}".format(backend))
+
+
+def as_reader(reader):
+    """
+    Wrap a PyVCF reader in a VariantReader if necessary
+    :param reader: VariantReader or vcf.Reader
+    :return: VariantReader
+    """
+    if isinstance(reader, VariantReader):
+        return reader
+    return PyVCFReader(reader.filename, reader)
@@ -7,145 +7,346 @@ afplot.region
 """
 
 from __future__ import print_function
+from itertools import groupby
 from os.path import join
 from warnings import warn
 
 import numpy as np
-from numpy.linalg import LinAlgError
-import matplotlib
-matplotlib.use('Agg')
-
-import matplotlib.pyplot as plt
 import pandas as pd
-import seaborn as sns
 
-from .utils import NEW_VCF, region_key
-from .variation import get_all_allele_freqs, \
-    get_distance_to_exp, get_variant_type
+from .columns import AlleleTable
+from .parallel import ordered_map, worker_reader
+from .profiling import profile_iter, stage
+from .reader import as_reader
+from .render import RegionRenderer
+from .sampling import downsample_dataframe
+from .utils import region_key, merge_regions
+from .variation import CALL_TYPES, get_batch_stats, concatenate_arrays, \
+    filter_calls
+
+# regions closer than this are fetched from the VCF as one block
+SWEEP_MAX_GAP = 100000
+# maximum length of a block, which bounds the records held in memory
+SWEEP_MAX_BLOCK = 1000000
 
 
-def build_df_for_region(reader, region, sample=None, label=None):
+def build_df_for_region(reader, region, sample=None, label=None,
+                        call_filter=None):
+    reader = as_reader(reader)
     if label is None:
         label = "dummy"  # this is a hack, but FacetGrid won't work with None
     if sample is None:
         sample = reader.samples[0]
-    if NEW_VCF:
-        iterator = reader.fetch(
-            region.chr,
-            int(region.start),
-            int(region.end)
-        )
-    else:
-        iterator = reader.fetch(
-            region.chr,
-            int(region.start)+1,
-            int(region.end)
-        )
-    maf = []
-    for record in iterator:
-        ad = get_all_allele_freqs(record, sample)
-        distances = get_distance_to_exp(record, sample)
-        if len(ad) == 0:
-            continue
-        for freq, dist in zip(ad, distances):
-                maf.append([record.POS, freq,
-                            get_variant_type(record, sample), dist])
-    arr = np.array(maf)
-    if len(arr) == 0:
+    table = AlleleTable(CALL_TYPES)
+    for arrays in reader.fetch_arrays(region.chr, int(region.start),
+                                      int(region.end), sample=sample,
+                                      call_filter=call_filter):
+        arrays = filter_calls(arrays, call_filter)
+        freqs, types, dists = get_batch_stats(arrays)
+        table.extend_matrix(arrays.pos, arrays.n_ad, freqs, types, dists)
+    if len(table) == 0:
+        return None
+    return table.to_dataframe(label, column="chrom")
+
+
+def _select_region(arrays, stats, region, label):
+    """
+    Create dataframe of the records overlapping a region
+    :param arrays: CallArrays of a block of sorted records, or None
+    :param stats: tuple of (freqs, types, distances) of arrays
+    :param region: Region
+    :param label: value for the chrom column
+    :return: DataFrame, or None if region is empty
+    """
+    if arrays is None:
+        return None
+    start, end = int(region.start), int(region.end)
+    # same overlap definition as tabix: record start < end, record end > start
+    pos = arrays.pos
+    hi = np.searchsorted(pos, end, side="right")
+    lo = np.searchsorted(pos, start - arrays.ref_len.max() + 2, side="left")
+    idx = np.arange(lo, hi)
+    idx = idx[pos[idx] - 1 + arrays.ref_len[idx] > start]
+    if len(idx) == 0:
+        return None
+    freqs, types, dists = stats
+    table = AlleleTable(CALL_TYPES, capacity=len(idx) * 2)
+    table.extend_matrix(pos[idx], arrays.n_ad[idx], freqs[idx],
+                        types[idx], dists[idx])
+    if len(table) == 0:
+        return None
+    return table.to_dataframe(label, column="chrom")
+
+
+def iter_dfs_for_regions(reader, regions, sample=None, label=None,
+                         max_gap=SWEEP_MAX_GAP, call_filter=None,
+                         max_block=SWEEP_MAX_BLOCK):
+    """
+    Generator of dataframes for many regions.
+
+    Contigs are swept in order of their first region, and regions of a
+    contig are sorted on start. Regions that overlap or lie within
+    max_gap bases of each other are fetched as a single block
+    of at most max_block bases. Every record within a block is therefore
+    decoded once, and then assigned to all regions it overlaps.
+    :param reader: VariantReader or vcf reader object (must be tabixxed)
+    :param regions: iterable of Region
+    :param sample: sample name. Defaults to first sample
+    :param label: value for the chrom column
+    :param max_gap: maximum distance between regions in one block
+    :param call_filter: optional CallFilter; calls not meeting it are
+    removed before allele frequencies are computed
+    :param max_block: maximum length of a block, so that memory use
+    depends on region size rather than on the contig size of dense
+    region files. Longer regions are fetched as a block of their own
+    :return: generator of (Region, DataFrame) in the order of regions.
+    DataFrame is None for empty regions. Only regions of which an
+    earlier region is not yet swept are held back, so regions grouped
+    per contig, as in sorted region files, are streamed one at a time.
+    """
+    reader = as_reader(reader)
+    regions = list(regions)
+    if label is None:
+        label = "dummy"
+    if sample is None:
+        sample = reader.samples[0]
+    order = {}
+    for reg in regions:
+        order.setdefault(reg.chr, len(order))
+    indexed = sorted(enumerate(regions),
+                     key=lambda x: (order[x[1].chr], int(x[1].start)))
+    results = {}
+    next_idx = 0
+    for chrom, members in groupby(indexed, key=lambda x: x[1].chr):
+        members = list(members)
+        blocks = merge_regions([x[1] for x in members], max_gap,
+                               max_block)
+        for start, end, block in blocks:
+            chunks = list(profile_iter("read", reader.fetch_arrays(
+                chrom, start, end, sample=sample, call_filter=call_filter),
+                contig=chrom))
+            arrays = None
+            stats = None
+            if chunks:
+                with stage("filter", contig=chrom):
+                    arrays = filter_calls(concatenate_arrays(chunks),
+                                          call_filter)
+                if len(arrays.pos) == 0:
+                    arrays = None
+            if arrays is not None:
+                with stage("variation", contig=chrom):
+                    stats = get_batch_stats(arrays)
+            for j in block:
+                i, reg = members[j]
+                with stage("dataframe", region=region_key(reg)):
+                    results[i] = _select_region(arrays, stats, reg, label)
+            while next_idx in results:
+                yield regions[next_idx], results.pop(next_idx)
+                next_idx += 1
+
+
+def build_df_for_region_from_table(table, region, label=None):
+    """
+    Select a region from an allele frequency table
+    :param table: DataFrame as written by `afplot extract`
+    :param region: Region
+    :param label: value for the chrom column
+    :return: DataFrame, or None if region is empty
+    """
+    if label is None:
+        label = "dummy"
+    pos = table.pos
+    mask = ((table.chromosome == region.chr) &
+            (pos > int(region.start)) & (pos <= int(region.end)))
+    if not mask.any():
         return None
-    df = pd.DataFrame(
-        {"pos": [int(x) for x in arr[:, 0]],
-         "af": [float(x) for x in arr[:, 1]],
-         "label": arr[:, 2],
-         "distance": [float(x) for x in arr[:, 3]],
-         "chrom": [label]*len(arr[:, 0])
-         }
-    )
-    return df
+    df = table.loc[mask, ["pos", "af", "label", "distance"]]
+    return df.assign(chrom=pd.Categorical([label] * len(df))
+                     ).reset_index(drop=True)
+
+
+def _table_region(table, region, label):
+    with stage("dataframe", region=region_key(region)):
+        return build_df_for_region_from_table(table, region, label)
+
+
+def _iter_region_dfs(source, regions, label, max_points=None, seed=0,
+                     call_filter=None):
+    """
+    Generator of (Region, DataFrame) from either a reader or a table.
+    With max_points, every DataFrame is a seeded, label-stratified
+    sample of at most max_points observations.
+    call_filter only applies to readers
+    """
+    if isinstance(source, pd.DataFrame):
+        dfs = ((reg, _table_region(source, reg, label)) for reg in regions)
+    else:
+        dfs = iter_dfs_for_regions(source, regions, label=label,
+                                   call_filter=call_filter)
+    for reg, df in dfs:
+        if max_points is not None:
+            with stage("sample", region=region_key(reg)):
+                df = downsample_dataframe(df, max_points, seed,
+                                          column="chrom")
+        yield reg, df
 
 
 def plot_single_histogram(dataframe, output, dpi=300,
                           kde_only=False, label=None):
-    g = sns.FacetGrid(dataframe, col="chrom", hue="label", col_wrap=2)
-    if kde_only:
-        try:
-            g = (g.map(sns.distplot, "af", hist=False).
-                 add_legend().
-                 set_titles(""))
-        except LinAlgError:
-            warn("Cannot create KDE for this data set."
-                 "Defaulting to histogram")
-            g = (g.map(sns.distplot, "af", hist=True, kde=False).
-                 add_legend().
-                 set_titles(""))
-    else:
-        try:
-            g = (g.map(sns.distplot, "af").
-                 add_legend().
-                 set_titles(""))
-        except LinAlgError:
-            warn("Cannot create KDE for this data set."
-                 "Defaulting to histogram")
-            g = (g.map(sns.distplot, "af", hist=True, kde=False).
-                 add_legend().
-                 set_titles(""))
-    for x in g.axes:
-        if x.get_ylim()[1] > 10:
-            x.set_ylim(0, 10)
-        x.set_xlim(-0.5, 1.5)
-    if label is not None:
-        plt.title(label)
-    plt.savefig(output, dpi=dpi)
-    for x in g.axes:
-        plt.sca(x)
-    plt.close(g.fig)
+    renderer = RegionRenderer("histogram", dpi, label, kde_only)
+    renderer.render(dataframe, output)
+    renderer.close()
 
 
 def plot_single_scatter(dataframe, output, category="af", dpi=300, label=None):
-    f = sns.lmplot("pos", category, dataframe, col="chrom",
-                   col_wrap=1.2, fit_reg=False,
-                   hue="label", scatter_kws={"alpha": 0.3}, aspect=3)
-    f.add_legend()
-    f.set_titles("")
-    for x in f.axes:
-        x.set_ylim(0, 1.0)
-    if label is not None:
-        plt.title(label)
-    plt.savefig(output, dpi=dpi)
-    for x in f.axes:
-        plt.sca(x)
-    plt.close(f.fig)
+    kind = "scatter" if category == "af" else category
+    renderer = RegionRenderer(kind, dpi, label)
+    renderer.render(dataframe, output)
+    renderer.close()
+
+
+def _output_paths(output_dir, region, kind):
+    """
+    Get output paths of a region
+    :param kind: a single plot kind, or a sequence of kinds.
+    With a sequence, the kind is part of every file name
+    :return: list of (kind, path)
+    """
+    name = region_key(region)
+    if isinstance(kind, str):
+        return [(kind, join(output_dir, "{0}.png".format(name)))]
+    return [(k, join(output_dir, "{0}.{1}.png".format(name, k)))
+            for k in kind]
+
+
+def _plot_region(df, reg, output_dir, kind, renderers, label, dpi=300,
+                 kde_only=False):
+    """
+    Plot a region with reusable renderers
+    :param renderers: dict of kind to RegionRenderer, filled as needed
+    """
+    for k, opath in _output_paths(output_dir, reg, kind):
+        if k not in renderers:
+            renderers[k] = RegionRenderer(k, dpi, label, kde_only)
+        with stage("render", region=region_key(reg)):
+            renderers[k].render(df, opath)
+
+
+def _close_renderers(renderers):
+    for renderer in renderers.values():
+        renderer.close()
+
+
+def _plot_region_chunk(task):
+    """
+    Plot a chunk of regions in a worker process
+    :param task: tuple of (source, output_dir, regions, kind,
+    label, dpi, kde_only, max_points, seed, call_filter). source is either
+    a (path, backend) tuple or a table DataFrame
+    :return: list of booleans, True for every empty region
+    """
+    (source, output_dir, regions, kind, label, dpi, kde_only,
+     max_points, seed, call_filter) = task
+    if isinstance(source, tuple):
+        source = worker_reader(*source)
+    empty = []
+    renderers = {}
+    try:
+        for reg, df in _iter_region_dfs(source, regions, label,
+                                        max_points, seed, call_filter):
+            empty.append(df is None)
+            if df is not None:
+                _plot_region(df, reg, output_dir, kind, renderers,
+                             label, dpi, kde_only)
+    finally:
+        _close_renderers(renderers)
+    return empty
+
+
+def plot_regions(reader, output_dir, regions, kind, label,
+                 dpi=300, kde_only=False, jobs=1, max_points=None, seed=0,
+                 call_filter=None):
+    """
+    Plot every region to a PNG in output_dir
+    :param reader: VariantReader, vcf reader or table DataFrame
+    :param output_dir: output directory
+    :param regions: iterable of Region
+    :param kind: one of histogram, scatter or distance,
+    or a sequence of those to write every kind from a single extraction.
+    Files are then named <region>.<kind>.png
+    :param label: optional plot title
+    :param dpi: dpi of PNGs
+    :param kde_only: only plot kde for histograms
+    :param jobs: number of worker processes
+    :param max_points: optional maximum number of points per region
+    :param seed: seed used to sample points
+    :param call_filter: optional CallFilter of calls to keep
+    """
+    if jobs is None or jobs <= 1:
+        renderers = {}
+        try:
+            for reg, df in _iter_region_dfs(reader, regions, label,
+                                            max_points, seed, call_filter):
+                if df is None:
+                    warn("Region {0} is empty".format(region_key(reg)))
+                    continue
+                _plot_region(df, reg, output_dir, kind, renderers,
+                             label, dpi, kde_only)
+        finally:
+            _close_renderers(renderers)
+        return
+
+    regions = list(regions)
+    # chunks of neighbouring regions keep the sweep in workers efficient
+    order = sorted(range(len(regions)),
+                   key=lambda i: (regions[i].chr, int(regions[i].start)))
+    n_chunks = min(len(regions), jobs * 4)
+    chunks = [x for x in np.array_split(order, n_chunks) if len(x) > 0]
+    tasks = []
+    for chunk in chunks:
+        chunk_regions = [regions[i] for i in chunk]
+        if isinstance(reader, pd.DataFrame):
+            chroms = set(x.chr for x in chunk_regions)
+            source = reader[reader.chromosome.isin(chroms)]
+        else:
+            reader = as_reader(reader)
+            source = (reader.path, reader.backend)
+        tasks.append((source, output_dir, chunk_regions, kind,
+                      label, dpi, kde_only, max_points, seed, call_filter))
+    empty = [False] * len(regions)
+    for chunk, flags in zip(chunks, ordered_map(_plot_region_chunk,
+                                                tasks, jobs)):
+        for i, flag in zip(chunk, flags):
+            empty[i] = flag
+    for reg, flag in zip(regions, empty):
+        if flag:
+            warn("Region {0} is empty".format(region_key(reg)))
 
 
 def region_histogram_main(reader, output_dir, regions,
-                          label, dpi=300, kde_only=False):
-    for reg in regions:
-        name = region_key(reg)
-        opath = join(output_dir, "{0}.png".format(name))
-        df = build_df_for_region(reader, reg, label=label)
-        if df is None:
-            warn("Region {0} is empty".format(name))
-            continue
-        plot_single_histogram(df, opath, dpi, kde_only, label=label)
+                          label, dpi=300, kde_only=False, jobs=1,
+                          call_filter=None):
+    plot_regions(reader, output_dir, regions, "histogram", label,
+                 dpi=dpi, kde_only=kde_only, jobs=jobs,
+                 call_filter=call_filter)
 
 
-def region_scatter_main(reader, output_dir, regions, label, dpi=300):
-    for reg in regions:
-        name = region_key(reg)
-        opath = join(output_dir, "{0}.png".format(name))
-        df = build_df_for_region(reader, reg, label=label)
-        if df is None:
-            warn("Region {0} is empty".format(name))
-            continue
-        plot_single_scatter(df, opath, "af", dpi=dpi, label=label)
+def region_scatter_main(reader, output_dir, regions, label, dpi=300, jobs=1,
+                        max_points=None, seed=0, call_filter=None):
+    plot_regions(reader, output_dir, regions, "scatter", label,
+                 dpi=dpi, jobs=jobs, max_points=max_points, seed=seed,
+                 call_filter=call_filter)
 
 
-def region_distance_main(reader, output_dir, regions, label, dpi=300):
-    for reg in regions:
-        name = region_key(reg)
-        opath = join(output_dir, "{0}.png".format(name))
-        df = build_df_for_region(reader, reg, label=label)
-        if df is None:
-            warn("Region {0} is empty".format(name))
-            continue
-        plot_single_scatter(df, opath, "distance", dpi=dpi, label=label)
+def region_distance_main(reader, output_dir, regions, label, dpi=300,
+                         jobs=1, max_points=None, seed=0, call_filter=None):
+    plot_regions(reader, output_dir, regions, "distance", label,
+                 dpi=dpi, jobs=jobs, max_points=max_points, seed=seed,
+                 call_filter=call_filter)
+
+
+def region_all_main(reader, output_dir, regions, label, kinds, dpi=300,
+                    kde_only=False, jobs=1, call_filter=None):
+    plot_regions(reader, output_dir, regions, tuple(kinds), label,
+                 dpi=dpi, kde_only=kde_only, jobs=jobs,
+                 call_filter=call_filter)
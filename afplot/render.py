@@ -0,0 +1,377 @@
+"""
+afplot.render
+~~~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
+from matplotlib.colors import to_rgb
+from matplotlib.lines import Line2D
+import pandas as pd
+
+from .columns import histograms_from_dataframe
+from .kde import binned_kde
+from .profiling import stage
+
+
+def label_order(labels):
+    """
+    Get order of labels the way seaborn orders hue levels of strings,
+    i.e. in order of first appearance. Categorical labels are ordered
+    the same way rather than on their categories, so that every renderer
+    gives a label the same color.
+    :param labels: pandas Series
+    :return: list of labels
+    """
+    return list(pd.unique(labels))
+
+
+def current_colors(n):
+    """
+    Get the first n colors of the current color cycle
+    :param n: number of colors
+    :return: list of RGB tuples
+    """
+    cycle = plt.rcParams["axes.prop_cycle"].by_key()["color"]
+    return [to_rgb(cycle[i % len(cycle)]) for i in range(n)]
+
+
+def bin_points(x, y, xlim, ylim, shape):
+    """
+    Count points on a 2d grid
+    :param x: array of x values
+    :param y: array of y values
+    :param xlim: (min, max) of x
+    :param ylim: (min, max) of y
+    :param shape: (rows, columns) of grid
+    :return: 2d array of counts; row 0 is the lowest y
+    """
+    rows, cols = shape
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    keep = ((x >= xlim[0]) & (x <= xlim[1]) &
+            (y >= ylim[0]) & (y <= ylim[1]))
+    x, y = x[keep], y[keep]
+    xi = ((x - xlim[0]) / (xlim[1] - xlim[0]) * cols).astype(np.int64)
+    yi = ((y - ylim[0]) / (ylim[1] - ylim[0]) * rows).astype(np.int64)
+    xi = np.minimum(xi, cols - 1)
+    yi = np.minimum(yi, rows - 1)
+    counts = np.bincount(yi * cols + xi, minlength=rows * cols)
+    return counts.reshape(rows, cols)
+
+
+def _spread(counts, radius):
+    """Spread counts over neighbouring cells, giving points a size"""
+    if radius <= 0:
+        return counts
+    padded = np.pad(counts, radius, mode="constant")
+    out = np.zeros_like(counts)
+    rows, cols = counts.shape
+    for dy in range(2 * radius + 1):
+        for dx in range(2 * radius + 1):
+            out += padded[dy:dy + rows, dx:dx + cols]
+    return out
+
+
+def composite(counts, colors, alpha=0.3):
+    """
+    Composite per-label count grids into one RGBA image.
+    A cell with n points of a label gets the opacity of n stacked
+    markers with the given alpha. Labels are drawn on top of each other
+    in order, as separate scatter calls would.
+    :param counts: list of 2d count arrays, one per label
+    :param colors: list of RGB tuples, one per label
+    :param alpha: opacity of a single point
+    :return: (rows, columns, 4) float array
+    """
+    shape = counts[0].shape
+    rgb = np.zeros(shape + (3,))
+    opacity = np.zeros(shape)
+    for c, color in zip(counts, colors):
+        a = 1.0 - np.power(1.0 - alpha, c)
+        rgb = rgb * (1 - a[..., None]) + np.array(color) * a[..., None]
+        opacity = opacity * (1 - a) + a
+    image = np.ones(shape + (4,))
+    nonzero = opacity > 0
+    # un-premultiply so that imshow blends against a white background
+    image[nonzero, :3] = rgb[nonzero] / opacity[nonzero, None]
+    image[..., 3] = opacity
+    return image
+
+
+def plot_binned_facets(source, png, column, ylim=None, dpi=300, col_wrap=4,
+                       height=5, aspect=3, alpha=0.3, cell=2.0, spread=1):
+    """
+    Plot position against column for every chromosome,
+    as an image of binned point counts per label.
+    Rendering time depends on the size of the image,
+    not on the number of points.
+    :param source: dataframe with pos, label, chromosome and column
+    columns, or an AlleleStore, which is read one contig at a time
+    :param png: output path
+    :param column: column to plot on the y axis
+    :param ylim: optional (min, max) of the y axis
+    :param dpi: dpi of output
+    :param col_wrap: number of panels per row
+    :param height: height of a panel in inches
+    :param aspect: width/height ratio of a panel
+    :param alpha: opacity of a single point
+    :param cell: size of a grid cell in points
+    :param spread: radius in cells that every point covers
+    """
+    if isinstance(source, pd.DataFrame):
+        df = source
+        chroms = label_order(df.chromosome)
+        labels = label_order(df.label)
+        x_max = float(df.pos.max())
+        lo, hi = float(df[column].min()), float(df[column].max())
+
+        def frame(chrom):
+            return df[df.chromosome == chrom]
+    else:
+        chroms = source.contigs
+        labels = list(source.labels)
+        x_max = source.value_range("pos")[1]
+        lo, hi = source.value_range(column)
+        frame = source.contig_frame
+    colors = current_colors(len(labels))
+    xlim = (0, max(x_max, 1.0) * 1.05)
+    if ylim is None:
+        margin = (hi - lo) * 0.05 or 0.05
+        ylim = (lo - margin, hi + margin)
+    shape = (max(int(height * 72 / cell), 1),
+             max(int(height * aspect * 72 / cell), 1))
+
+    n_cols = min(col_wrap, len(chroms))
+    n_rows = int(np.ceil(len(chroms) / float(col_wrap)))
+    fig, axes = plt.subplots(n_rows, n_cols, squeeze=False,
+                             sharex=True, sharey=True,
+                             figsize=(n_cols * height * aspect,
+                                      n_rows * height))
+    axes = axes.flatten()
+    for ax, chrom in zip(axes, chroms):
+        with stage("dataframe", contig=chrom):
+            sub = frame(chrom)
+        with stage("draw", contig=chrom):
+            counts = []
+            for label in labels:
+                t = sub[sub.label == label]
+                c = bin_points(t.pos.values, t[column].values,
+                               xlim, ylim, shape)
+                counts.append(_spread(c, spread))
+            ax.imshow(composite(counts, colors, alpha), origin="lower",
+                      extent=(xlim[0], xlim[1], ylim[0], ylim[1]),
+                      aspect="auto", interpolation="nearest")
+        ax.set_title("chromosome = {0}".format(chrom))
+        ax.spines["top"].set_visible(False)
+        ax.spines["right"].set_visible(False)
+        ax.set_xlim(*xlim)
+        ax.set_ylim(*ylim)
+    for ax in axes[len(chroms):]:
+        ax.set_visible(False)
+    for ax in axes[(n_rows - 1) * n_cols:]:
+        ax.set_xlabel("pos")
+    for ax in axes[::n_cols]:
+        ax.set_ylabel(column)
+
+    handles = [Line2D([], [], marker="o", linestyle="", color=c)
+               for c in colors]
+    fig.tight_layout(rect=(0, 0, 1 - 1.0 / (n_cols * aspect * 4), 1))
+    fig.legend(handles, labels, title="label", loc="center right",
+               frameon=False)
+    with stage("savefig"):
+        fig.savefig(png, dpi=dpi)
+    plt.close(fig)
+
+
+def plot_binned_histograms(hists, png, dpi=300, kde_only=False, col_wrap=4,
+                           height=3, aspect=1, titles=True, title=None,
+                           alpha=0.4):
+    """
+    Plot histograms with kernel density estimates of allele frequencies
+    from binned counts, one panel per chromosome.
+    :param hists: OrderedDict of (chromosome, label) to BinnedFrequencies
+    :param png: output path
+    :param dpi: dpi of output
+    :param kde_only: only plot kernel density estimates
+    :param col_wrap: number of panels per row
+    :param height: height of a panel in inches
+    :param aspect: width/height ratio of a panel
+    :param titles: whether to title panels with their chromosome
+    :param title: optional title of the last panel
+    :param alpha: opacity of histogram bars
+    """
+    chroms = list(pd.unique([x[0] for x in hists]))
+    labels = list(pd.unique([x[1] for x in hists]))
+    colors = dict(zip(labels, current_colors(len(labels))))
+
+    n_cols = max(min(col_wrap, len(chroms)), 1)
+    n_rows = max(int(np.ceil(len(chroms) / float(col_wrap))), 1)
+    fig, axes = plt.subplots(n_rows, n_cols, squeeze=False, sharex=True,
+                             figsize=(n_cols * height * aspect,
+                                      n_rows * height))
+    axes = axes.flatten()
+    for ax, chrom in zip(axes, chroms):
+        for label in labels:
+            binned = hists.get((chrom, label))
+            if binned is None or binned.counts.sum() == 0:
+                continue
+            with stage("draw", contig=chrom):
+                if not kde_only:
+                    edges = np.linspace(0, 1, len(binned.counts) + 1)
+                    centers = (edges[:-1] + edges[1:]) / 2
+                    ax.hist(centers, bins=edges, weights=binned.counts,
+                            density=True, alpha=alpha, color=colors[label])
+                x, density = binned_kde(binned.grid)
+                ax.plot(x, density, color=colors[label])
+        if ax.get_ylim()[1] > 10:
+            ax.set_ylim(0, 10)
+        ax.set_xlim(-0.5, 1.5)
+        ax.set_ylabel("")
+        if titles:
+            ax.set_title("chromosome = {0}".format(chrom))
+        ax.spines["top"].set_visible(False)
+        ax.spines["right"].set_visible(False)
+    for ax in axes[len(chroms):]:
+        ax.set_visible(False)
+    for ax in axes[:len(chroms)][-n_cols:]:
+        ax.set_xlabel("af")
+    if title is not None:
+        axes[max(len(chroms) - 1, 0)].set_title(title)
+
+    handles = [Line2D([], [], linewidth=2, color=colors[x]) for x in labels]
+    fig.tight_layout(rect=(0, 0, 1 - 1.0 / (n_cols * aspect * 4), 1))
+    fig.legend(handles, labels, title="label", loc="center right",
+               frameon=False)
+    with stage("savefig"):
+        fig.savefig(png, dpi=dpi)
+    plt.close(fig)
+
+
+class RegionRenderer(object):
+    """
+    Reusable figure for plotting many regions of the same kind.
+
+    The figure, axes and styling are created once. For every region,
+    only the data of one artist per label, the axis limits and,
+    when the set of labels changes, the legend are updated
+    before the figure is saved.
+    """
+
+    def __init__(self, kind, dpi=300, title=None, kde_only=False):
+        """
+        :param kind: one of histogram, scatter or distance
+        :param dpi: dpi of output
+        :param title: optional title of every plot
+        :param kde_only: only plot kde for histograms
+        """
+        if kind not in ("histogram", "scatter", "distance"):
+            raise NotImplementedError
+        self.kind = kind
+        self.dpi = dpi
+        self.kde_only = kde_only
+        self._artists = {}
+        self._legend_labels = None
+        if kind == "histogram":
+            self.fig = plt.figure(figsize=(5.5, 3.5))
+            self.ax = self.fig.add_axes((0.12, 0.15, 0.6, 0.75))
+        else:
+            self.fig = plt.figure(figsize=(16, 5))
+            self.ax = self.fig.add_axes((0.06, 0.12, 0.8, 0.78))
+        self.ax.spines["top"].set_visible(False)
+        self.ax.spines["right"].set_visible(False)
+        if kind == "histogram":
+            self.ax.set_xlim(-0.5, 1.5)
+            self.ax.set_xlabel("af")
+        else:
+            self.ax.set_ylim(0, 1.0)
+            self.ax.set_xlabel("pos")
+            self.ax.set_ylabel("af" if kind == "scatter" else kind)
+        if title is not None:
+            self.ax.set_title(title)
+
+    def _label_artists(self, label):
+        """Get artists of a label, creating them on first use"""
+        if label not in self._artists:
+            cycle = plt.rcParams["axes.prop_cycle"].by_key()["color"]
+            color = to_rgb(cycle[len(self._artists) % len(cycle)])
+            if self.kind == "histogram":
+                bars = self.ax.stairs([0], [0, 1], fill=True, alpha=0.4,
+                                      color=color)
+                line, = self.ax.plot([], [], color=color)
+                self._artists[label] = (bars, line)
+            else:
+                points, = self.ax.plot([], [], marker="o", linestyle="",
+                                       alpha=0.3, color=color)
+                self._artists[label] = (points,)
+        return self._artists[label]
+
+    def _update_legend(self, labels):
+        if labels == self._legend_labels:
+            return
+        handles = [self._label_artists(x)[-1] for x in labels]
+        self.ax.legend(handles, labels, title="label", frameon=False,
+                       loc="center left", bbox_to_anchor=(1.02, 0.5))
+        self._legend_labels = labels
+
+    def _draw_histogram(self, df):
+        top = 0
+        labels = []
+        # unlike whole-genome histograms, region histograms show
+        # every label, even if all its frequencies are 0
+        for (_, label), binned in histograms_from_dataframe(
+                df, column="chrom", drop_zero=False).items():
+            bars, line = self._label_artists(label)
+            n = binned.counts.sum()
+            edges = np.linspace(0, 1, len(binned.counts) + 1)
+            density = binned.counts / (n * np.diff(edges))
+            bars.set_data(density, edges)
+            bars.set_visible(not self.kde_only)
+            x, y = binned_kde(binned.grid)
+            line.set_data(x, y)
+            line.set_visible(True)
+            top = max(top, y.max(), 0 if self.kde_only else density.max())
+            labels.append(label)
+        self.ax.set_ylim(0, min(top * 1.05, 10) or 1)
+        return labels
+
+    def _draw_scatter(self, df):
+        column = "af" if self.kind == "scatter" else self.kind
+        labels = label_order(df.label)
+        for label in labels:
+            t = df[df.label == label]
+            self._label_artists(label)[0].set_data(t.pos.values,
+                                                   t[column].values)
+            self._label_artists(label)[0].set_visible(True)
+        lo, hi = float(df.pos.min()), float(df.pos.max())
+        margin = (hi - lo) * 0.05 or 1
+        self.ax.set_xlim(lo - margin, hi + margin)
+        return labels
+
+    def render(self, df, output):
+        """
+        Plot a region and save the figure
+        :param df: region dataframe with pos, af, label, distance
+        and chrom columns
+        :param output: output path
+        """
+        for artists in self._artists.values():
+            for artist in artists:
+                artist.set_visible(False)
+        with stage("draw"):
+            if self.kind == "histogram":
+                labels = self._draw_histogram(df)
+            else:
+                labels = self._draw_scatter(df)
+            self._update_legend(tuple(labels))
+        with stage("savefig"):
+            self.fig.savefig(output, dpi=self.dpi)
+
+    def close(self):
+        plt.close(self.fig)
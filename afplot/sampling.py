@@ -0,0 +1,250 @@
+"""
+afplot.sampling
+~~~~~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+
+import numpy as np
+import pandas as pd
+
+from .columns import AF_DTYPE, DISTANCE_DTYPE, AlleleHistogram, \
+    AlleleTable, _flatten_matrix, as_categorical
+
+
+def _mix(x):
+    """splitmix64 finalizer on an array of uint64"""
+    with np.errstate(over="ignore"):
+        x = x ^ (x >> np.uint64(30))
+        x = x * np.uint64(0xBF58476D1CE4E5B9)
+        x = x ^ (x >> np.uint64(27))
+        x = x * np.uint64(0x94D049BB133111EB)
+        x = x ^ (x >> np.uint64(31))
+    return x
+
+
+def observation_keys(pos, af, distance, seed=0):
+    """
+    Pseudo-random sort keys of observations.
+    A key only depends on the seed and the observation itself,
+    not on the order in which observations are seen.
+    :param pos: array of positions
+    :param af: array of allele frequencies
+    :param distance: array of distances
+    :param seed: integer seed
+    :return: array of uint64
+    """
+    pos = np.asarray(pos).astype(np.uint64)
+    af = np.asarray(af, dtype=AF_DTYPE).view(np.uint32).astype(np.uint64)
+    distance = np.asarray(distance, dtype=DISTANCE_DTYPE)
+    distance = distance.view(np.uint32).astype(np.uint64)
+    x = _mix(np.full(pos.shape, seed, dtype=np.uint64))
+    x = _mix(x ^ pos)
+    return _mix(x ^ ((af << np.uint64(32)) | distance))
+
+
+def stratified_quota(counts, max_points):
+    """
+    Divide max_points over labels proportionally to their counts,
+    with largest remainders getting the leftover points
+    :param counts: array of number of observations per label
+    :param max_points: total number of points
+    :return: array of number of points per label
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    total = counts.sum()
+    if total <= max_points:
+        return counts
+    exact = counts * float(max_points) / total
+    quota = np.floor(exact).astype(np.int64)
+    remainder = exact - quota
+    # stable sort, so that ties go to the first label
+    order = np.argsort(-remainder, kind="mergesort")
+    quota[order[:max_points - quota.sum()]] += 1
+    return quota
+
+
+def select_smallest(keys, codes, quota):
+    """
+    Select the observations with the smallest keys per label
+    :param keys: array of observation keys
+    :param codes: array of label codes
+    :param quota: array of maximum number of observations per label
+    :return: sorted array of selected indices
+    """
+    selected = [np.array([], dtype=np.int64)]
+    for code, q in enumerate(quota):
+        idx = np.flatnonzero(codes == code)
+        if q < len(idx):
+            # ties are broken on index, so selection is deterministic
+            idx = idx[np.lexsort((idx, keys[idx]))[:q]]
+        selected.append(idx)
+    return np.sort(np.concatenate(selected))
+
+
+class ReservoirTable(object):
+    """
+    Label-stratified, seeded sample of at most `max_points` observations.
+
+    Every observation gets a pseudo-random key computed from the seed and
+    its values, and per label only the observations with the smallest
+    keys are retained (bottom-k sampling). The sample therefore does not
+    depend on the order of observations, and tables of adjacent windows
+    concatenate to the same sample as a single table of the whole contig.
+    Labels are represented proportionally to their number of observations.
+    Optionally, every observation is also counted in an AlleleHistogram,
+    so that histograms are not drawn from the sample.
+    """
+
+    def __init__(self, labels, max_points, seed=0, histogram=False):
+        """
+        :param labels: sequence of label names the codes refer to
+        :param max_points: maximum number of sampled observations
+        :param seed: integer seed of the sample
+        :param histogram: whether to count all observations
+        in `histogram`
+        """
+        self.labels = tuple(labels)
+        self.max_points = int(max_points)
+        self.seed = seed
+        self.seen = np.zeros(len(self.labels), dtype=np.int64)
+        self.histogram = AlleleHistogram(self.labels) if histogram else None
+        self._table = AlleleTable(self.labels,
+                                  capacity=min(self.max_points, 4096))
+        self._keys = np.empty(0, dtype=np.uint64)
+
+    def __len__(self):
+        return int(self.seen.sum())
+
+    @classmethod
+    def concatenate(cls, tables):
+        """
+        Merge samples sharing the same labels, size and seed
+        :param tables: non-empty list of ReservoirTable
+        :return: ReservoirTable
+        """
+        first = tables[0]
+        assert all(t.labels == first.labels for t in tables)
+        merged = cls(first.labels, first.max_points, first.seed)
+        for t in tables:
+            merged._add(t._table.pos, t._table.af, t._table.code,
+                        t._table.distance, t._keys)
+            merged.seen += t.seen
+        if first.histogram is not None:
+            merged.histogram = AlleleHistogram.concatenate(
+                [t.histogram for t in tables])
+        merged._compact()
+        return merged
+
+    @classmethod
+    def from_table(cls, table, max_points, seed=0, histogram=False):
+        """
+        Sample an AlleleTable
+        :param table: AlleleTable
+        :param max_points: maximum number of sampled observations
+        :param seed: integer seed of the sample
+        :param histogram: whether to count all observations
+        in `histogram`
+        :return: ReservoirTable
+        """
+        sample = cls(table.labels, max_points, seed, histogram)
+        sample.extend(table.pos, table.af, table.code, table.distance)
+        return sample
+
+    def _add(self, pos, af, code, distance, keys):
+        self._table.extend(pos, af, code, distance)
+        self._keys = np.concatenate([self._keys, keys])
+
+    def _compact(self):
+        """Keep at most max_points observations of every label"""
+        quota = np.full(len(self.labels), self.max_points)
+        keep = select_smallest(self._keys, self._table.code, quota)
+        if len(keep) == len(self._keys):
+            return
+        self._table = self._select(keep)
+        self._keys = self._keys[keep]
+
+    def _select(self, idx):
+        table = AlleleTable(self.labels, capacity=len(idx))
+        table.extend(self._table.pos[idx], self._table.af[idx],
+                     self._table.code[idx], self._table.distance[idx])
+        return table
+
+    def extend(self, pos, af, code, distance):
+        """
+        Sample equally sized arrays of observations
+        :param pos: array of positions
+        :param af: array of allele frequencies
+        :param code: array (or scalar) of label codes
+        :param distance: array of distances to expected frequencies
+        """
+        code = np.broadcast_to(np.asarray(code, dtype=np.int64),
+                               np.shape(pos))
+        self.seen += np.bincount(code, minlength=len(self.labels))
+        if self.histogram is not None:
+            self.histogram.extend(pos, af, code, distance)
+        keys = observation_keys(pos, af, distance, self.seed)
+        self._add(pos, af, code, distance, keys)
+        # compact lazily, so that the cost is amortized over batches
+        if len(self._keys) > 2 * self.max_points * max(len(self.labels), 1):
+            self._compact()
+
+    def extend_matrix(self, pos, counts, af, code, distance):
+        """
+        Sample records with a variable number of alleles
+        :param pos: (n,) array of record positions
+        :param counts: (n,) array of number of alleles per record
+        :param af: (n, k) array of allele frequencies
+        :param code: (n,) array of label codes, or a scalar code
+        :param distance: (n, k) array of distances
+        """
+        self.extend(*_flatten_matrix(pos, counts, af, code, distance))
+
+    def sample(self):
+        """
+        Get the sampled observations, in order of position
+        :return: AlleleTable of at most max_points observations
+        """
+        # sizes of strata follow all observations, not only retained ones
+        quota = stratified_quota(self.seen, self.max_points)
+        return self._select(select_smallest(self._keys, self._table.code,
+                                            quota))
+
+    def to_dataframe(self, chromosome, column="chromosome"):
+        """
+        Create a dataframe of the sampled observations
+        :param chromosome: value to place in the chromosome column
+        :param column: name of the chromosome column
+        :return: pandas DataFrame
+        """
+        return self.sample().to_dataframe(chromosome, column)
+
+
+def downsample_dataframe(df, max_points, seed=0, column="chromosome"):
+    """
+    Sample at most max_points observations per chromosome,
+    with the same keys and strata as ReservoirTable
+    :param df: dataframe with pos, af, label, distance and column columns
+    :param max_points: maximum number of observations per chromosome
+    :param seed: integer seed of the sample
+    :param column: name of the chromosome column
+    :return: pandas DataFrame
+    """
+    if df is None:
+        return None
+    parts = []
+    for _, t in df.groupby(column, sort=False, observed=True):
+        if len(t) <= max_points:
+            parts.append(t)
+            continue
+        labels = as_categorical(t.label)
+        counts = np.bincount(labels.codes, minlength=len(labels.categories))
+        keys = observation_keys(t.pos.values, t.af.values,
+                                t.distance.values, seed)
+        quota = stratified_quota(counts, max_points)
+        idx = select_smallest(keys, labels.codes, quota)
+        parts.append(t.iloc[idx])
+    if not parts:
+        return df
+    return pd.concat(parts)
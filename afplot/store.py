@@ -0,0 +1,189 @@
+"""
+afplot.store
+~~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+
+from collections import OrderedDict
+from os.path import join
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import pandas as pd
+
+from .columns import AF_DTYPE, CODE_DTYPE, DISTANCE_DTYPE, POS_DTYPE, \
+    AlleleTable, concat_frames
+from .sampling import downsample_dataframe
+
+# packed row of a stored observation; 13 bytes
+ROW_DTYPE = np.dtype([("pos", POS_DTYPE), ("af", AF_DTYPE),
+                      ("distance", DISTANCE_DTYPE), ("code", CODE_DTYPE)])
+
+# columns of which storage is optional
+VALUE_COLUMNS = ("af", "distance")
+
+
+def row_dtype(columns=VALUE_COLUMNS):
+    """
+    Get the packed row of stored observations
+    :param columns: value columns to store; subset of VALUE_COLUMNS
+    :return: numpy dtype of pos, the columns and code
+    """
+    names = ["pos"] + [x for x in VALUE_COLUMNS if x in columns] + ["code"]
+    return np.dtype([(x, ROW_DTYPE[x]) for x in names])
+
+
+class AlleleStore(object):
+    """
+    Memory-bounded store of allele frequency tables per contig.
+
+    Tables are kept as packed typed rows instead of DataFrames.
+    When the rows held in memory exceed `memory_limit` bytes,
+    they are written to memory-mapped files in a temporary directory,
+    and read back from disk, one contig at a time, when plotting.
+    Only the value columns needed by the plots are stored.
+    When tables are samples, histograms of all observations
+    may be kept next to them in `histograms`.
+    """
+
+    def __init__(self, memory_limit=None, max_points=None, seed=0,
+                 columns=VALUE_COLUMNS):
+        """
+        :param memory_limit: maximum number of bytes of rows kept in memory.
+        Unlimited if not given
+        :param max_points: optional maximum number of observations per
+        contig returned by `contig_frame`
+        :param seed: seed of the sample of max_points
+        :param columns: value columns to store; subset of VALUE_COLUMNS.
+        Columns that are not stored are NaN in `contig_frame`
+        """
+        self.memory_limit = memory_limit
+        self.max_points = max_points
+        self.seed = seed
+        self.dtype = row_dtype(columns)
+        self.columns = tuple(x for x in self.dtype.names
+                             if x in VALUE_COLUMNS)
+        self.memory_bytes = 0
+        self.spilled_bytes = 0
+        self.labels = []
+        # OrderedDict of (contig, label) to AlleleHistogram, if counted
+        self.histograms = None
+        self._parts = OrderedDict()
+        self._tmpdir = None
+        self._n_files = 0
+        self._min = {}
+        self._max = {}
+
+    def __len__(self):
+        return sum(len(rows) for parts in self._parts.values()
+                   for _, rows in parts)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def contigs(self):
+        """Contigs with observations, in order of addition"""
+        return list(self._parts.keys())
+
+    def add(self, chromosome, table):
+        """
+        Add a table of observations of a contig
+        :param chromosome: contig name
+        :param table: AlleleTable
+        """
+        if len(table) == 0:
+            return
+        rows = np.empty(len(table), dtype=self.dtype)
+        for column in self.dtype.names:
+            rows[column] = getattr(table, column)
+        for code in pd.unique(table.code):
+            if table.labels[code] not in self.labels:
+                self.labels.append(table.labels[code])
+        for column in ("pos", ) + self.columns:
+            values = rows[column]
+            lo, hi = np.nanmin(values), np.nanmax(values)
+            self._min[column] = min(self._min.get(column, lo), lo)
+            self._max[column] = max(self._max.get(column, hi), hi)
+        self._parts.setdefault(chromosome, []).append((table.labels, rows))
+        self.memory_bytes += rows.nbytes
+        if self.memory_limit is not None and \
+                self.memory_bytes > self.memory_limit:
+            self.spill()
+
+    def spill(self):
+        """Write all rows held in memory to memory-mapped files"""
+        if self._tmpdir is None:
+            self._tmpdir = TemporaryDirectory(prefix="afplot-")
+        for chromosome, parts in self._parts.items():
+            for j, (labels, rows) in enumerate(parts):
+                if isinstance(rows, np.memmap):
+                    continue
+                path = join(self._tmpdir.name,
+                            "{0}.rows".format(self._n_files))
+                self._n_files += 1
+                mapped = np.memmap(path, dtype=self.dtype, mode="w+",
+                                   shape=rows.shape)
+                mapped[:] = rows
+                mapped.flush()
+                del mapped
+                parts[j] = (labels, np.memmap(path, dtype=self.dtype,
+                                              mode="r", shape=rows.shape))
+                self.spilled_bytes += rows.nbytes
+        self.memory_bytes = 0
+
+    def value_range(self, column):
+        """
+        Get the minimum and maximum of a column over all contigs
+        :param column: pos or a stored value column
+        :return: tuple of (min, max)
+        """
+        return float(self._min[column]), float(self._max[column])
+
+    def contig_frame(self, chromosome, column="chromosome"):
+        """
+        Get the observations of a contig as a dataframe,
+        sampled to max_points if set
+        :param chromosome: contig name
+        :param column: name of the chromosome column
+        :return: pandas DataFrame
+        """
+        frames = []
+        for labels, rows in self._parts.get(chromosome, []):
+            table = AlleleTable(labels, capacity=len(rows))
+            missing = np.full(len(rows), np.nan)
+            table.extend(rows["pos"],
+                         rows["af"] if "af" in self.columns else missing,
+                         rows["code"],
+                         rows["distance"] if "distance" in self.columns
+                         else missing)
+            frames.append(table.to_dataframe(chromosome, column))
+        df = concat_frames(frames)
+        if self.max_points is not None:
+            df = downsample_dataframe(df, self.max_points, self.seed, column)
+        return df
+
+    def iter_frames(self):
+        """Generator of (contig, DataFrame) of every contig"""
+        for chromosome in self.contigs:
+            yield chromosome, self.contig_frame(chromosome)
+
+    def to_dataframe(self):
+        """
+        Get all observations as a single dataframe
+        :return: pandas DataFrame
+        """
+        return concat_frames([x[1] for x in self.iter_frames()])
+
+    def close(self):
+        """Remove spilled files"""
+        self._parts = OrderedDict()
+        self.memory_bytes = 0
+        if self._tmpdir is not None:
+            self._tmpdir.cleanup()
+            self._tmpdir = None
@@ -0,0 +1,123 @@
+"""
+afplot.table
+~~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+
+import pandas as pd
+
+from .columns import as_categorical, concat_frames
+
+COLUMNS = ["pos", "af", "label", "distance", "chromosome"]
+CATEGORICAL_COLUMNS = ["label", "chromosome"]
+FEATHER_SUFFIXES = (".feather", ".arrow")
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("pyarrow is required for reading and writing "
+                          "allele frequency tables. "
+                          "Install it with `pip install afplot[table]`")
+    return pyarrow
+
+
+def is_feather(path):
+    return path.endswith(FEATHER_SUFFIXES)
+
+
+def _schema(pa):
+    """Arrow schema of tables; the same for every row group"""
+    return pa.schema([("pos", pa.int32()),
+                      ("af", pa.float32()),
+                      ("label", pa.string()),
+                      ("distance", pa.float32()),
+                      ("chromosome", pa.string())])
+
+
+def _categorize(df):
+    """Make label and chromosome columns categorical"""
+    for col in CATEGORICAL_COLUMNS:
+        df[col] = as_categorical(df[col])
+    return df
+
+
+def write_table(frames, path):
+    """
+    Write allele frequency dataframes to a columnar file.
+    Parquet files get one row group per dataframe, so that readers
+    can skip contigs they do not need.
+    Paths ending in .feather or .arrow are written as a single Feather file.
+    :param frames: iterable of DataFrames, typically one per contig
+    :param path: output path
+    :return: number of rows written
+    """
+    pa = _import_pyarrow()
+    if is_feather(path):
+        frames = list(frames)
+        if frames:
+            df = concat_frames(frames)
+        else:
+            df = pd.DataFrame({x: [] for x in COLUMNS})
+        df[COLUMNS].reset_index(drop=True).to_feather(path)
+        return len(df)
+
+    schema = _schema(pa)
+    writer = None
+    n_rows = 0
+    try:
+        for df in frames:
+            # categorical columns are stored as plain strings,
+            # so that all row groups share one schema
+            t = pa.Table.from_pandas(df[COLUMNS], schema=schema,
+                                     preserve_index=False)
+            if writer is None:
+                writer = pa.parquet.ParquetWriter(path, schema)
+            writer.write_table(t, row_group_size=max(len(df), 1))
+            n_rows += len(df)
+        if writer is None:
+            pa.parquet.write_table(schema.empty_table(), path)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n_rows
+
+
+def read_table(path, contigs=None):
+    """
+    Read an allele frequency table written by write_table
+    :param path: path to Parquet or Feather file
+    :param contigs: optional list of contigs to read.
+    For Parquet files, row groups of other contigs are not read.
+    :return: pandas DataFrame with categorical label and chromosome
+    """
+    pa = _import_pyarrow()
+    if is_feather(path):
+        df = pd.read_feather(path)
+        if contigs is not None:
+            df = df[df.chromosome.isin(list(contigs))].reset_index(drop=True)
+        return _categorize(df)
+    filters = None
+    if contigs is not None:
+        filters = [("chromosome", "in", list(contigs))]
+    df = pa.parquet.read_table(path, filters=filters).to_pandas()
+    return _categorize(df)
+
+
+def table_contigs(path):
+    """
+    Get contigs present in a table, in order of appearance
+    :param path: path to Parquet or Feather file
+    :return: list of contig names
+    """
+    pa = _import_pyarrow()
+    if is_feather(path):
+        chroms = pd.read_feather(path, columns=["chromosome"]).chromosome
+    else:
+        chroms = pa.parquet.read_table(
+            path, columns=["chromosome"]).to_pandas().chromosome
+    return list(pd.unique(chroms))
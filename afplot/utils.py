@@ -9,17 +9,24 @@ afplot.utils
 
 import re
 from collections import namedtuple
-import vcf
+from itertools import islice
+from os.path import splitext
 
 Region = namedtuple("Region", ["chr", "start", "end"])
 
+# name of the facet of contigs below the size thresholds
+OTHER_CONTIG = "other"
 
-def _is_vcf_version_at_least_0_6_8(pyvcf=vcf):
+
+def _is_vcf_version_at_least_0_6_8(pyvcf=None):
     """
     The behaviour of vcfReader.fetch changed significantly
     from version 0.6.8 onwards
+    :param pyvcf: vcf module. Defaults to the installed PyVCF
     :return: boolean
     """
+    if pyvcf is None:
+        import vcf as pyvcf
     major, minor, patch = pyvcf.VERSION.split(".")
     if int(major) == 0 and int(minor) == 6 and int(patch) >= 8:
         return True
@@ -30,9 +37,6 @@ def _is_vcf_version_at_least_0_6_8(pyvcf=vcf):
     return False
 
 
-NEW_VCF = _is_vcf_version_at_least_0_6_8()
-
-
 def get_longest_contig_list(readers):
     """
     Get the largest list of contig names from a list of readers
@@ -51,7 +55,102 @@ def get_contigs(readers, exclude_patterns):
     :param exclude_patterns: Regex patterns to exclude
     :return: list of usable contig names
     """
-    contigs = get_longest_contig_list(readers)
+    return exclude_contigs(get_longest_contig_list(readers),
+                           exclude_patterns)
+
+
+def drop_empty_contigs(contigs, readers):
+    """
+    Remove contigs without records in the indexes of all readers,
+    so that they are never fetched.
+    If the index of any reader cannot be read, no contig is removed
+    :param contigs: list of contig names
+    :param readers: list of VariantReader
+    :return: list of contig names
+    """
+    indexes = [getattr(r, "record_counts", None) for r in readers]
+    if any(x is None for x in indexes):
+        return list(contigs)
+    return [c for c in contigs
+            if any(c in x and x[c] != 0 for x in indexes)]
+
+
+def contig_sizes(readers):
+    """
+    Get the length and number of records of every contig of readers.
+    Records of the same VCF file are counted once
+    :param readers: list of VariantReader
+    :return: tuple of (dict of contig to length, dict of contig to
+    number of records). Contigs without known number are absent
+    """
+    lengths = {}
+    counts = {}
+    seen = set()
+    for r in readers:
+        for name, contig in r.contigs.items():
+            if contig.length is not None:
+                lengths[name] = max(lengths.get(name, 0), contig.length)
+        if r.path in seen:
+            continue
+        seen.add(r.path)
+        for name, n in (getattr(r, "record_counts", None) or {}).items():
+            if n is not None:
+                counts[name] = counts.get(name, 0) + n
+    return lengths, counts
+
+
+def group_small_contigs(contigs, lengths=None, counts=None, min_length=None,
+                        min_records=None, other=OTHER_CONTIG):
+    """
+    Assign contigs below a length or record count threshold
+    to a single combined facet.
+    Contigs of which the length or count is not known are not grouped
+    on that threshold
+    :param contigs: list of contig names
+    :param lengths: dict of contig to length
+    :param counts: dict of contig to number of records
+    :param min_length: contigs shorter than this are grouped
+    :param min_records: contigs with fewer records than this are grouped
+    :param other: name of the combined facet
+    :return: dict of grouped contig to facet name
+    """
+    lengths = lengths or {}
+    counts = counts or {}
+    facets = {}
+    for c in contigs:
+        short = min_length is not None and c in lengths and \
+            lengths[c] < min_length
+        sparse = min_records is not None and c in counts and \
+            counts[c] < min_records
+        if short or sparse:
+            facets[c] = other
+    return facets
+
+
+def facet_order(contigs, facets):
+    """
+    Get facets in order of their first contig
+    :param contigs: list of contig names
+    :param facets: dict of contig to facet name, for grouped contigs
+    :return: list of facet names
+    """
+    order = []
+    seen = set()
+    for c in contigs:
+        f = facets.get(c, c)
+        if f not in seen:
+            seen.add(f)
+            order.append(f)
+    return order
+
+
+def exclude_contigs(contigs, exclude_patterns):
+    """
+    Remove contigs matching any of a list of patterns
+    :param contigs: list of contig names
+    :param exclude_patterns: Regex patterns to exclude
+    :return: list of contig names
+    """
     for pattern in exclude_patterns:
         regex = re.compile(pattern)
         contigs = [x for x in contigs if not regex.match(x)]
@@ -67,6 +166,43 @@ def region_key(r):
     return "{0}_{1}-{2}".format(r.chr, r.start, r.end)
 
 
+def kind_path(path, kind):
+    """
+    Insert a plot kind before the extension of a path
+    :param path: output path, e.g. plot.png
+    :param kind: plot kind, e.g. scatter
+    :return: str, e.g. plot.scatter.png
+    """
+    root, ext = splitext(path)
+    return "{0}.{1}{2}".format(root, kind, ext or ".png")
+
+
+def merge_regions(regions, max_gap=0, max_length=None):
+    """
+    Merge regions on a single contig into blocks.
+    Regions overlapping or separated by at most max_gap
+    bases are placed in the same block, unless the block
+    would become longer than max_length. A single region
+    longer than max_length forms a block of its own.
+    :param regions: list of Region on the same contig, sorted on start
+    :param max_gap: maximum distance between regions in one block
+    :param max_length: optional maximum length of a block
+    :return: list of (start, end, indices) of every block,
+    where indices refer to the members in regions
+    """
+    blocks = []
+    for i, r in enumerate(regions):
+        start, end = int(r.start), int(r.end)
+        fits = max_length is None or not blocks or \
+            max(blocks[-1][1], end) - blocks[-1][0] <= max_length
+        if blocks and fits and start <= blocks[-1][1] + max_gap:
+            blocks[-1][1] = max(blocks[-1][1], end)
+            blocks[-1][2].append(i)
+        else:
+            blocks.append([start, end, [i]])
+    return [tuple(x) for x in blocks]
+
+
 def bed_reader(path, margin=0):
     """
     Generator of Regions for a bed file
@@ -86,3 +222,34 @@ def bed_reader(path, margin=0):
                 start=start,
                 end=int(s[2])+margin
             )
+
+
+def chunked(iterable, size):
+    """
+    Generator of lists of at most size items from an iterable
+    :param iterable: any iterable
+    :param size: maximum chunk size
+    :return: generator of lists
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def split_contig(length, chunk_size=None):
+    """
+    Split a contig into consecutive 0-based half-open windows.
+    The last window is open-ended, so that records beyond
+    the contig length in the header are not lost.
+    :param length: length of contig
+    :param chunk_size: size of windows. If not given, a single
+    window covering the entire contig is returned
+    :return: list of (start, end) tuples; end may be None
+    """
+    if not chunk_size or length is None or length <= chunk_size:
+        return [(None, None)]
+    starts = list(range(0, length, chunk_size))
+    return [(s, s + chunk_size) for s in starts[:-1]] + [(starts[-1], None)]
@@ -6,6 +6,16 @@ afplot.variation
 :license: MIT
 """
 
+from collections import namedtuple
+
+import numpy as np
+
+from .constants import CALL_TYPES
+
+MISSING = -1
+# number of records processed per vectorized batch
+BATCH_SIZE = 4096
+
 
 def get_all_allele_freqs(record, sample_name):
     fmt = record.genotype(sample_name)
@@ -86,3 +96,311 @@ def get_distance_to_exp(record, sample_name):
         return distances
     else:
         raise NotImplementedError
+
+
+CallArrays = namedtuple("CallArrays",
+                        ["pos", "ref_len", "n_alleles",
+                         "ad", "n_ad", "gt", "gq", "passed", "snv"])
+CallArrays.__doc__ = """
+Call data of a single sample for a chunk of records.
+
+pos: (n,) record positions
+ref_len: (n,) length of the reference allele
+n_alleles: (n,) number of alleles (including ref) per record
+ad: (n, k) allelic depths, padded with zeros
+n_ad: (n,) number of AD values per record; 0 if AD is missing
+gt: (n, p) allele indices of the genotype. Missing alleles are -1;
+    genotypes of lower ploidy are padded with their first allele
+gq: (n,) genotype quality; -1 if missing
+passed: (n,) whether FILTER is PASS
+snv: (n,) whether all alleles are single bases
+"""
+
+
+def subset_arrays(arrays, mask):
+    """
+    Select records from CallArrays
+    :param arrays: CallArrays
+    :param mask: boolean array or index array of records to keep
+    :return: CallArrays
+    """
+    return CallArrays(*[x[mask] for x in arrays])
+
+
+CallFilter = namedtuple("CallFilter",
+                        ["min_depth", "min_gq", "pass_only", "call_types",
+                         "snv_only", "biallelic_only"],
+                        defaults=(None, None, False, None, False, False))
+CallFilter.__doc__ = """
+Conditions a call must meet to be extracted.
+
+min_depth: minimum sum of AD values
+min_gq: minimum genotype quality; calls without GQ are removed
+pass_only: only keep records of which FILTER is PASS
+call_types: optional sequence of CALL_TYPES to keep
+snv_only: only keep records of which all alleles are single bases
+biallelic_only: only keep records with exactly one alternative allele
+"""
+
+
+def is_active(call_filter):
+    """Whether a CallFilter removes anything"""
+    return call_filter is not None and any(
+        x is not None and x is not False for x in call_filter)
+
+
+def record_mask(n_alleles, passed, snv, call_filter):
+    """
+    Get the records meeting the conditions of a filter that
+    do not depend on the sample
+    :param n_alleles: (n,) array of number of alleles per record
+    :param passed: (n,) boolean array, True if FILTER is PASS
+    :param snv: (n,) boolean array, True if all alleles are single bases
+    :param call_filter: CallFilter
+    :return: boolean array
+    """
+    keep = np.ones(len(passed), dtype=bool)
+    if call_filter.pass_only:
+        keep &= passed
+    if call_filter.snv_only:
+        keep &= snv
+    if call_filter.biallelic_only:
+        keep &= n_alleles == 2
+    return keep
+
+
+def filter_calls(arrays, call_filter=None):
+    """
+    Remove calls not meeting the conditions of a filter,
+    before any allele frequency is computed
+    :param arrays: CallArrays
+    :param call_filter: optional CallFilter
+    :return: CallArrays
+    """
+    if not is_active(call_filter):
+        return arrays
+    keep = record_mask(arrays.n_alleles, arrays.passed, arrays.snv,
+                       call_filter)
+    if call_filter.min_depth is not None:
+        keep &= arrays.ad.sum(axis=1) >= call_filter.min_depth
+    if call_filter.min_gq is not None:
+        keep &= arrays.gq >= call_filter.min_gq
+    if call_filter.call_types:
+        types = get_variant_type_batch(arrays.gt, arrays.gq)
+        codes = [CALL_TYPES.index(x) for x in call_filter.call_types]
+        keep &= np.isin(types, codes)
+    if keep.all():
+        return arrays
+    return subset_arrays(arrays, keep)
+
+
+def _widen(arr, width, fill_first=False):
+    """
+    Widen 2d array to width columns
+    :param arr: 2d array
+    :param width: number of columns
+    :param fill_first: pad with first column instead of zeros
+    :return: 2d array
+    """
+    if arr.shape[1] >= width:
+        return arr
+    if fill_first:
+        pad = np.repeat(arr[:, :1], width - arr.shape[1], axis=1)
+    else:
+        pad = np.zeros((arr.shape[0], width - arr.shape[1]), dtype=arr.dtype)
+    return np.hstack([arr, pad])
+
+
+def concatenate_arrays(chunks):
+    """
+    Concatenate CallArrays of consecutive chunks of records
+    :param chunks: non-empty list of CallArrays
+    :return: CallArrays
+    """
+    if len(chunks) == 1:
+        return chunks[0]
+    ad_width = max(x.ad.shape[1] for x in chunks)
+    gt_width = max(x.gt.shape[1] for x in chunks)
+    fields = {}
+    for name in CallArrays._fields:
+        parts = [getattr(x, name) for x in chunks]
+        if name == "ad":
+            parts = [_widen(x, ad_width) for x in parts]
+        elif name == "gt":
+            parts = [_widen(x, gt_width, True) for x in parts]
+        fields[name] = np.concatenate(parts)
+    return CallArrays(**fields)
+
+
+def _pad_matrix(rows, width, fill):
+    """
+    Create padded 2d integer array from list of lists
+    :param rows: list of lists of ints
+    :param width: minimum width of the array
+    :param fill: function of row returning value to pad row with
+    :return: numpy array
+    """
+    width = max([width] + [len(x) for x in rows])
+    arr = np.empty((len(rows), width), dtype=np.int32)
+    for i, row in enumerate(rows):
+        arr[i, :len(row)] = row
+        arr[i, len(row):] = fill(row)
+    return arr
+
+
+def _gt_fill(row):
+    return row[0] if len(row) > 0 else MISSING
+
+
+def build_call_arrays(pos, ref_len, n_alleles, ads, gts, gq, passed, snv):
+    """
+    Create CallArrays from per-record python values
+    :param pos: list of positions
+    :param ref_len: list of reference allele lengths
+    :param n_alleles: list of number of alleles per record
+    :param ads: list of AD lists; missing values may be None.
+    Use an empty list or a list of only None values if AD is missing
+    :param gts: list of GT allele index lists; missing alleles are None
+    :param gq: list of GQ values; None if missing
+    :param passed: list of booleans, True if FILTER is PASS
+    :param snv: list of booleans, True if all alleles are single bases
+    :return: CallArrays
+    """
+    ads = [[0 if x is None else x for x in ad]
+           if any(x is not None for x in ad) else [] for ad in ads]
+    gts = [gt if all(x is not None for x in gt) else [] for gt in gts]
+    return CallArrays(
+        pos=np.array(pos, dtype=np.int64),
+        ref_len=np.array(ref_len, dtype=np.int32),
+        n_alleles=np.array(n_alleles, dtype=np.int32),
+        ad=_pad_matrix(ads, 1, lambda _: 0),
+        n_ad=np.array([len(x) for x in ads], dtype=np.int32),
+        gt=_pad_matrix(gts, 2, _gt_fill),
+        gq=np.array([MISSING if x is None else x for x in gq],
+                    dtype=np.int32),
+        passed=np.array(passed, dtype=bool),
+        snv=np.array(snv, dtype=bool)
+    )
+
+
+def record_passed(filters):
+    """
+    Whether the FILTER field of a record is PASS
+    :param filters: list of filter names, as given by PyVCF (an empty list
+    for PASS, None for a missing value) or pysam (["PASS"])
+    :return: bool
+    """
+    return filters is not None and \
+        all(x == "PASS" for x in filters)
+
+
+def is_snv(ref, alts):
+    """
+    Whether all alleles of a record are single bases
+    :param ref: reference allele
+    :param alts: list of alternative alleles; PyVCF allele objects or str.
+    Missing (None) alternative alleles are ignored
+    :return: bool
+    """
+    return len(ref) == 1 and all(len(str(x)) == 1
+                                 for x in alts or [] if x is not None)
+
+
+def records_to_arrays(records, sample_name):
+    """
+    Collect call data of one sample for a chunk of PyVCF records
+    :param records: list of VCF records
+    :param sample_name: sample name
+    :return: CallArrays
+    """
+    ads = []
+    gts = []
+    gq = []
+    for record in records:
+        fmt = record.genotype(sample_name)
+        ads.append(getattr(fmt.data, "AD", None) or [])
+        gq.append(getattr(fmt.data, "GQ", None))
+        if fmt.called:
+            gts.append([int(x) for x in fmt.gt_alleles])
+        else:
+            gts.append([])
+    return build_call_arrays([x.POS for x in records],
+                             [len(x.REF) for x in records],
+                             [len(x.alleles) for x in records],
+                             ads, gts, gq,
+                             [record_passed(x.FILTER) for x in records],
+                             [is_snv(x.REF, x.ALT) for x in records])
+
+
+def get_all_allele_freqs_batch(ad, n_ad):
+    """
+    Vectorized version of get_all_allele_freqs
+    :param ad: (n, k) array of allelic depths
+    :param n_ad: (n,) array of number of AD values per record
+    :return: (n, k) array of allele frequencies.
+    Only the first n_ad values of every row are meaningful.
+    """
+    valid = np.arange(ad.shape[1])[None, :] < n_ad[:, None]
+    ad = np.where(valid, ad, 0).astype(np.float64)
+    totals = ad.sum(axis=1)
+    freqs = np.zeros_like(ad)
+    nonzero = totals > 0
+    freqs[nonzero] = ad[nonzero] / totals[nonzero, None]
+    return freqs
+
+
+def get_variant_type_batch(gt, gq):
+    """
+    Vectorized version of get_variant_type
+    :param gt: (n, p) array of genotype allele indices
+    :param gq: (n,) array of genotype qualities
+    :return: (n,) array of codes indexing into CALL_TYPES
+    """
+    called = np.all(gt >= 0, axis=1)
+    same = np.all(gt == gt[:, :1], axis=1)
+    types = np.full(len(gt), CALL_TYPES.index("hom_alt"), dtype=np.int8)
+    types[same & (gt[:, 0] == 0)] = CALL_TYPES.index("hom_ref")
+    types[~same] = CALL_TYPES.index("het")
+    types[~called | (gq == 0)] = CALL_TYPES.index("no_call")
+    return types
+
+
+def get_distance_to_exp_batch(freqs, gt, types, n_ad=None, n_alleles=None):
+    """
+    Vectorized version of get_distance_to_exp
+    :param freqs: (n, k) array of allele frequencies
+    :param gt: (n, p) array of genotype allele indices
+    :param types: (n,) array of call type codes
+    :param n_ad: optional (n,) array of number of AD values per record
+    :param n_alleles: optional (n,) array of number of alleles per record
+    :return: (n, k) array of distances
+    """
+    if n_ad is not None and n_alleles is not None:
+        assert np.all((n_ad == 0) | (n_ad == n_alleles))
+    idx = np.arange(freqs.shape[1])
+    types = types[:, None]
+    dists = freqs.copy()
+    hom_ref = (types == CALL_TYPES.index("hom_ref")) & (idx == 0)
+    hom_alt = ((types == CALL_TYPES.index("hom_alt")) &
+               (idx[None, :] == gt[:, :1]))
+    het = ((types == CALL_TYPES.index("het")) &
+           np.any(gt[:, :, None] == idx[None, None, :], axis=1))
+    dists[hom_ref | hom_alt] = 1 - freqs[hom_ref | hom_alt]
+    dists[het] = np.abs(0.5 - freqs[het])
+    dists[np.broadcast_to(types == CALL_TYPES.index("no_call"),
+                          dists.shape)] = 0
+    return dists
+
+
+def get_batch_stats(arrays):
+    """
+    Get allele frequencies, call types and distances for
+    a chunk of records in one pass
+    :param arrays: CallArrays
+    :return: tuple of (freqs, types, distances) arrays
+    """
+    freqs = get_all_allele_freqs_batch(arrays.ad, arrays.n_ad)
+    types = get_variant_type_batch(arrays.gt, arrays.gq)
+    dists = get_distance_to_exp_batch(freqs, arrays.gt, types,
+                                      arrays.n_ad, arrays.n_alleles)
+    return freqs, types, dists
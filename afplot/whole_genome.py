@@ -7,142 +7,598 @@ afplot.whole_genome
 """
 
 from __future__ import print_function
-import sys
 from collections import OrderedDict
 
-import numpy as np
 import matplotlib
 matplotlib.use('Agg')
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
-import progressbar
-import seaborn as sns
 
-from .utils import NEW_VCF
-from .variation import get_all_allele_freqs, \
-    get_distance_to_exp, get_variant_type
+from .columns import AlleleHistogram, AlleleTable, as_categorical, \
+    concat_frames, \
+    histograms_from_dataframe, merge_histograms
+from .constants import KINDS
+from .parallel import ordered_map, worker_reader
+from .profiling import profile_iter, stage
+from .progress import Progress
+from .reader import as_reader
+from .render import label_order, plot_binned_facets, \
+    plot_binned_histograms
+from .sampling import ReservoirTable, downsample_dataframe
+from .store import AlleleStore, VALUE_COLUMNS
+from .utils import kind_path, split_contig
+from .variation import CALL_TYPES, filter_calls, get_batch_stats, \
+    is_active, subset_arrays
+
 
+# value column read by every kind of plot
+KIND_COLUMNS = {"histogram": "af", "scatter": "af", "distance": "distance"}
 
-def get_array_for_chrom_all(reader, chromosome, label=None, sample=None):
+
+def kind_columns(kinds):
     """
-    Get MAF array for a contig from a reader
-    :param reader: vcf reader object (must be tabixxed)
-    :param chromosome: contig name
-    :return: 4d-array of POS:AF:TYPE:DISTANCE
+    Get the value columns needed to draw plots
+    :param kinds: sequence of plot kinds
+    :return: tuple of column names
     """
+    return tuple(x for x in VALUE_COLUMNS
+                 if x in set(KIND_COLUMNS[k] for k in kinds))
+
 
-    maf = []
+def get_arrays_for_chrom_multi(reader, chromosome, samples, labels,
+                               progress=True, start=None, end=None,
+                               table_class=AlleleTable, table_options=None,
+                               call_filter=None):
+    """
+    Get allele frequency tables of several samples for a contig
+    in a single pass over the reader
+    :param reader: VariantReader or vcf reader object (must be tabixxed)
+    :param chromosome: contig name
+    :param samples: list of sample names
+    :param labels: list of labels, one per sample.
+    Observations of samples with a label of None are labelled on call type
+    :param progress: whether to report progress, or a Progress
+    shared with other contigs
+    :param start: optional 0-based start of window within the contig
+    :param end: optional 0-based exclusive end of window.
+    Only records *starting* within the window are used, so that
+    adjacent windows never share a record.
+    :param table_class: class collecting observations;
+    AlleleTable, AlleleHistogram to only keep binned counts,
+    or ReservoirTable to keep a sample of observations
+    :param table_options: dict of extra arguments to table_class
+    :param call_filter: optional CallFilter; calls not meeting it are
+    removed before allele frequencies are computed
+    :return: list of table_class, one per sample
+    """
+    reader = as_reader(reader)
+    table_options = table_options or {}
+    tables = [table_class(CALL_TYPES, **table_options) if label is None
+              else table_class([label], **table_options) for label in labels]
     l = reader.contigs.get(chromosome).length
+    if start is None:
+        iterator = reader.fetch_sample_arrays(chromosome, samples,
+                                              call_filter=call_filter)
+    else:
+        # an open-ended window also reads records beyond the header length
+        iterator = reader.fetch_sample_arrays(chromosome, samples,
+                                              start, end,
+                                              call_filter=call_filter)
+    # bases of the window are the unit of progress
+    reached = start or 0
+    stop = end or l
+    own_progress = not isinstance(progress, Progress)
+    if own_progress:
+        progress = Progress(stop - reached if stop else None,
+                            enabled=bool(progress))
+    progress.start_contig(chromosome)
+    kept = 0
+    for batch in profile_iter("read", iterator, contig=chromosome):
+        n_records = len(batch[0].pos)
+        if start is not None:
+            keep = batch[0].pos > start
+            if end is not None:
+                keep &= batch[0].pos <= end
+            if not keep.any():
+                progress.update(records=n_records)
+                continue
+            batch = [subset_arrays(x, keep) for x in batch]
+        for table, label, arrays in zip(tables, labels, batch):
+            with stage("filter", contig=chromosome):
+                arrays = filter_calls(arrays, call_filter)
+            with stage("variation", contig=chromosome):
+                freqs, types, dists = get_batch_stats(arrays)
+            code = types if label is None else 0
+            with stage("table", contig=chromosome):
+                table.extend_matrix(arrays.pos, arrays.n_ad,
+                                    freqs, code, dists)
+        size = sum(len(x) for x in tables)
+        pos = int(batch[0].pos[-1])
+        new = max(min(pos, stop), reached) if stop else reached
+        progress.update(n_records, size - kept, new - reached)
+        kept, reached = size, new
+    if stop:
+        progress.update(done=stop - reached)
+    if own_progress:
+        progress.finish()
+    return tables
+
+
+def get_array_for_chrom_all(reader, chromosome, label=None, sample=None,
+                            progress=True, start=None, end=None,
+                            call_filter=None):
+    """
+    Get allele frequency table for a contig from a reader
+    :param reader: VariantReader or vcf reader object (must be tabixxed)
+    :param chromosome: contig name
+    :param label: optional label for all observations.
+    If not given, observations are labelled on call type
+    :param sample: sample name. Defaults to first sample in reader
+    :param progress: whether to show a progress bar
+    :param start: optional 0-based start of window within the contig
+    :param end: optional 0-based exclusive end of window
+    :param call_filter: optional CallFilter of calls to keep
+    :return: AlleleTable of POS:AF:LABEL:DISTANCE
+    """
+    reader = as_reader(reader)
     if not sample:
         sample = reader.samples[0]
-    with progressbar.ProgressBar(max_value=l, redirect_stdout=True) as bar:
-        try:
-            if NEW_VCF:
-                iterator = reader.fetch(chromosome, 0)
-            else:
-                iterator = reader.fetch(chromosome, 1, l)
-        except ValueError:
-            return np.array(maf)
-        for record in iterator:
-            bar.update(record.POS)
-            ad = get_all_allele_freqs(record, sample)
-            distances = get_distance_to_exp(record, sample)
-            if len(ad) == 0:
-                continue
-            for freq, dist in zip(ad, distances):
-                if not label:
-                    maf.append([record.POS, freq,
-                                get_variant_type(record, sample), dist])
+    return get_arrays_for_chrom_multi(reader, chromosome, [sample], [label],
+                                      progress, start, end,
+                                      call_filter=call_filter)[0]
+
+
+def _extract_window(task):
+    """
+    Extract a window of a contig in a worker process
+    :param task: tuple of (path, backend, chromosome, labels, samples,
+    start, end, table_class, table_options, call_filter)
+    :return: tuple of (number of records read, list of table_class)
+    """
+    (path, backend, chromosome, labels, samples,
+     start, end, cls, options, call_filter) = task
+    reader = worker_reader(path, backend)
+    # only counts; progress is reported by the main process
+    counter = Progress(enabled=False)
+    tables = get_arrays_for_chrom_multi(reader, chromosome, samples, labels,
+                                        progress=counter, start=start,
+                                        end=end, table_class=cls,
+                                        table_options=options,
+                                        call_filter=call_filter)
+    return counter.records, tables
+
+
+def _group_by_file(readers, labels, samples):
+    """
+    Group samples by VCF file, so that every file is read only once
+    :return: list of (reader, indices, labels, samples) tuples
+    """
+    groups = OrderedDict()
+    for i, (r, l, s) in enumerate(zip(readers, labels, samples)):
+        if len(readers) == 1:
+            l = None
+        key = (r.path, r.backend)
+        if key not in groups:
+            groups[key] = (r, [], [], [])
+        groups[key][1].append(i)
+        groups[key][2].append(l)
+        groups[key][3].append(s)
+    return list(groups.values())
+
+
+def _facet_name(chrom, facets):
+    if facets is None:
+        return chrom
+    return facets.get(chrom, chrom)
+
+
+def _cache_options(call_filter):
+    """Extraction options making up the cache key of a table"""
+    if not is_active(call_filter):
+        return {}
+    return {"call_filter": call_filter._asdict()}
+
+
+def _iter_tables(readers, labels, samples, contigs, threads=1,
+                 chunk_size=None, cache=None, table_class=AlleleTable,
+                 table_options=None, facets=None, call_filter=None):
+    """
+    Generator of (index, contig, table) for every sample and contig.
+    With facets, grouped contigs are yielded with their facet name.
+    Tables are yielded as soon as their contig has been extracted,
+    per VCF file and in order of contigs, so that no more than a few
+    contigs are held in memory at any time.
+    Only AlleleTables are stored in the cache. With a cache, contigs
+    are therefore always extracted as AlleleTables, which are cached
+    and then converted with table_class.from_table, so that histogram,
+    scatter and distance plots share cached extractions.
+    Progress is reported over all contigs and samples to extract.
+    Tables extracted with a call_filter are cached separately.
+    """
+    table_options = table_options or {}
+    cache_options = _cache_options(call_filter)
+
+    def _convert(table):
+        if table_class is AlleleTable:
+            return table
+        return table_class.from_table(table, **table_options)
+
+    # work items of (reader, contig, cached tables, samples to extract)
+    work = []
+    for r, indices, g_labels, g_samples in _group_by_file(readers, labels,
+                                                          samples):
+        for chrom in contigs:
+            cached = []
+            todo = []
+            for i, l, s in zip(indices, g_labels, g_samples):
+                table = None
+                if cache is not None:
+                    table = cache.get(r.path, chrom, s, l, **cache_options)
+                    if table is not None:
+                        table = _convert(table)
+                if table is None:
+                    todo.append((i, l, s))
                 else:
-                    maf.append([record.POS, freq, label, dist])
-    return np.array(maf)
+                    cached.append((i, table))
+            work.append((r, chrom, cached, todo))
+
+    todo_work = [x for x in work if x[3]]
+    lengths = [x[0].contigs.get(x[1]).length for x in todo_work]
+    progress = Progress(None if None in lengths else sum(lengths))
+    if cache is None:
+        extracted = _extract_work(todo_work, threads, chunk_size,
+                                  table_class, table_options, progress,
+                                  call_filter)
+    else:
+        extracted = _extract_work(todo_work, threads, chunk_size,
+                                  AlleleTable, None, progress, call_filter)
+    for r, chrom, cached, todo in work:
+        results = list(cached)
+        if todo:
+            for (i, l, s), table in zip(todo, next(extracted)):
+                if cache is not None:
+                    cache.put(r.path, chrom, s, l, table, **cache_options)
+                    table = _convert(table)
+                results.append((i, table))
+        for i, table in sorted(results, key=lambda x: x[0]):
+            progress.message("{0} data points processed".format(len(table)))
+            yield i, _facet_name(chrom, facets), table
+    progress.finish()
+
+
+def _extract_work(work, threads, chunk_size, table_class, table_options,
+                  progress, call_filter=None):
+    """
+    Generator of lists of tables, one list per work item
+    :param work: list of (reader, contig, cached, todo) tuples
+    :param progress: Progress of all work items
+    :param call_filter: optional CallFilter of calls to keep
+    """
+    if threads is None or threads <= 1:
+        for r, chrom, _, todo in work:
+            w_labels = [x[1] for x in todo]
+            w_samples = [x[2] for x in todo]
+            progress.message("Processing chromosome {0} for sample "
+                             "{1}".format(chrom, ", ".join(w_samples)))
+            with stage("extract", contig=chrom):
+                tables = get_arrays_for_chrom_multi(
+                    r, chrom, w_samples, w_labels, progress=progress,
+                    table_class=table_class, table_options=table_options,
+                    call_filter=call_filter)
+            yield tables
+        return
+    # contigs are split into windows, so that large contigs
+    # are spread over several workers
+    tasks = []
+    n_windows = []
+    for r, chrom, _, todo in work:
+        w_labels = [x[1] for x in todo]
+        w_samples = [x[2] for x in todo]
+        windows = split_contig(r.contigs.get(chrom).length, chunk_size)
+        n_windows.append(len(windows))
+        for start, end in windows:
+            tasks.append((r.path, r.backend, chrom, w_labels,
+                          w_samples, start, end, table_class,
+                          table_options, call_filter))
+    parts = ordered_map(_extract_window, tasks, threads)
+    for (r, chrom, _, _), n in zip(work, n_windows):
+        progress.start_contig(chrom)
+        # only the wait for workers is measured here
+        with stage("extract", contig=chrom):
+            results = [next(parts) for _ in range(n)]
+            tables = [table_class.concatenate(list(x))
+                      for x in zip(*[x[1] for x in results])]
+        progress.update(records=sum(x[0] for x in results),
+                        kept=sum(len(x) for x in tables),
+                        done=r.contigs.get(chrom).length or 0)
+        yield tables
 
 
-def build_dataframe(readers, labels, samples, contigs):
+def iter_dataframes(readers, labels, samples, contigs, threads=1,
+                    chunk_size=None, cache=None, max_points=None, seed=0,
+                    facets=None, call_filter=None):
+    """
+    Generator of dataframes of allele frequencies,
+    one per sample and contig, as soon as they are extracted.
+    Empty contigs are skipped.
+    :param readers: list of readers
+    :param labels: list of labels, one per reader
+    :param samples: list of sample names, one per reader
+    :param contigs: list of contig names
+    :param threads: number of processes used to extract contigs
+    :param chunk_size: when using multiple threads, split contigs
+    into windows of this many bases
+    :param cache: optional TableCache of extracted contigs
+    :param max_points: if given, keep a seeded, label-stratified sample
+    of at most this many observations per sample and contig
+    :param seed: seed of the sample
+    :param facets: optional dict of contig to facet name;
+    the chromosome column of these contigs is set to their facet
+    :param call_filter: optional CallFilter of calls to keep
+    :return: generator of pandas DataFrame
+    """
     assert len(readers) == len(labels) and len(readers) == len(samples)
-    the_dict = OrderedDict()
-    for r, l, s in zip(readers, labels, samples):
-        sample_dict = OrderedDict()
-        for chrom in contigs:
-            message = "Processing chromosome {0} " \
-                      "for sample {1}".format(chrom, s)
-            print(message, file=sys.stderr)
-            if len(readers) == 1:
-                arr = get_array_for_chrom_all(r, chrom)
-            else:
-                arr = get_array_for_chrom_all(r, chrom, l, s)
-            message = "{0} data points processed".format(len(arr))
-            print(message, file=sys.stderr)
-            if len(arr) == 0:
-                continue
-            df = pd.DataFrame(
-                {"pos": [int(x) for x in arr[:, 0]],
-                 "af": [float(x) for x in arr[:, 1]],
-                 "label": arr[:, 2],
-                 "distance": [float(x) for x in arr[:, 3]],
-                 "chromosome": [chrom for _ in range(len(arr[:, 2]))]
-                 }
-            )
-            sample_dict[chrom] = df
-        sample_df = pd.concat(sample_dict.values())
-        the_dict[s] = sample_df
-    return pd.concat(the_dict.values())
+    readers = [as_reader(r) for r in readers]
+    if max_points is None:
+        table_class, table_options = AlleleTable, None
+    else:
+        table_class = ReservoirTable
+        table_options = {"max_points": max_points, "seed": seed}
+    tables = _iter_tables(readers, labels, samples, contigs,
+                          threads, chunk_size, cache, table_class,
+                          table_options, facets, call_filter)
+    for _, chrom, table in tables:
+        if len(table) == 0:
+            continue
+        with stage("dataframe", contig=chrom):
+            df = table.to_dataframe(chrom)
+        yield df
+
+
+def build_dataframe(readers, labels, samples, contigs, **options):
+    """
+    Build dataframe of allele frequencies over all contigs
+    :param readers: list of readers
+    :param labels: list of labels, one per reader
+    :param samples: list of sample names, one per reader
+    :param contigs: list of contig names
+    :param options: extraction options passed on to iter_dataframes
+    :return: pandas DataFrame
+    """
+    df = concat_frames(iter_dataframes(readers, labels, samples,
+                                       contigs, **options))
+    if options.get("max_points") is not None:
+        # samples are drawn per sample; this caps every contig as a whole
+        df = downsample_dataframe(df, options["max_points"],
+                                  options.get("seed", 0))
+    return df
+
+
+def build_store(readers, labels, samples, contigs, memory_limit=None,
+                max_points=None, seed=0, columns=VALUE_COLUMNS,
+                histograms=False, **options):
+    """
+    Extract allele frequencies over all contigs into an AlleleStore.
+    Contigs are added to the store as soon as they are extracted,
+    and the store spills to disk when it exceeds memory_limit,
+    so no dataframe of all contigs is ever built.
+    :param readers: list of readers
+    :param labels: list of labels, one per reader
+    :param samples: list of sample names, one per reader
+    :param contigs: list of contig names
+    :param memory_limit: maximum number of bytes the store keeps
+    in memory
+    :param max_points: optional maximum number of observations per contig
+    :param seed: seed of the sample of max_points
+    :param columns: value columns to store; see kind_columns
+    :param histograms: with max_points, also count the allele
+    frequencies of all observations in the histograms of the store,
+    so that histograms are not drawn from the sample
+    :param options: extraction options of iter_dataframes, including
+    facets, under which name grouped contigs are stored, and call_filter
+    :return: AlleleStore
+    """
+    assert len(readers) == len(labels) and len(readers) == len(samples)
+    readers = [as_reader(r) for r in readers]
+    if max_points is None:
+        table_class, table_options = AlleleTable, None
+    else:
+        table_class = ReservoirTable
+        table_options = {"max_points": max_points, "seed": seed,
+                         "histogram": histograms}
+    store = AlleleStore(memory_limit, max_points, seed, columns)
+    tables = _iter_tables(readers, labels, samples, contigs,
+                          table_class=table_class,
+                          table_options=table_options, **options)
+    items = []
+    for _, chrom, table in tables:
+        with stage("store", contig=chrom):
+            if isinstance(table, ReservoirTable):
+                if table.histogram is not None:
+                    items.append((chrom, table.histogram))
+                table = table.sample()
+            store.add(chrom, table)
+    if items:
+        store.histograms = merge_histograms(items)
+    return store
+
+
+def build_histograms(readers, labels, samples, contigs, threads=1,
+                     chunk_size=None, cache=None, facets=None,
+                     call_filter=None):
+    """
+    Count allele frequencies over all contigs in fixed bins,
+    without building a table of every observation
+    :param readers: list of readers
+    :param labels: list of labels, one per reader
+    :param samples: list of sample names, one per reader
+    :param contigs: list of contig names
+    :param threads: number of processes used to extract contigs
+    :param chunk_size: when using multiple threads, split contigs
+    into windows of this many bases
+    :param cache: optional TableCache of extracted contigs
+    :param facets: optional dict of contig to facet name;
+    contigs of the same facet are counted together
+    :param call_filter: optional CallFilter of calls to keep
+    :return: OrderedDict of (chromosome, label) to BinnedFrequencies
+    """
+    assert len(readers) == len(labels) and len(readers) == len(samples)
+    readers = [as_reader(r) for r in readers]
+    tables = _iter_tables(readers, labels, samples, contigs, threads,
+                          chunk_size, cache, table_class=AlleleHistogram,
+                          facets=facets, call_filter=call_filter)
+    items = []
+    for _, chrom, hist in tables:
+        items.append((chrom, hist))
+    return merge_histograms(items)
 
 
 def clean_df(df, contigs, column="af"):
     """
     Clean dataframe so that it removes categories
-    where all values of column are 0
-    :param df:
+    where all values of column are 0.
+    Rows of contigs not in contigs are removed as well.
+    The result is ordered on contig, and then on label
+    in order of first appearance.
+    Only used by the legacy afplot.afplot API; the command line
+    drops all-zero labels while binning histograms instead.
+    :param df: dataframe with chromosome, label and column columns
+    :param contigs: list of contig names
+    :param column: name of column to check
     :return: cleaned df
     """
-    labels = set(df.label)
-    tmp_dfs = []
-    for chrom in contigs:
-        t = df[df.chromosome == chrom]
-        for l in labels:
-            tt = t[t.label == l]
-            col = getattr(tt, column)
-            if not all((x == 0 for x in col)):
-                tmp_dfs.append(tt)
-    return pd.concat(tmp_dfs)
+    with stage("clean_df"):
+        chrom_rank = pd.Categorical(df.chromosome,
+                                    categories=list(contigs)).codes
+        label_rank = as_categorical(df.label).codes
+        nonzero = (df[column] != 0).groupby(
+            [df.chromosome, df.label], sort=False,
+            observed=True).transform("any")
+        keep = (chrom_rank >= 0) & nonzero.values
+        order = np.lexsort((label_rank[keep], chrom_rank[keep]))
+        return df[keep].iloc[order]
 
 
-def scatter_main(readers, labels, samples, contigs, png, dpi=300):
-    df = build_dataframe(readers, labels, samples, contigs)
-    f = sns.lmplot("pos", "af", df, col="chromosome",
-                   col_wrap=4, fit_reg=False,
-                   hue="label", scatter_kws={"alpha": 0.3}, aspect=3)
+def _as_dataframe(source):
+    if isinstance(source, AlleleStore):
+        return source.to_dataframe()
+    return source
 
-    for i, x in enumerate(f.axes):
-        x.set_xlim(0, )
-    plt.savefig(png, dpi=dpi)
 
+def plot_scatter(df, png, dpi=300, renderer="raster"):
+    if renderer == "raster":
+        plot_binned_facets(df, png, "af", dpi=dpi)
+        return
+    import seaborn as sns
+    df = _as_dataframe(df)
+    with stage("facet"):
+        f = sns.lmplot("pos", "af", df, col="chromosome",
+                       col_wrap=4, fit_reg=False,
+                       hue="label", scatter_kws={"alpha": 0.3}, aspect=3,
+                       hue_order=label_order(df.label),
+                       col_order=label_order(df.chromosome))
 
-def histogram_main(readers, labels, samples, contigs,
-                   png, dpi=300, kde_only=False):
-    df = build_dataframe(readers, labels, samples, contigs)
-    df = clean_df(df, contigs)
-    g = sns.FacetGrid(df, col="chromosome", hue="label",
-                      aspect=1, col_wrap=4, sharey=False)
-    if kde_only:
-        g = (g.map(sns.distplot, "af", hist=False).add_legend())
+        for i, x in enumerate(f.axes):
+            x.set_xlim(0, )
+    with stage("savefig"):
+        plt.savefig(png, dpi=dpi)
+
+
+def plot_histogram(df, contigs, png, dpi=300, kde_only=False):
+    if isinstance(df, AlleleStore):
+        hists = OrderedDict()
+        for chrom, frame in df.iter_frames():
+            with stage("histogram", contig=chrom):
+                hists.update(histograms_from_dataframe(frame, [chrom]))
     else:
-        g = (g.map(sns.distplot, "af").add_legend())
-    for x in g.axes:
-        if x.get_ylim()[1] > 10:
-            x.set_ylim(0, 10)
-        x.set_xlim(-0.5, 1.5)
-    plt.savefig(png, dpi=dpi)
-
-
-def distance_main(readers, labels, samples, contigs, png, dpi=300):
-    df = build_dataframe(readers, labels, samples, contigs)
-    f = sns.lmplot("pos", "distance", df, col="chromosome",
-                   col_wrap=4, fit_reg=False,
-                   hue="label", scatter_kws={"alpha": 0.3}, aspect=3)
-    for i, x in enumerate(f.axes):
-        x.set_xlim(0, )
-        x.set_ylim(0, 0.5)
-    plt.savefig(png, dpi=dpi)
+        with stage("histogram"):
+            hists = histograms_from_dataframe(df, contigs)
+    plot_histogram_counts(hists, png, dpi, kde_only)
+
+
+def plot_histogram_counts(hists, png, dpi=300, kde_only=False):
+    plot_binned_histograms(hists, png, dpi=dpi, kde_only=kde_only)
+
+
+def plot_distance(df, png, dpi=300, renderer="raster"):
+    if renderer == "raster":
+        plot_binned_facets(df, png, "distance", ylim=(0, 0.5), dpi=dpi)
+        return
+    import seaborn as sns
+    df = _as_dataframe(df)
+    with stage("facet"):
+        f = sns.lmplot("pos", "distance", df, col="chromosome",
+                       col_wrap=4, fit_reg=False,
+                       hue="label", scatter_kws={"alpha": 0.3}, aspect=3,
+                       hue_order=label_order(df.label),
+                       col_order=label_order(df.chromosome))
+        for i, x in enumerate(f.axes):
+            x.set_xlim(0, )
+            x.set_ylim(0, 0.5)
+    with stage("savefig"):
+        plt.savefig(png, dpi=dpi)
+
+
+def plot_kinds(df, contigs, png, kinds=KINDS, dpi=300, renderer="raster",
+               kde_only=False, hists=None):
+    """
+    Write several kinds of plots of one dataframe.
+    Every plot is written to png with its kind inserted
+    before the extension, e.g. plot.scatter.png
+    :param df: dataframe of allele frequencies, or AlleleStore
+    :param contigs: list of contig names
+    :param png: output path
+    :param kinds: plot kinds to write; subset of KINDS
+    :param dpi: dpi of output
+    :param renderer: renderer of scatter and distance plots
+    :param kde_only: only plot kde for histograms
+    :param hists: optional histograms of all observations, used instead
+    of those of df when df is a sample
+    :return: list of written paths
+    """
+    paths = []
+    for kind in kinds:
+        path = kind_path(png, kind)
+        if kind == "histogram" and hists is not None:
+            plot_histogram_counts(hists, path, dpi, kde_only)
+        elif kind == "histogram":
+            plot_histogram(df, contigs, path, dpi, kde_only)
+        elif kind == "scatter":
+            plot_scatter(df, path, dpi, renderer)
+        elif kind == "distance":
+            plot_distance(df, path, dpi, renderer)
+        else:
+            raise NotImplementedError
+        paths.append(path)
+    return paths
+
+
+def scatter_main(readers, labels, samples, contigs, png,
+                 dpi=300, renderer="raster", **options):
+    with build_store(readers, labels, samples, contigs,
+                     columns=kind_columns(["scatter"]), **options) as store:
+        plot_scatter(store, png, dpi, renderer)
+
+
+def histogram_main(readers, labels, samples, contigs,
+                   png, dpi=300, kde_only=False, **options):
+    hists = build_histograms(readers, labels, samples, contigs, **options)
+    plot_histogram_counts(hists, png, dpi, kde_only)
+
+
+def distance_main(readers, labels, samples, contigs, png,
+                  dpi=300, renderer="raster", **options):
+    with build_store(readers, labels, samples, contigs,
+                     columns=kind_columns(["distance"]), **options) as store:
+        plot_distance(store, png, dpi, renderer)
+
+
+def all_main(readers, labels, samples, contigs, png, kinds=KINDS,
+             dpi=300, renderer="raster", kde_only=False, **options):
+    with build_store(readers, labels, samples, contigs,
+                     columns=kind_columns(kinds),
+                     histograms="histogram" in kinds, **options) as store:
+        return plot_kinds(store, contigs, png, kinds, dpi, renderer,
+                          kde_only, store.histograms)
@@ -0,0 +1,10 @@
+"""
+benchmarks
+~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+
+Performance benchmarks of afplot on synthetic VCF files.
+Run with `python -m benchmarks.run --help`.
+"""
@@ -0,0 +1,226 @@
+"""
+benchmarks.run
+~~~~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+
+Time the hot paths of afplot on a synthetic VCF file.
+
+Every stage is run once for its wall time, and, unless --no-memory
+is given, once more under tracemalloc for its peak memory, so that
+tracing does not inflate the timings.
+"""
+
+from __future__ import print_function
+import json
+import shutil
+import time
+import tracemalloc
+from collections import namedtuple
+from os.path import join
+from tempfile import mkdtemp
+
+import click
+
+from afplot.constants import BACKENDS
+from afplot.reader import open_reader
+from afplot.region import build_df_for_region, iter_dfs_for_regions
+from afplot.render import RegionRenderer
+from afplot.whole_genome import get_array_for_chrom_all, build_dataframe, \
+    clean_df, plot_histogram, plot_scatter, plot_distance
+
+from .synthetic import contig_names, write_bed, write_vcf
+
+Result = namedtuple("Result", ["stage", "items", "unit", "seconds",
+                               "peak_mb"])
+
+
+def measure(func, memory=True):
+    """
+    Run a stage
+    :param func: callable without arguments returning the number
+    of processed items
+    :param memory: whether to measure peak memory in a second run
+    :return: tuple of (items, seconds, peak MB or None)
+    """
+    start = time.perf_counter()
+    items = func()
+    seconds = time.perf_counter() - start
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1] / 1024.0 / 1024.0
+        finally:
+            tracemalloc.stop()
+    return items, seconds, peak
+
+
+def stages(vcf_path, regions, contigs, samples, output_dir, backend="pysam"):
+    """
+    Benchmarked stages
+    :return: list of (name, unit, callable)
+    """
+    reader = open_reader(vcf_path, backend)
+    state = {}
+
+    def extract_contigs():
+        return sum(len(get_array_for_chrom_all(reader, c, progress=False))
+                   for c in contigs)
+
+    def extract_dataframe():
+        state["df"] = build_dataframe([reader] * len(samples), samples,
+                                      samples, contigs)
+        return len(state["df"])
+
+    def clean():
+        return len(clean_df(state["df"], contigs))
+
+    def region_dfs():
+        for r in regions:
+            build_df_for_region(reader, r)
+        return len(regions)
+
+    def region_sweep():
+        state["regions"] = [df for _, df in iter_dfs_for_regions(reader,
+                                                                 regions)
+                            if df is not None]
+        return len(regions)
+
+    def histogram():
+        plot_histogram(state["df"], contigs, join(output_dir, "genome.png"),
+                       dpi=50)
+        return len(state["df"])
+
+    def genome_plot(func, renderer):
+        def _plot():
+            func(state["df"], join(output_dir, "genome.png"), dpi=50,
+                 renderer=renderer)
+            return len(state["df"])
+        return _plot
+
+    def region_plot(kind):
+        def _plot():
+            renderer = RegionRenderer(kind, dpi=50)
+            try:
+                for df in state["regions"]:
+                    renderer.render(df, join(output_dir, "region.png"))
+            finally:
+                renderer.close()
+            return len(state["regions"])
+        return _plot
+
+    return [
+        ("get_array_for_chrom_all", "alleles", extract_contigs),
+        ("build_dataframe", "alleles", extract_dataframe),
+        # clean_df is only used by the legacy afplot.afplot API
+        ("clean_df", "alleles", clean),
+        ("build_df_for_region", "regions", region_dfs),
+        ("iter_dfs_for_regions", "regions", region_sweep),
+        ("histogram", "alleles", histogram),
+        ("scatter raster", "alleles", genome_plot(plot_scatter, "raster")),
+        ("scatter points", "alleles", genome_plot(plot_scatter, "points")),
+        ("distance raster", "alleles", genome_plot(plot_distance, "raster")),
+        ("distance points", "alleles", genome_plot(plot_distance, "points")),
+        ("region histogram", "regions", region_plot("histogram")),
+        ("region scatter", "regions", region_plot("scatter")),
+        ("region distance", "regions", region_plot("distance"))
+    ]
+
+
+def run_benchmarks(n_contigs=4, contig_length=2500000, density=0.004,
+                   multiallelic=0.05, n_samples=1, missing_ad=0.01,
+                   n_regions=1000, region_width=1000, seed=0,
+                   backend="pysam", memory=True, skip=(), work_dir=None):
+    """
+    Generate a synthetic VCF and BED file, and run all stages on them
+    :param skip: names of stages not to run
+    :param work_dir: directory for generated files.
+    A temporary directory is used if not given
+    :return: tuple of (number of VCF records, list of Result)
+    """
+    tmp = work_dir or mkdtemp(prefix="afplot-bench-")
+    try:
+        vcf_path = join(tmp, "synthetic.vcf.gz")
+        n_records = write_vcf(vcf_path, n_contigs, contig_length, density,
+                              multiallelic, n_samples, missing_ad, seed=seed)
+        regions = write_bed(join(tmp, "synthetic.bed"), n_regions, n_contigs,
+                            contig_length, region_width, seed)
+        samples = ["SAMPLE{0}".format(i + 1) for i in range(n_samples)]
+        results = []
+        for name, unit, func in stages(vcf_path, regions,
+                                       contig_names(n_contigs), samples,
+                                       tmp, backend):
+            if name in skip:
+                continue
+            items, seconds, peak = measure(func, memory)
+            results.append(Result(name, items, unit, seconds, peak))
+        return n_records, results
+    finally:
+        if work_dir is None:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+def format_results(n_records, results):
+    """
+    Format results as a table
+    :return: str
+    """
+    lines = ["{0} VCF records".format(n_records),
+             "{0:<24}{1:>10}{2:>10}{3:>14}{4:>14}{5:>10}".format(
+                 "stage", "items", "s", "items/s", "records/s", "peak MB")]
+    for r in results:
+        peak = "-" if r.peak_mb is None else "{0:.1f}".format(r.peak_mb)
+        lines.append("{0:<24}{1:>10}{2:>10.3f}{3:>14.0f}{4:>14.0f}"
+                     "{5:>10}".format(r.stage, r.items, r.seconds,
+                                      r.items / r.seconds,
+                                      n_records / r.seconds, peak))
+    return "\n".join(lines)
+
+
+@click.command()
+@click.option("--contigs", type=click.IntRange(min=1), default=4,
+              help="Number of contigs (default: 4)")
+@click.option("--contig-length", type=click.IntRange(min=1),
+              default=2500000, help="Length of every contig "
+                                    "(default: 2500000)")
+@click.option("--density", type=click.FloatRange(0, 1), default=0.004,
+              help="Fraction of positions with a record (default: 0.004)")
+@click.option("--multiallelic", type=click.FloatRange(0, 1), default=0.05,
+              help="Fraction of multi-allelic records (default: 0.05)")
+@click.option("--samples", type=click.IntRange(min=1), default=1,
+              help="Number of samples (default: 1)")
+@click.option("--missing-ad", type=click.FloatRange(0, 1), default=0.01,
+              help="Fraction of calls without AD (default: 0.01)")
+@click.option("--regions", type=click.IntRange(min=1), default=1000,
+              help="Number of BED regions (default: 1000)")
+@click.option("--region-width", type=click.IntRange(min=1), default=1000,
+              help="Width of BED regions (default: 1000)")
+@click.option("--seed", type=int, default=0,
+              help="Seed of the synthetic data (default: 0)")
+@click.option("--backend", type=click.Choice(BACKENDS),
+              default="pysam", help="VCF reader (default: pysam)")
+@click.option("--memory/--no-memory", default=True,
+              help="Measure peak memory with tracemalloc (default: on)")
+@click.option("--skip", multiple=True,
+              help="Name of a stage not to run. May be repeated")
+@click.option("--json", "json_path", type=click.Path(),
+              help="Also write results to this JSON file")
+def main(contigs, contig_length, density, multiallelic, samples, missing_ad,
+         regions, region_width, seed, backend, memory, skip, json_path):
+    """Benchmark afplot on a seeded synthetic VCF file."""
+    n_records, results = run_benchmarks(
+        contigs, contig_length, density, multiallelic, samples, missing_ad,
+        regions, region_width, seed, backend, memory, skip)
+    click.echo(format_results(n_records, results))
+    if json_path is not None:
+        with open(json_path, "w") as handle:
+            json.dump({"records": n_records,
+                       "results": [r._asdict() for r in results]},
+                      handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
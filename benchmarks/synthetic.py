@@ -0,0 +1,164 @@
+"""
+benchmarks.synthetic
+~~~~~~~~~~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+
+import numpy as np
+import pysam
+
+from afplot.utils import Region
+
+BASES = np.array(list("ACGT"))
+
+# genotypes of biallelic and of multi-allelic records,
+# with their probabilities
+GENOTYPES = ("0/0", "0/1", "1/1", "1/2", "0/2")
+BIALLELIC_P = (0.3, 0.45, 0.25, 0.0, 0.0)
+MULTIALLELIC_P = (0.0, 0.4, 0.2, 0.3, 0.1)
+
+# expected fraction of reads supporting each allele of a genotype
+READ_FRACTIONS = np.array([
+    (0.99, 0.01, 0.0),
+    (0.5, 0.5, 0.0),
+    (0.01, 0.99, 0.0),
+    (0.02, 0.49, 0.49),
+    (0.5, 0.0, 0.5)
+])
+
+HEADER = """##fileformat=VCFv4.1
+##FILTER=<ID=PASS,Description="All filters passed">
+##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">
+##FORMAT=<ID=AD,Number=R,Type=Integer,Description="Allelic depths">
+##FORMAT=<ID=GQ,Number=1,Type=Integer,Description="Genotype Quality">
+"""
+
+
+def contig_names(n_contigs):
+    """
+    Names of synthetic contigs
+    :param n_contigs: number of contigs
+    :return: list of chr1, chr2, ...
+    """
+    return ["chr{0}".format(i + 1) for i in range(n_contigs)]
+
+
+def _sample_calls(rng, multi, depth, missing_ad):
+    """
+    Draw and format the GT:AD:GQ fields of one sample for all records
+    :param rng: numpy RandomState
+    :param multi: boolean array of records with two alternative alleles
+    :param depth: mean read depth
+    :param missing_ad: fraction of calls without an AD field
+    :return: list of str
+    """
+    n = len(multi)
+    gts = np.where(multi,
+                   rng.choice(len(GENOTYPES), n, p=MULTIALLELIC_P),
+                   rng.choice(len(GENOTYPES), n, p=BIALLELIC_P))
+    dp = rng.poisson(depth, n) + 1
+    fractions = READ_FRACTIONS[gts]
+    # multinomial allelic depths as a sequence of binomials
+    ad0 = rng.binomial(dp, fractions[:, 0])
+    rest = fractions[:, 1] + fractions[:, 2]
+    ad1 = rng.binomial(dp - ad0, np.where(rest > 0, fractions[:, 1] /
+                                          np.maximum(rest, 1e-9), 0))
+    ad2 = dp - ad0 - ad1
+    missing = rng.rand(n) < missing_ad
+    gq = rng.randint(0, 100, n)
+    calls = []
+    for i in range(n):
+        if missing[i]:
+            ad = "."
+        elif multi[i]:
+            ad = "{0},{1},{2}".format(ad0[i], ad1[i], ad2[i])
+        else:
+            ad = "{0},{1}".format(ad0[i], ad1[i] + ad2[i])
+        calls.append("{0}:{1}:{2}".format(GENOTYPES[gts[i]], ad, gq[i]))
+    return calls
+
+
+def write_vcf(path, n_contigs=2, contig_length=1000000, density=0.001,
+              multiallelic=0.05, n_samples=1, missing_ad=0.01, depth=30,
+              seed=0):
+    """
+    Write a seeded synthetic VCF file, compressed with bgzip
+    and indexed with tabix.
+    Calls have GT, AD and GQ fields, with allelic depths drawn
+    around the expected fractions of their genotype.
+    :param path: output path; should end in .vcf.gz
+    :param n_contigs: number of contigs
+    :param contig_length: length of every contig
+    :param density: fraction of positions with a record
+    :param multiallelic: fraction of records with two alternative alleles
+    :param n_samples: number of samples
+    :param missing_ad: fraction of calls without an AD field
+    :param depth: mean read depth of calls
+    :param seed: integer seed; the same seed gives the same file
+    :return: number of records written
+    """
+    if not path.endswith(".gz"):
+        raise ValueError("Path of a bgzipped VCF must end in .gz")
+    rng = np.random.RandomState(seed)
+    samples = ["SAMPLE{0}".format(i + 1) for i in range(n_samples)]
+    n_records = 0
+    with open(path[:-3], "w") as handle:
+        handle.write(HEADER)
+        for name in contig_names(n_contigs):
+            handle.write("##contig=<ID={0},length={1}>\n".format(
+                name, contig_length))
+        handle.write("\t".join(["#CHROM", "POS", "ID", "REF", "ALT", "QUAL",
+                                "FILTER", "INFO", "FORMAT"] + samples))
+        handle.write("\n")
+        for name in contig_names(n_contigs):
+            n = rng.binomial(contig_length, density)
+            positions = np.sort(rng.choice(contig_length, n,
+                                           replace=False)) + 1
+            ref = rng.randint(4, size=n)
+            # two distinct alternative bases, both different from ref
+            alt1 = (ref + rng.randint(1, 4, size=n)) % 4
+            alt2 = (alt1 + rng.randint(1, 3, size=n)) % 4
+            alt2 = np.where(alt2 == ref, (alt2 + 1) % 4, alt2)
+            multi = rng.rand(n) < multiallelic
+            calls = [_sample_calls(rng, multi, depth, missing_ad)
+                     for _ in samples]
+            for i in range(n):
+                alts = BASES[alt1[i]]
+                if multi[i]:
+                    alts += "," + BASES[alt2[i]]
+                handle.write("\t".join(
+                    [name, str(positions[i]), ".", BASES[ref[i]], alts,
+                     "50", "PASS", ".", "GT:AD:GQ"] +
+                    [x[i] for x in calls]))
+                handle.write("\n")
+            n_records += n
+    pysam.tabix_index(path[:-3], preset="vcf", force=True)
+    return n_records
+
+
+def write_bed(path, n_regions, n_contigs=2, contig_length=1000000,
+              width=1000, seed=0):
+    """
+    Write a seeded BED file of randomly placed regions
+    on the contigs of a synthetic VCF
+    :param path: output path
+    :param n_regions: number of regions
+    :param n_contigs: number of contigs
+    :param contig_length: length of every contig
+    :param width: width of every region
+    :param seed: integer seed
+    :return: list of Region, in order of the file
+    """
+    rng = np.random.RandomState(seed)
+    names = contig_names(n_contigs)
+    regions = []
+    for _ in range(n_regions):
+        start = rng.randint(0, max(contig_length - width, 1))
+        regions.append(Region(names[rng.randint(n_contigs)], start,
+                              start + width))
+    with open(path, "w") as handle:
+        for r in regions:
+            handle.write("{0}\t{1}\t{2}\n".format(r.chr, r.start, r.end))
+    return regions
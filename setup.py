@@ -23,16 +23,19 @@ setup(
     url="https://github.com/sndrtj/afplot",
     license="MIT",
     packages=["afplot"],
+    python_requires=">=3.9",
     install_requires=[
         "click",
         "numpy",
-        "matplotlib",
+        "matplotlib>=3.4",
         "pandas",
         "seaborn",
-        "progressbar2",
         "pysam",
         "pyvcf"
     ],
+    extras_require={
+        "table": ["pyarrow"]
+    },
     entry_points={
         "console_scripts": [
             "afplot = afplot.cli:main"
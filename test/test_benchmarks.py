@@ -0,0 +1,100 @@
+"""
+afplot.benchmarks
+~~~~~~~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+from os.path import join, exists
+import shutil
+from tempfile import mkdtemp
+
+import pysam
+import pytest
+
+from afplot.reader import open_reader
+from benchmarks.run import format_results, run_benchmarks
+from benchmarks.synthetic import write_bed, write_vcf
+
+
+@pytest.fixture
+def temp_dir():
+    the_dir = mkdtemp()
+    yield the_dir
+    shutil.rmtree(the_dir, ignore_errors=True)  # teardown
+
+
+def records(path):
+    with pysam.VariantFile(path) as handle:
+        return list(handle)
+
+
+class TestSynthetic(object):
+
+    def test_write_vcf(self, temp_dir):
+        path = join(temp_dir, "a.vcf.gz")
+        n = write_vcf(path, n_contigs=3, contig_length=100000, density=0.01,
+                      multiallelic=0.2, n_samples=2, missing_ad=0.1)
+        assert exists(path + ".tbi")
+        reader = open_reader(path)
+        assert reader.samples == ["SAMPLE1", "SAMPLE2"]
+        assert list(reader.contigs) == ["chr1", "chr2", "chr3"]
+        recs = records(path)
+        assert len(recs) == n
+        assert 2400 < n < 3600
+        multi = sum(len(x.alts) == 2 for x in recs) / float(n)
+        assert 0.15 < multi < 0.25
+        missing = sum(x.samples["SAMPLE1"]["AD"] in (None, (None,))
+                      for x in recs) / float(n)
+        assert 0.07 < missing < 0.13
+        for x in recs[:100]:
+            assert x.ref not in x.alts
+            assert len(set(x.alts)) == len(x.alts)
+
+    def test_write_vcf_seeded(self, temp_dir):
+        paths = [join(temp_dir, x) for x in ("a.vcf.gz", "b.vcf.gz",
+                                            "c.vcf.gz")]
+        for path, seed in zip(paths, (1, 1, 2)):
+            write_vcf(path, contig_length=50000, density=0.01, seed=seed)
+        a, b, c = [[str(x) for x in records(p)] for p in paths]
+        assert a == b
+        assert a != c
+
+    def test_write_vcf_requires_gz(self, temp_dir):
+        with pytest.raises(ValueError):
+            write_vcf(join(temp_dir, "a.vcf"))
+
+    def test_write_bed(self, temp_dir):
+        regions = write_bed(join(temp_dir, "a.bed"), 50, n_contigs=2,
+                            contig_length=10000, width=100)
+        assert len(regions) == 50
+        assert all(r.end - r.start == 100 and r.end <= 10000
+                   for r in regions)
+        assert set(r.chr for r in regions) == {"chr1", "chr2"}
+
+
+class TestRun(object):
+
+    def test_run_benchmarks(self):
+        n, results = run_benchmarks(n_contigs=1, contig_length=20000,
+                                    density=0.01, n_regions=5,
+                                    region_width=2000, memory=False,
+                                    skip=("scatter points",
+                                          "distance points"))
+        assert n > 0
+        stages = [x.stage for x in results]
+        assert "build_dataframe" in stages and "region scatter" in stages
+        assert "scatter points" not in stages
+        assert all(x.seconds > 0 and x.peak_mb is None for x in results)
+        table = format_results(n, results)
+        assert "build_dataframe" in table
+
+    def test_peak_memory(self):
+        _, results = run_benchmarks(n_contigs=1, contig_length=20000,
+                                    density=0.01, n_regions=2,
+                                    skip=("scatter points",
+                                          "distance points",
+                                          "region histogram",
+                                          "region scatter",
+                                          "region distance"))
+        assert all(x.peak_mb > 0 for x in results)
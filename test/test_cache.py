@@ -0,0 +1,86 @@
+"""
+test_cache
+~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+
+import os
+import shutil
+from os.path import realpath, join, dirname
+from tempfile import mkdtemp
+
+import numpy as np
+import pytest
+
+from afplot.cache import TableCache
+from afplot.columns import AlleleTable
+from afplot.reader import open_reader
+from afplot.whole_genome import build_dataframe, build_histograms, \
+    build_store
+
+mini_vcf = join(dirname(realpath(__file__)), "data/mini.vcf.gz")
+
+
+@pytest.fixture
+def temp_dir():
+    the_dir = mkdtemp()
+    yield the_dir
+    shutil.rmtree(the_dir, ignore_errors=True)  # teardown
+
+
+def _table(n):
+    table = AlleleTable(["a", "b"])
+    for i in range(n):
+        table.append(i, [0.5, 0.5], [0.0, 0.0], i % 2)
+    return table
+
+
+class TestCache(object):
+
+    def test_roundtrip(self, temp_dir):
+        cache = TableCache(temp_dir)
+        assert cache.get(mini_vcf, "chr1", "SAMPLE1", None) is None
+        cache.put(mini_vcf, "chr1", "SAMPLE1", None, _table(10))
+        table = cache.get(mini_vcf, "chr1", "SAMPLE1", None)
+        assert table.labels == ("a", "b")
+        assert np.array_equal(table.pos, _table(10).pos)
+        assert cache.get(mini_vcf, "chr1", "SAMPLE1", "label") is None
+        assert cache.get(mini_vcf, "chr1", "SAMPLE2", None) is None
+
+    def test_eviction(self, temp_dir):
+        cache = TableCache(temp_dir)
+        cache.put(mini_vcf, "chr1", "SAMPLE1", None, _table(1000))
+        one = cache.size()
+        cache.max_size = int(one * 1.5)
+        cache.put(mini_vcf, "chr2", "SAMPLE1", None, _table(1000))
+        assert len(cache.entries()) == 1
+        assert cache.get(mini_vcf, "chr2", "SAMPLE1", None) is not None
+
+    def test_build_dataframe_uses_cache(self, temp_dir):
+        cache = TableCache(temp_dir)
+        reader = open_reader(mini_vcf)
+        first = build_dataframe([reader], ["a"], ["SAMPLE1"], ["chr1"],
+                                cache=cache)
+        assert len(os.listdir(temp_dir)) == 1
+        second = build_dataframe([reader], ["a"], ["SAMPLE1"], ["chr1"],
+                                 cache=cache)
+        assert first.equals(second)
+
+    @pytest.mark.parametrize("threads", [1, 2])
+    def test_histograms_share_cache(self, temp_dir, threads):
+        cache = TableCache(temp_dir)
+        reader = open_reader(mini_vcf)
+        args = ([reader], ["a"], ["SAMPLE1"], ["chr1"])
+        expected = build_histograms(*args)
+        hists = build_histograms(*args, cache=cache, threads=threads)
+        # histogram extraction fills the cache
+        assert len(os.listdir(temp_dir)) == 1
+        for key in expected:
+            assert np.array_equal(hists[key].counts, expected[key].counts)
+        # and its entries are used by other plots
+        reader.fetch_sample_arrays = None
+        with build_store(*args, cache=cache, max_points=2) as store:
+            assert len(store) == 2
+        assert list(build_histograms(*args, cache=cache)) == list(expected)
@@ -5,9 +5,13 @@ afplot.cli
 :copyright: (c) 2017 Leiden University Medical Center
 :license: MIT
 """
+import json
 from os import listdir
 from os.path import realpath, join, dirname
+import pstats
 import shutil
+import subprocess
+import sys
 from tempfile import mkdtemp, NamedTemporaryFile
 
 import pytest
@@ -31,6 +35,34 @@ def initialized_cli():
 
 mini_vcf = join(dirname(realpath(__file__)), "data/mini.vcf.gz")
 mini_bed = join(dirname(realpath(__file__)), "data/mini.bed")
+multi_vcf = join(dirname(realpath(__file__)), "data/multi.vcf.gz")
+filters_vcf = join(dirname(realpath(__file__)), "data/filters.vcf.gz")
+
+# libraries that must not be loaded by --help or usage errors
+HEAVY_MODULES = ("numpy", "pandas", "matplotlib", "seaborn", "pysam", "vcf",
+                 "progressbar", "pyarrow")
+
+STARTUP_SCRIPT = """
+import sys
+from afplot.cli import main
+sys.argv = ["afplot"] + sys.argv[1:]
+try:
+    main()
+except SystemExit:
+    pass
+heavy = sorted(set(m.split(".")[0] for m in sys.modules) & set({0!r}))
+sys.stderr.write("\\nheavy:" + ",".join(heavy))
+""".format(HEAVY_MODULES)
+
+
+def loaded_heavy_modules(*args):
+    """Run the command line in a fresh interpreter
+    and get the heavy modules it loaded"""
+    proc = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT] + list(args),
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, check=True)
+    heavy = proc.stderr.rsplit("heavy:", 1)[-1]
+    return [x for x in heavy.split(",") if x]
 
 
 class TestCli(object):
@@ -131,3 +163,279 @@ class TestCli(object):
 
 
 
+
+    def test_whole_genome_scatter_threads(self, initialized_cli):
+        runner = CliRunner()
+        tmp = NamedTemporaryFile(suffix=".png")
+        result = runner.invoke(initialized_cli, ["whole-genome", "scatter",
+                                                 "-v", mini_vcf,
+                                                 "-v", mini_vcf, "-o",
+                                                 tmp.name, "-l", "test",
+                                                 "-l", "test2", "-j", "2"])
+        assert result.exit_code == 0
+        assert "PNG image data" in magic.from_file(tmp.name)
+
+    def test_whole_genome_multi_sample(self, initialized_cli):
+        runner = CliRunner()
+        tmp = NamedTemporaryFile(suffix=".png")
+        result = runner.invoke(initialized_cli, ["whole-genome", "scatter",
+                                                 "-v", multi_vcf,
+                                                 "-s", "SAMPLE1",
+                                                 "-s", "SAMPLE2", "-o",
+                                                 tmp.name, "-l", "test",
+                                                 "-l", "test2"])
+        assert result.exit_code == 0
+        assert "PNG image data" in magic.from_file(tmp.name)
+
+    def test_extract_and_plot_table(self, temp_dir, initialized_cli):
+        runner = CliRunner()
+        table = join(temp_dir, "mini.parquet")
+        result = runner.invoke(initialized_cli, ["extract", "-v", mini_vcf,
+                                                 "-o", table, "-l", "test"])
+        assert result.exit_code == 0
+        png = join(temp_dir, "scatter.png")
+        result = runner.invoke(initialized_cli, ["whole-genome", "scatter",
+                                                 "-t", table, "-o", png])
+        assert result.exit_code == 0
+        assert "PNG image data" in magic.from_file(png)
+        result = runner.invoke(initialized_cli, ["regions", "histogram",
+                                                 "-t", table, "-o", temp_dir,
+                                                 "-R", "chr1:100000-100500"])
+        assert result.exit_code == 0
+        assert "PNG image data" in magic.from_file(
+            join(temp_dir, "chr1_100000-100500.png"))
+
+    def test_whole_genome_requires_input(self, initialized_cli):
+        runner = CliRunner()
+        tmp = NamedTemporaryFile(suffix=".png")
+        result = runner.invoke(initialized_cli, ["whole-genome", "scatter",
+                                                 "-o", tmp.name])
+        assert result.exit_code != 0
+
+    def test_whole_genome_scatter_points(self, initialized_cli):
+        runner = CliRunner()
+        tmp = NamedTemporaryFile(suffix=".png")
+        result = runner.invoke(initialized_cli, ["whole-genome", "scatter",
+                                                 "-v", mini_vcf, "-o",
+                                                 tmp.name, "-l", "test",
+                                                 "--renderer", "points"])
+        assert result.exit_code == 0
+        assert "PNG image data" in magic.from_file(tmp.name)
+
+    def test_whole_genome_histogram_kde_only(self, initialized_cli):
+        runner = CliRunner()
+        tmp = NamedTemporaryFile(suffix=".png")
+        result = runner.invoke(initialized_cli, ["whole-genome", "histogram",
+                                                 "-v", mini_vcf, "-o",
+                                                 tmp.name, "-l", "test",
+                                                 "--kde-only"])
+        assert result.exit_code == 0
+        assert "PNG image data" in magic.from_file(tmp.name)
+
+    def test_region_histogram_kde_only(self, temp_dir, initialized_cli):
+        runner = CliRunner()
+        result = runner.invoke(initialized_cli, ["regions", "histogram", "-v",
+                                                 mini_vcf, "-o", temp_dir, "-R",
+                                                 "chr1:100000-100500", "-k"])
+        assert result.exit_code == 0
+        assert "PNG image data" in magic.from_file(join(temp_dir,
+                                                        "chr1_100000-100500.png"))
+
+    def test_whole_genome_all(self, temp_dir, initialized_cli):
+        runner = CliRunner()
+        out = join(temp_dir, "plot.png")
+        result = runner.invoke(initialized_cli, ["whole-genome", "all",
+                                                 "-v", mini_vcf, "-o", out,
+                                                 "-l", "test"])
+        assert result.exit_code == 0
+        assert sorted(listdir(temp_dir)) == ["plot.distance.png",
+                                             "plot.histogram.png",
+                                             "plot.scatter.png"]
+        for z in listdir(temp_dir):
+            assert "PNG image data" in magic.from_file(join(temp_dir, z))
+
+    def test_region_all_selected_plots(self, temp_dir, initialized_cli):
+        runner = CliRunner()
+        result = runner.invoke(initialized_cli, ["regions", "all", "-v",
+                                                 mini_vcf, "-o", temp_dir, "-R",
+                                                 "chr1:100000-100500",
+                                                 "-p", "histogram",
+                                                 "-p", "distance"])
+        assert result.exit_code == 0
+        assert sorted(listdir(temp_dir)) == [
+            "chr1_100000-100500.distance.png",
+            "chr1_100000-100500.histogram.png"
+        ]
+
+    def test_whole_genome_scatter_max_points(self, initialized_cli):
+        runner = CliRunner()
+        tmp = NamedTemporaryFile(suffix=".png")
+        result = runner.invoke(initialized_cli, ["whole-genome", "scatter",
+                                                 "-v", mini_vcf, "-o",
+                                                 tmp.name, "-l", "test",
+                                                 "--max-points-per-contig",
+                                                 "2", "--seed", "3"])
+        assert result.exit_code == 0
+        assert "PNG image data" in magic.from_file(tmp.name)
+
+    def test_whole_genome_all_max_points(self, temp_dir, initialized_cli):
+        runner = CliRunner()
+        out = join(temp_dir, "plot.png")
+        result = runner.invoke(initialized_cli, ["whole-genome", "all",
+                                                 "-v", mini_vcf, "-o", out,
+                                                 "-l", "test",
+                                                 "--max-points-per-contig",
+                                                 "2", "--seed", "3"])
+        assert result.exit_code == 0
+        assert sorted(listdir(temp_dir)) == ["plot.distance.png",
+                                             "plot.histogram.png",
+                                             "plot.scatter.png"]
+
+    def test_whole_genome_all_histogram_not_sampled(self, temp_dir,
+                                                    initialized_cli):
+        runner = CliRunner()
+        table = join(temp_dir, "mini.parquet")
+        result = runner.invoke(initialized_cli, ["extract", "-v", mini_vcf,
+                                                 "-o", table, "-l", "test"])
+        assert result.exit_code == 0
+        for source in (["-v", mini_vcf, "-l", "test"], ["-t", table]):
+            full = join(temp_dir, "full.png")
+            capped = join(temp_dir, "capped.png")
+            result = runner.invoke(initialized_cli, ["whole-genome",
+                                                     "histogram", "-o",
+                                                     full] + source)
+            assert result.exit_code == 0
+            result = runner.invoke(initialized_cli, ["whole-genome", "all",
+                                                     "-p", "histogram",
+                                                     "-o", capped,
+                                                     "--max-points-per-"
+                                                     "contig", "1"] + source)
+            assert result.exit_code == 0
+            # the histogram counts every allele, not only the sampled ones
+            with open(full, "rb") as a, \
+                    open(join(temp_dir, "capped.histogram.png"), "rb") as b:
+                assert a.read() == b.read()
+
+    def test_region_distance_max_points(self, temp_dir, initialized_cli):
+        runner = CliRunner()
+        result = runner.invoke(initialized_cli, ["regions", "distance", "-v",
+                                                 mini_vcf, "-o", temp_dir,
+                                                 "-R", "chr1:100000-100500",
+                                                 "--max-points-per-contig",
+                                                 "2"])
+        assert result.exit_code == 0
+        assert "PNG image data" in magic.from_file(join(temp_dir,
+                                                        "chr1_100000-100500.png"))
+
+    def test_whole_genome_other_contigs(self, temp_dir, initialized_cli):
+        runner = CliRunner()
+        for command in ("scatter", "histogram"):
+            png = join(temp_dir, command + ".png")
+            result = runner.invoke(initialized_cli, [
+                "whole-genome", command, "-v", mini_vcf, "-o", png,
+                "-l", "test", "--min-contig-length", "1000000000"])
+            assert result.exit_code == 0
+            assert "PNG image data" in magic.from_file(png)
+        table = join(temp_dir, "mini.parquet")
+        result = runner.invoke(initialized_cli, ["extract", "-v", mini_vcf,
+                                                 "-o", table, "-l", "test"])
+        assert result.exit_code == 0
+        png = join(temp_dir, "table.png")
+        result = runner.invoke(initialized_cli, [
+            "whole-genome", "histogram", "-t", table, "-o", png,
+            "--min-contig-records", "1000000"])
+        assert result.exit_code == 0
+        assert "PNG image data" in magic.from_file(png)
+
+    def test_call_filters(self, temp_dir, initialized_cli):
+        runner = CliRunner()
+        filters = ["--pass-only", "--min-depth", "20", "--min-gq", "10",
+                   "--call-type", "het", "--call-type", "hom_ref",
+                   "--snv-only", "--biallelic-only"]
+        png = join(temp_dir, "scatter.png")
+        result = runner.invoke(initialized_cli, [
+            "whole-genome", "scatter", "-v", filters_vcf, "-o", png,
+            "-l", "test"] + filters)
+        assert result.exit_code == 0
+        assert "PNG image data" in magic.from_file(png)
+        result = runner.invoke(initialized_cli, [
+            "regions", "histogram", "-v", filters_vcf, "-o", temp_dir,
+            "-R", "chr1:1-1000"] + filters)
+        assert result.exit_code == 0
+        assert "PNG image data" in magic.from_file(join(temp_dir,
+                                                        "chr1_1-1000.png"))
+        table = join(temp_dir, "filtered.parquet")
+        result = runner.invoke(initialized_cli, [
+            "extract", "-v", filters_vcf, "-o", table, "-l", "test"] + filters)
+        assert result.exit_code == 0
+        # filters are applied while reading VCF files only
+        result = runner.invoke(initialized_cli, [
+            "whole-genome", "scatter", "-t", table, "-o", png,
+            "--pass-only"])
+        assert result.exit_code != 0
+        assert "--table" in result.output
+
+    def test_whole_genome_scatter_memory_limit(self, initialized_cli):
+        runner = CliRunner()
+        tmp = NamedTemporaryFile(suffix=".png")
+        result = runner.invoke(initialized_cli, ["whole-genome", "scatter",
+                                                 "-v", mini_vcf, "-o",
+                                                 tmp.name, "-l", "test",
+                                                 "--memory-limit", "1"])
+        assert result.exit_code == 0
+        assert "PNG image data" in magic.from_file(tmp.name)
+
+    def test_region_profile(self, temp_dir, initialized_cli):
+        runner = CliRunner()
+        profile = join(temp_dir, "profile.json")
+        cprofile = join(temp_dir, "profile.prof")
+        result = runner.invoke(initialized_cli, ["regions", "all", "-v",
+                                                 mini_vcf, "-o", temp_dir,
+                                                 "-R", "chr1:100000-100500",
+                                                 "--profile", profile,
+                                                 "--cprofile", cprofile])
+        assert result.exit_code == 0
+        with open(profile) as handle:
+            report = json.load(handle)
+        for name in ("read", "variation", "dataframe", "draw", "savefig"):
+            assert report["stages"][name]["calls"] > 0
+        assert report["regions"]["chr1_100000-100500"]["render"]["calls"] == 3
+        assert pstats.Stats(cprofile).total_calls > 0
+
+    def test_whole_genome_profile(self, initialized_cli):
+        runner = CliRunner()
+        with NamedTemporaryFile(suffix=".png") as tmp, \
+                NamedTemporaryFile(suffix=".json") as profile:
+            result = runner.invoke(initialized_cli, ["whole-genome",
+                                                     "scatter", "-v", mini_vcf,
+                                                     "-l", "a", "-o", tmp.name,
+                                                     "--profile",
+                                                     profile.name])
+            assert result.exit_code == 0
+            report = json.load(profile)
+        assert report["contigs"]["chr1"]["extract"]["calls"] == 1
+        assert report["stages"]["savefig"]["calls"] == 1
+        assert report["total"]["wall_seconds"] > 0
+
+
+class TestStartup(object):
+
+    @pytest.mark.parametrize("args", [
+        ["--help"],
+        ["whole-genome", "--help"],
+        ["whole-genome", "scatter", "--help"],
+        ["regions", "all", "--help"],
+        ["extract", "--help"],
+        # usage errors
+        ["whole-genome", "scatter"],
+        ["regions", "scatter", "-R", "not a region", "-o", "."],
+    ])
+    def test_no_heavy_imports(self, args):
+        assert loaded_heavy_modules(*args) == []
+
+    def test_command_loads_dependencies(self, temp_dir):
+        heavy = loaded_heavy_modules("regions", "histogram", "-v", mini_vcf,
+                                     "-o", temp_dir, "-R",
+                                     "chr1:100000-100500")
+        assert "matplotlib" in heavy and "pysam" in heavy
+        assert "seaborn" not in heavy
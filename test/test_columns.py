@@ -0,0 +1,90 @@
+"""
+test_columns
+~~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+
+import numpy as np
+import pandas as pd
+
+from afplot.columns import AlleleTable, AlleleHistogram, \
+    concat_frames, histograms_from_dataframe
+
+
+class TestAlleleTable(object):
+
+    def test_append_grows(self):
+        table = AlleleTable(["a", "b"], capacity=1)
+        for i in range(100):
+            table.append(i, [0.25, 0.75], [0.25, 0.25], i % 2)
+        assert len(table) == 200
+        assert table.pos.dtype == np.int32
+        assert table.af.dtype == np.float32
+        assert table.distance.dtype == np.float32
+        assert list(table.pos[:4]) == [0, 0, 1, 1]
+        assert list(table.label_array()[:4]) == ["a", "a", "b", "b"]
+
+    def test_extend(self):
+        table = AlleleTable(["a"])
+        table.extend(np.arange(3), np.array([0.0, 0.5, 1.0]), 0,
+                     np.array([0.0, 0.0, 0.0]))
+        assert len(table) == 3
+        assert list(table.af) == [0.0, 0.5, 1.0]
+
+    def test_to_dataframe(self):
+        table = AlleleTable(["a", "b"])
+        table.append(10, [0.5, 0.5], [0.0, 0.0], 1)
+        df = table.to_dataframe("chr1")
+        assert list(df.pos) == [10, 10]
+        assert list(df.label) == ["b", "b"]
+        assert list(df.chromosome) == ["chr1", "chr1"]
+        assert df.pos.dtype == np.int32
+        assert df.label.dtype == "category"
+        assert df.chromosome.dtype == "category"
+        df = table.to_dataframe("region", column="chrom")
+        assert list(df.chrom) == ["region", "region"]
+
+    def test_concat_frames_keeps_categories(self):
+        a = AlleleTable(["a", "b"])
+        a.append(1, [0.5], [0.0], 1)
+        b = AlleleTable(["c"])
+        b.append(2, [0.5], [0.0], 0)
+        df = concat_frames([a.to_dataframe("chr1"), b.to_dataframe("chr2")])
+        assert list(df.label.cat.categories) == ["a", "b", "c"]
+        assert list(df.label) == ["b", "c"]
+        assert list(df.chromosome.cat.categories) == ["chr1", "chr2"]
+        assert list(df.index) == [0, 1]
+
+
+class TestAlleleHistogram(object):
+
+    def test_extend_matrix(self):
+        hist = AlleleHistogram(["a", "b"], bins=4)
+        af = np.array([[0.0, 1.0], [0.3, 0.7], [0.5, 0.0]])
+        hist.extend_matrix(np.array([1, 2, 3]), np.array([2, 2, 1]), af,
+                           np.array([0, 1, 1]), np.zeros_like(af))
+        assert len(hist) == 5
+        assert hist.counts.tolist() == [[1, 0, 0, 1], [0, 1, 2, 0]]
+        assert hist.nonzero.tolist() == [1, 3]
+
+    def test_from_table(self):
+        table = AlleleTable(["a"])
+        table.extend(np.arange(3), np.array([0.1, 0.5, np.nan]), 0,
+                     np.zeros(3))
+        hist = AlleleHistogram.from_table(table, bins=2)
+        assert hist.counts.tolist() == [[1, 1]]
+        both = AlleleHistogram.concatenate([hist, hist])
+        assert both.counts.tolist() == [[2, 2]]
+
+    def test_from_dataframe_drops_all_zero(self):
+        df = pd.DataFrame({"pos": [1, 2, 3, 4],
+                           "af": [0.0, 0.0, 0.25, 0.75],
+                           "label": ["a", "a", "b", "b"],
+                           "distance": [0.0] * 4,
+                           "chromosome": ["chr1"] * 4})
+        hists = histograms_from_dataframe(df, bins=2)
+        assert list(hists.keys()) == [("chr1", "b")]
+        assert hists["chr1", "b"].counts.tolist() == [1, 1]
+        assert hists["chr1", "b"].grid.sum() == 2
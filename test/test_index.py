@@ -0,0 +1,104 @@
+"""
+test_index
+~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+import gzip
+from os.path import realpath, join, dirname
+import shutil
+import struct
+from tempfile import mkdtemp
+
+import pysam
+import pytest
+
+from afplot.index import parse_index, read_index
+from afplot.reader import open_reader
+from afplot.utils import drop_empty_contigs, contig_sizes
+from afplot.whole_genome import build_histograms
+
+mini_vcf = join(dirname(realpath(__file__)), "data/mini.vcf.gz")
+
+HEADER = """##fileformat=VCFv4.1
+##FORMAT=<ID=AD,Number=.,Type=Integer,Description="Allelic depths">
+##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">
+##contig=<ID=chr1,length=100000>
+##contig=<ID=chr2,length=1000>
+##contig=<ID=chr3,length=500>
+#CHROM	POS	ID	REF	ALT	QUAL	FILTER	INFO	FORMAT	SAMPLE1
+"""
+
+RECORDS = [("chr1", 100), ("chr1", 200), ("chr1", 300), ("chr2", 10)]
+
+
+def write_indexed_vcf(directory, csi=False):
+    """Write a VCF of which chr3 has no records"""
+    path = join(directory, "test.vcf")
+    with open(path, "w") as handle:
+        handle.write(HEADER)
+        for chrom, pos in RECORDS:
+            handle.write("{0}\t{1}\t.\tA\tC\t100\tPASS\t.\tGT:AD\t"
+                         "0/1:10,10\n".format(chrom, pos))
+    return pysam.tabix_index(path, preset="vcf", force=True, csi=csi)
+
+
+@pytest.fixture
+def temp_dir():
+    the_dir = mkdtemp()
+    yield the_dir
+    shutil.rmtree(the_dir, ignore_errors=True)  # teardown
+
+
+class TestIndex(object):
+
+    @pytest.mark.parametrize("csi", [False, True])
+    def test_read_index(self, temp_dir, csi):
+        path = write_indexed_vcf(temp_dir, csi)
+        counts = read_index(path)
+        assert list(counts.items()) == [("chr1", 3), ("chr2", 1)]
+
+    def test_index_without_counts(self):
+        # old tabix indexes have no pseudo-bin with record counts,
+        # but list only contigs with records
+        assert read_index(mini_vcf) == {"chr1": None}
+        assert drop_empty_contigs(["chr1", "chr2"],
+                                  [open_reader(mini_vcf)]) == ["chr1"]
+        assert contig_sizes([open_reader(mini_vcf)])[1] == {}
+
+    def test_no_index(self, temp_dir):
+        path = join(temp_dir, "test.vcf.gz")
+        shutil.copy(mini_vcf, path)
+        assert read_index(path) is None
+
+    def test_csi_without_names(self, temp_dir):
+        path = write_indexed_vcf(temp_dir, csi=True)
+        with gzip.open(path + ".csi", "rb") as handle:
+            data = bytearray(handle.read())
+        l_aux, = struct.unpack_from("<i", data, 12)
+        # an empty aux field, as in indexes of BCF files
+        data[12:16] = struct.pack("<i", 0)
+        assert parse_index(bytes(data[:16] + data[16 + l_aux:])) is None
+
+    def test_not_an_index(self):
+        with pytest.raises(ValueError):
+            parse_index(b"BAI\1")
+
+    @pytest.mark.parametrize("backend", ["pysam", "pyvcf"])
+    def test_drop_empty_contigs(self, temp_dir, backend):
+        reader = open_reader(write_indexed_vcf(temp_dir), backend)
+        assert list(reader.contigs) == ["chr1", "chr2", "chr3"]
+        assert drop_empty_contigs(["chr1", "chr2", "chr3"],
+                                  [reader]) == ["chr1", "chr2"]
+        lengths, counts = contig_sizes([reader, reader])
+        assert lengths == {"chr1": 100000, "chr2": 1000, "chr3": 500}
+        assert counts == {"chr1": 3, "chr2": 1}
+
+    def test_facets(self, temp_dir):
+        reader = open_reader(write_indexed_vcf(temp_dir))
+        hists = build_histograms([reader], ["test"], ["SAMPLE1"],
+                                 ["chr1", "chr2"], facets={"chr2": "other"})
+        assert list(hists) == [("chr1", "het"), ("other", "het")]
+        # reference and alternative allele of the chr2 record
+        assert hists[("other", "het")].counts.sum() == 2
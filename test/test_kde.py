@@ -0,0 +1,48 @@
+"""
+test_kde
+~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+
+import numpy as np
+
+from afplot.kde import KDE_GRID, MIN_BANDWIDTH, linear_binning, \
+    binned_kde, scott_bandwidth
+
+
+def direct_kde(x, points, bandwidth):
+    d = (points[:, None] - x[None, :]) / bandwidth
+    k = np.exp(-0.5 * d ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+    return k.mean(axis=1)
+
+
+class TestKde(object):
+
+    def test_linear_binning(self):
+        grid = linear_binning([0.0, 0.5, 1.0, 0.25], [0, 0, 1, 1], 2,
+                              gridsize=3)
+        assert grid.tolist() == [[1.0, 1.0, 0.0], [0.5, 0.5, 1.0]]
+
+    def test_matches_direct_kde(self):
+        x = np.random.RandomState(42).beta(4, 6, 5000)
+        grid = linear_binning(x)[0]
+        bw = scott_bandwidth(grid)
+        assert abs(bw - x.std() * len(x) ** (-0.2)) < 1e-3
+        points, density = binned_kde(grid)
+        expected = direct_kde(x, points, bw)
+        assert np.abs(density - expected).max() < 1e-3
+        assert abs(np.trapz(density, points) - 1) < 1e-6
+
+    def test_zero_variance(self):
+        grid = linear_binning(np.full(100, 0.5))[0]
+        assert scott_bandwidth(grid) == MIN_BANDWIDTH
+        points, density = binned_kde(grid)
+        assert np.all(np.isfinite(density))
+        assert abs(points[np.argmax(density)] - 0.5) < 1.0 / KDE_GRID
+        assert abs(np.trapz(density, points) - 1) < 1e-6
+
+    def test_empty(self):
+        points, density = binned_kde(np.zeros(KDE_GRID))
+        assert len(points) == len(density) == 0
@@ -0,0 +1,37 @@
+"""
+test_parallel
+~~~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+
+from afplot.parallel import ordered_map
+
+
+class CountingTasks(list):
+    """List of tasks counting how many were taken"""
+
+    taken = 0
+
+    def __iter__(self):
+        for x in list.__iter__(self):
+            self.taken += 1
+            yield x
+
+
+class TestParallel(object):
+
+    def test_order(self):
+        tasks = list(range(-20, 0))
+        assert list(ordered_map(abs, tasks, 3)) == list(range(20, 0, -1))
+        assert list(ordered_map(abs, tasks, 1)) == list(range(20, 0, -1))
+
+    def test_bounded_pending(self):
+        tasks = CountingTasks(range(-50, 0))
+        results = ordered_map(abs, tasks, processes=2, max_pending=3)
+        assert next(results) == 50
+        # three submitted up front, one more after the first result
+        assert tasks.taken == 4
+        assert list(results) == list(range(49, 0, -1))
+        assert tasks.taken == 50
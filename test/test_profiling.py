@@ -0,0 +1,94 @@
+"""
+afplot.profiling
+~~~~~~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+import json
+from os.path import join
+import shutil
+from tempfile import mkdtemp
+
+import numpy as np
+import pytest
+
+from afplot import profiling
+from afplot.profiling import Profiler, profile_iter, stage
+
+
+@pytest.fixture
+def temp_dir():
+    the_dir = mkdtemp()
+    yield the_dir
+    shutil.rmtree(the_dir, ignore_errors=True)  # teardown
+
+
+class TestProfiler(object):
+
+    def test_inactive(self):
+        assert profiling._active is None
+        with stage("read"):
+            pass
+        assert list(profile_iter("read", [1, 2])) == [1, 2]
+
+    def test_stages(self, temp_dir):
+        path = join(temp_dir, "profile.json")
+        with profiling.profiling(path) as profiler:
+            for chrom in ("chr1", "chr2"):
+                with stage("extract", contig=chrom):
+                    with stage("read", contig=chrom):
+                        pass
+            with stage("render", region="chr1_1-10"):
+                pass
+            assert list(profile_iter("read", [1, 2], contig="chr3")) == [1, 2]
+        assert profiling._active is None
+        assert isinstance(profiler, Profiler)
+        with open(path) as handle:
+            report = json.load(handle)
+        assert list(report["stages"]) == ["read", "extract", "render"]
+        assert report["stages"]["extract"]["calls"] == 2
+        assert list(report["contigs"]) == ["chr1", "chr2", "chr3"]
+        assert list(report["contigs"]["chr1"]) == ["read", "extract"]
+        assert list(report["regions"]) == ["chr1_1-10"]
+        assert report["total"]["wall_seconds"] >= \
+            report["stages"]["extract"]["wall_seconds"]
+
+    def test_peak_memory(self):
+        profiler = Profiler()
+        profiler.start()
+        try:
+            with profiler.stage("outer"):
+                with profiler.stage("allocate"):
+                    x = np.ones(4 * 1024 * 1024, dtype=np.uint8)
+                    del x
+                with profiler.stage("small"):
+                    pass
+        finally:
+            profiler.stop()
+        report = profiler.report()
+        assert report["stages"]["allocate"]["peak_memory_mb"] >= 4
+        assert report["stages"]["outer"]["peak_memory_mb"] >= 4
+        assert report["stages"]["small"]["peak_memory_mb"] < 1
+        assert report["total"]["peak_memory_mb"] >= 4
+
+    def test_exception(self):
+        profiler = Profiler(memory=False)
+        with pytest.raises(ValueError):
+            with profiler.stage("read"):
+                raise ValueError
+        assert profiler.stages["read"].calls == 1
+        assert profiler._stack == []
+
+    def test_cprofile_only(self, temp_dir):
+        path = join(temp_dir, "profile.prof")
+        with profiling.profiling(cprofile_path=path) as profiler:
+            sum(range(100))
+        import pstats
+        assert pstats.Stats(path).total_calls > 0
+        assert not profiler.memory
+
+    def test_disabled(self):
+        with profiling.profiling() as profiler:
+            assert profiler is None
+            assert profiling._active is None
@@ -0,0 +1,113 @@
+"""
+afplot.progress
+~~~~~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+from io import StringIO
+from os.path import realpath, join, dirname
+
+from afplot.progress import Progress, format_duration
+from afplot.reader import open_reader
+from afplot.whole_genome import get_array_for_chrom_all
+
+mini_vcf = join(dirname(realpath(__file__)), "data/mini.vcf.gz")
+
+
+class TtyStream(StringIO):
+    def isatty(self):
+        return True
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestProgress(object):
+
+    def test_format_duration(self):
+        assert format_duration(None) == "--:--:--"
+        assert format_duration(3725.4) == "1:02:05"
+        assert format_duration(59) == "0:00:59"
+
+    def test_status(self):
+        clock = Clock()
+        p = Progress(1000, stream=StringIO(), clock=clock)
+        p.start_contig("chr1")
+        clock.now = 10.0
+        p.update(records=500, kept=400, done=250)
+        status = p.status()
+        assert status["contig"] == "chr1"
+        assert status["done"] == 0.25
+        assert status["records_per_s"] == 50
+        assert status["kept"] == 400
+        assert status["eta_s"] == 30
+
+    def test_unknown_total(self):
+        p = Progress(stream=StringIO(), clock=Clock())
+        p.update(records=5, done=5)
+        assert p.status()["done"] is None
+        assert p.status()["eta_s"] is None
+
+    def test_log_lines_throttled(self):
+        clock = Clock()
+        stream = StringIO()
+        p = Progress(100, stream=stream, clock=clock)
+        assert not p.tty and p.interval == 30
+        for i in range(100):
+            clock.now = i
+            p.update(records=10, kept=10, done=1)
+        p.finish()
+        lines = stream.getvalue().splitlines()
+        # at 30, 60 and 90 seconds, and when finished
+        assert len(lines) == 4
+        assert all(x.startswith("afplot progress ") for x in lines)
+        fields = dict(x.split("=") for x in lines[-1].split()[2:])
+        assert fields["done"] == "1.000"
+        assert fields["records"] == "1000"
+        assert fields["kept"] == "1000"
+        assert fields["contig"] == "NA"
+
+    def test_tty(self):
+        clock = Clock()
+        stream = TtyStream()
+        p = Progress(100, stream=stream, clock=clock)
+        assert p.tty and p.interval < 1
+        p.start_contig("chr2")
+        clock.now = 1.0
+        p.update(records=10, done=50)
+        p.message("hello")
+        p.finish()
+        out = stream.getvalue()
+        assert out.startswith("\rchr2 50.0% | 10 records")
+        assert "\r\x1b[Khello\n" in out
+        assert out.endswith("\n")
+        assert "afplot progress" not in out
+
+    def test_disabled(self):
+        stream = StringIO()
+        p = Progress(100, stream=stream, enabled=False, interval=0)
+        p.update(records=10, kept=5, done=100)
+        p.finish()
+        assert stream.getvalue() == ""
+        assert p.records == 10 and p.kept == 5
+
+    def test_extraction_counts(self):
+        reader = open_reader(mini_vcf)
+        p = Progress(stream=StringIO(), enabled=False)
+        table = get_array_for_chrom_all(reader, "chr1", progress=p)
+        length = reader.contigs.get("chr1").length
+        assert p.kept == len(table)
+        assert p.records > 0
+        assert p.done == length
+        windows = Progress(stream=StringIO(), enabled=False)
+        for start, end in [(0, 100002), (100002, None)]:
+            get_array_for_chrom_all(reader, "chr1", progress=windows,
+                                    start=start, end=end)
+        assert windows.kept == p.kept
+        assert windows.done == length
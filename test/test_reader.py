@@ -0,0 +1,81 @@
+"""
+test_reader
+~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+
+from os.path import realpath, join, dirname
+
+import numpy as np
+import pytest
+import vcf
+
+from afplot.constants import BACKENDS
+from afplot.reader import open_reader, as_reader, PyVCFReader
+from afplot.variation import CallFilter
+
+mini_vcf = join(dirname(realpath(__file__)), "data/mini.vcf.gz")
+filters_vcf = join(dirname(realpath(__file__)), "data/filters.vcf.gz")
+
+
+def _concat(batches):
+    return [np.concatenate(x) for x in zip(*batches)]
+
+
+class TestReader(object):
+
+    @pytest.mark.parametrize("backend", BACKENDS)
+    def test_header(self, backend):
+        reader = open_reader(mini_vcf, backend)
+        assert reader.samples == ["SAMPLE1"]
+        assert list(reader.contigs.keys()) == ["chr1"]
+        assert reader.contigs.get("chr1").length == 249250621
+
+    def test_backends_agree(self):
+        pysam_arrays = list(open_reader(mini_vcf, "pysam").fetch_arrays("chr1"))
+        pyvcf_arrays = list(open_reader(mini_vcf, "pyvcf").fetch_arrays("chr1"))
+        assert len(pysam_arrays[0].pos) == 5
+        for a, b in zip(pysam_arrays[0], pyvcf_arrays[0]):
+            assert np.array_equal(a, b)
+
+    @pytest.mark.parametrize("backend", BACKENDS)
+    def test_region(self, backend):
+        reader = open_reader(mini_vcf, backend)
+        batches = list(reader.fetch_arrays("chr1", 100000, 100002))
+        assert list(_concat(batches)[0]) == [100001, 100002]
+
+    @pytest.mark.parametrize("backend", BACKENDS)
+    def test_missing_contig(self, backend):
+        reader = open_reader(mini_vcf, backend)
+        assert list(reader.fetch_arrays("chr2")) == []
+
+    def test_record_fields(self):
+        pysam_arrays = _concat(open_reader(filters_vcf, "pysam").fetch_arrays(
+            "chr1"))
+        pyvcf_arrays = _concat(open_reader(filters_vcf, "pyvcf").fetch_arrays(
+            "chr1"))
+        for a, b in zip(pysam_arrays, pyvcf_arrays):
+            assert np.array_equal(a, b)
+        arrays = next(open_reader(filters_vcf).fetch_arrays("chr1"))
+        # LowQual and missing FILTER
+        assert list(arrays.pos[~arrays.passed]) == [200, 500]
+        assert list(arrays.pos[~arrays.snv]) == [300]
+
+    @pytest.mark.parametrize("backend", BACKENDS)
+    def test_record_filter(self, backend):
+        reader = open_reader(filters_vcf, backend)
+        call_filter = CallFilter(pass_only=True, snv_only=True,
+                                 biallelic_only=True, min_depth=20)
+        batches = list(reader.fetch_arrays("chr1", call_filter=call_filter))
+        # only conditions not depending on the sample are applied
+        assert list(_concat(batches)[0]) == [100, 600, 700, 800]
+        call_filter = CallFilter(pass_only=True)
+        assert list(reader.fetch_arrays("chr1", 150, 250,
+                                        call_filter=call_filter)) == []
+
+    def test_as_reader(self):
+        wrapped = as_reader(vcf.Reader(filename=mini_vcf))
+        assert isinstance(wrapped, PyVCFReader)
+        assert as_reader(wrapped) is wrapped
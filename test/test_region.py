@@ -0,0 +1,102 @@
+"""
+test_region
+~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+
+import shutil
+from os import listdir
+from os.path import realpath, join, dirname
+from tempfile import mkdtemp
+
+import pytest
+
+from afplot.reader import open_reader
+from afplot.region import build_df_for_region, iter_dfs_for_regions, \
+    plot_regions
+from afplot.utils import Region
+from afplot.variation import CallFilter
+
+mini_vcf = join(dirname(realpath(__file__)), "data/mini.vcf.gz")
+filters_vcf = join(dirname(realpath(__file__)), "data/filters.vcf.gz")
+
+
+@pytest.fixture
+def temp_dir():
+    the_dir = mkdtemp()
+    yield the_dir
+    shutil.rmtree(the_dir, ignore_errors=True)  # teardown
+
+
+class TestRegion(object):
+
+    @pytest.mark.parametrize("max_gap,max_block", [(0, None),
+                                                   (100000, None),
+                                                   (100000, 2)])
+    def test_sweep_matches_single_fetch(self, max_gap, max_block):
+        reader = open_reader(mini_vcf)
+        regions = [Region("chr1", 100001, 100004),
+                   Region("chr1", 99000, 100001),
+                   Region("chr1", 100, 200),
+                   Region("chr1", 100000, 100500),
+                   Region("chr2", 100000, 100500),
+                   Region("chr1", 100002, 100003)]
+        swept = list(iter_dfs_for_regions(reader, regions, max_gap=max_gap,
+                                          max_block=max_block))
+        assert [x[0] for x in swept] == regions
+        for reg, df in swept:
+            single = build_df_for_region(reader, reg)
+            if single is None:
+                assert df is None
+            else:
+                assert df.equals(single)
+
+    def test_sweep_in_input_order(self):
+        reader = open_reader(mini_vcf)
+        fetched = []
+        fetch_arrays = reader.fetch_arrays
+
+        def recording_fetch(chrom, *args, **kwargs):
+            fetched.append(chrom)
+            return fetch_arrays(chrom, *args, **kwargs)
+
+        reader.fetch_arrays = recording_fetch
+        # chr2 is not in the header, so comes after chr1 in index order
+        regions = [Region("chr2", 100000, 100500),
+                   Region("chr1", 100000, 100500)]
+        swept = iter_dfs_for_regions(reader, regions)
+        assert next(swept)[0] == regions[0]
+        assert fetched == ["chr2"]
+        assert next(swept)[0] == regions[1]
+        assert fetched == ["chr2", "chr1"]
+
+    def test_call_filter(self):
+        reader = open_reader(filters_vcf)
+        call_filter = CallFilter(pass_only=True, min_depth=20)
+        regions = [Region("chr1", 0, 350), Region("chr1", 450, 550),
+                   Region("chr1", 550, 1000)]
+        swept = list(iter_dfs_for_regions(reader, regions,
+                                          call_filter=call_filter))
+        assert swept[1][1] is None  # only a record without FILTER
+        for reg, df in swept:
+            single = build_df_for_region(reader, reg,
+                                         call_filter=call_filter)
+            if single is None:
+                assert df is None
+            else:
+                assert df.equals(single)
+        assert list(swept[0][1].pos.unique()) == [100, 300]
+        assert list(swept[2][1].pos.unique()) == [600, 800]
+
+    def test_parallel_plot_regions(self, temp_dir):
+        reader = open_reader(mini_vcf)
+        regions = [Region("chr1", 100000, 100500),
+                   Region("chr1", 100, 200),
+                   Region("chr1", 99999, 100003)]
+        with pytest.warns(UserWarning, match="chr1_100-200 is empty"):
+            plot_regions(reader, temp_dir, regions, "histogram", None,
+                         dpi=50, jobs=2)
+        assert sorted(listdir(temp_dir)) == ["chr1_100000-100500.png",
+                                             "chr1_99999-100003.png"]
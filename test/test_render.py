@@ -0,0 +1,86 @@
+"""
+test_render
+~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+
+from os.path import join
+import shutil
+from tempfile import mkdtemp
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from afplot.columns import AlleleTable
+from afplot.constants import CALL_TYPES
+from afplot.render import bin_points, composite, label_order, \
+    RegionRenderer
+from afplot.store import AlleleStore
+
+
+@pytest.fixture
+def temp_dir():
+    the_dir = mkdtemp()
+    yield the_dir
+    shutil.rmtree(the_dir, ignore_errors=True)
+
+
+def region_df(labels):
+    n = len(labels)
+    return pd.DataFrame({"pos": np.arange(n) + 100,
+                         "af": np.linspace(0.1, 0.9, n),
+                         "label": labels,
+                         "distance": np.zeros(n),
+                         "chrom": ["dummy"] * n})
+
+
+class TestRender(object):
+
+    def test_bin_points(self):
+        counts = bin_points([0, 5, 10, 10, 11], [0.0, 0.5, 1.0, 1.0, 0.5],
+                            (0, 10), (0, 1), (2, 2))
+        assert counts.tolist() == [[1, 0], [0, 3]]
+
+    def test_label_order(self):
+        # het appears first, but comes after hom_ref in CALL_TYPES
+        table = AlleleTable(CALL_TYPES)
+        table.extend([1, 2, 3], [0.5, 1.0, 0.5], [1, 0, 1], [0, 0, 0])
+        df = table.to_dataframe("chr1")
+        assert label_order(df.label) == ["het", "hom_ref"]
+        assert label_order(df.label.astype(str)) == ["het", "hom_ref"]
+        store = AlleleStore()
+        store.add("chr1", table)
+        assert store.labels == label_order(df.label)
+
+    def test_composite_opacity(self):
+        counts = [np.array([[0, 1, 2]])]
+        image = composite(counts, [(1.0, 0.0, 0.0)], alpha=0.5)
+        assert list(image[0, :, 3]) == [0.0, 0.5, 0.75]
+        assert list(image[0, 2, :3]) == [1.0, 0.0, 0.0]
+
+    @pytest.mark.parametrize("kind", ["histogram", "scatter", "distance"])
+    def test_region_renderer_reuses_figure(self, temp_dir, kind):
+        renderer = RegionRenderer(kind, dpi=30, title="test")
+        fig = renderer.fig
+        renderer.render(region_df(["het", "het", "hom_alt"]),
+                        join(temp_dir, "a.png"))
+        renderer.render(region_df(["het"]), join(temp_dir, "b.png"))
+        assert renderer.fig is fig
+        assert sorted(renderer._artists) == ["het", "hom_alt"]
+        assert not any(x.get_visible()
+                       for x in renderer._artists["hom_alt"])
+        texts = renderer.ax.get_legend().get_texts()
+        assert [x.get_text() for x in texts] == ["het"]
+        renderer.close()
+
+    def test_region_histogram_keeps_zero_labels(self, temp_dir):
+        renderer = RegionRenderer("histogram", dpi=30)
+        df = region_df(["het", "het", "no_call"])
+        df.loc[2, "af"] = 0.0
+        renderer.render(df, join(temp_dir, "a.png"))
+        texts = renderer.ax.get_legend().get_texts()
+        assert [x.get_text() for x in texts] == ["het", "no_call"]
+        renderer.close()
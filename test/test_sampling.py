@@ -0,0 +1,90 @@
+"""
+test_sampling
+~~~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+
+from os.path import realpath, join, dirname
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from afplot.columns import AlleleTable
+from afplot.reader import open_reader
+from afplot.sampling import ReservoirTable, downsample_dataframe, \
+    stratified_quota
+from afplot.whole_genome import build_dataframe
+
+multi_vcf = join(dirname(realpath(__file__)), "data/multi.vcf.gz")
+
+
+@pytest.fixture
+def table():
+    rs = np.random.RandomState(7)
+    n = 5000
+    t = AlleleTable(["a", "b", "c"])
+    t.extend(np.arange(n) * 10, rs.uniform(size=n).astype(np.float32),
+             rs.choice(3, size=n, p=[0.7, 0.2, 0.1]),
+             rs.uniform(size=n).astype(np.float32))
+    return t
+
+
+def as_tuples(t):
+    return list(zip(t.pos, t.af, t.code))
+
+
+class TestSampling(object):
+
+    def test_stratified_quota(self):
+        assert stratified_quota([70, 20, 10], 10).tolist() == [7, 2, 1]
+        assert stratified_quota([5, 3], 10).tolist() == [5, 3]
+        assert stratified_quota([1, 1, 1], 2).sum() == 2
+
+    def test_sample_size_and_strata(self, table):
+        sample = ReservoirTable.from_table(table, 100).sample()
+        assert len(sample) == 100
+        expected = stratified_quota(np.bincount(table.code), 100)
+        assert np.bincount(sample.code).tolist() == expected.tolist()
+        assert np.all(np.diff(sample.pos) >= 0)
+
+    def test_independent_of_order_and_windows(self, table):
+        full = ReservoirTable.from_table(table, 100, seed=3).sample()
+        parts = []
+        for idx in np.array_split(np.arange(len(table))[::-1], 7):
+            part = ReservoirTable(table.labels, 100, seed=3)
+            part.extend(table.pos[idx], table.af[idx], table.code[idx],
+                        table.distance[idx])
+            parts.append(part)
+        merged = ReservoirTable.concatenate(parts).sample()
+        assert sorted(as_tuples(merged)) == sorted(as_tuples(full))
+
+    def test_seed(self, table):
+        a = ReservoirTable.from_table(table, 100, seed=1).sample()
+        b = ReservoirTable.from_table(table, 100, seed=1).sample()
+        c = ReservoirTable.from_table(table, 100, seed=2).sample()
+        assert as_tuples(a) == as_tuples(b)
+        assert as_tuples(a) != as_tuples(c)
+
+    def test_downsample_dataframe_matches_reservoir(self, table):
+        df = table.to_dataframe("chr1")
+        sampled = downsample_dataframe(df, 100, seed=5)
+        expected = ReservoirTable.from_table(table, 100, seed=5).sample()
+        assert list(sampled.pos) == list(expected.pos)
+        small = downsample_dataframe(df.iloc[:10], 100)
+        assert len(small) == 10
+
+    def test_build_dataframe_max_points(self):
+        reader = open_reader(multi_vcf)
+        args = ([reader, reader], ["a", "b"], ["SAMPLE1", "SAMPLE2"],
+                list(reader.contigs.keys()))
+        full = build_dataframe(*args)
+        sampled = build_dataframe(*args, max_points=3, seed=1)
+        assert sampled.groupby("chromosome").size().max() <= 3
+        threaded = build_dataframe(*args, max_points=3, seed=1, threads=2,
+                                   chunk_size=50000000)
+        pd.testing.assert_frame_equal(sampled.reset_index(drop=True),
+                                      threaded.reset_index(drop=True))
+        assert len(sampled) < len(full)
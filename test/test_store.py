@@ -0,0 +1,104 @@
+"""
+test_store
+~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+
+from os import listdir
+from os.path import realpath, join, dirname
+
+import numpy as np
+import pandas as pd
+
+from afplot.columns import AlleleTable
+from afplot.reader import open_reader
+from afplot.store import AlleleStore
+from afplot.whole_genome import build_dataframe, build_histograms, \
+    build_store, kind_columns
+
+multi_vcf = join(dirname(realpath(__file__)), "data/multi.vcf.gz")
+
+
+def make_table(n, labels=("a", "b")):
+    rs = np.random.RandomState(n)
+    table = AlleleTable(labels)
+    table.extend(np.arange(n), rs.uniform(size=n), rs.choice(2, size=n),
+                 rs.uniform(size=n))
+    return table
+
+
+class TestAlleleStore(object):
+
+    def test_spill(self):
+        in_memory = AlleleStore()
+        spilling = AlleleStore(memory_limit=1000)
+        for i, chrom in enumerate(["chr1", "chr2", "chr1"]):
+            table = make_table(100 + i)
+            in_memory.add(chrom, table)
+            spilling.add(chrom, table)
+        assert in_memory.spilled_bytes == 0
+        assert spilling.memory_bytes == 0
+        assert spilling.spilled_bytes == 13 * 303
+        assert len(listdir(spilling._tmpdir.name)) == 3
+        assert spilling.contigs == ["chr1", "chr2"]
+        for chrom in spilling.contigs:
+            pd.testing.assert_frame_equal(spilling.contig_frame(chrom),
+                                          in_memory.contig_frame(chrom))
+        tmpdir = spilling._tmpdir.name
+        spilling.close()
+        assert not any(x == tmpdir for x in listdir(dirname(tmpdir)))
+
+    def test_ranges_and_labels(self):
+        store = AlleleStore()
+        store.add("chr1", make_table(10, ("x", "y")))
+        store.add("chr2", make_table(0))
+        assert store.contigs == ["chr1"]
+        assert store.value_range("pos") == (0, 9)
+        assert sorted(store.labels) == ["x", "y"]
+
+    def test_build_store_matches_dataframe(self):
+        reader = open_reader(multi_vcf)
+        args = ([reader, reader], ["a", "b"], ["SAMPLE1", "SAMPLE2"],
+                list(reader.contigs.keys()))
+        expected = build_dataframe(*args).reset_index(drop=True)
+        with build_store(*args, memory_limit=1) as store:
+            assert store.spilled_bytes > 0
+            df = store.to_dataframe()
+        pd.testing.assert_frame_equal(df, expected)
+
+    def test_sampled_store_histograms(self):
+        reader = open_reader(multi_vcf)
+        args = ([reader, reader], ["a", "b"], ["SAMPLE1", "SAMPLE2"],
+                list(reader.contigs.keys()))
+        expected = build_histograms(*args)
+        for threads in (1, 2):
+            with build_store(*args, max_points=2, threads=threads,
+                             histograms=True) as store:
+                assert len(store.contig_frame("chr1")) == 2
+                hists = store.histograms
+            assert list(hists.keys()) == list(expected.keys())
+            for key in expected:
+                assert np.array_equal(hists[key].counts,
+                                      expected[key].counts)
+        with build_store(*args, max_points=2) as store:
+            assert store.histograms is None
+
+    def test_columns(self):
+        assert kind_columns(["scatter", "histogram"]) == ("af", )
+        assert kind_columns(["distance", "scatter"]) == ("af", "distance")
+        table = make_table(50)
+        full = AlleleStore()
+        full.add("chr1", table)
+        store = AlleleStore(memory_limit=1, columns=("distance", ))
+        store.add("chr1", table)
+        assert store.spilled_bytes == 9 * 50
+        assert store.columns == ("distance", )
+        df = store.contig_frame("chr1")
+        expected = full.contig_frame("chr1")
+        assert df.af.isnull().all()
+        pd.testing.assert_series_equal(df.distance, expected.distance)
+        pd.testing.assert_series_equal(df.label, expected.label)
+        assert store.value_range("distance") == \
+            full.value_range("distance")
@@ -0,0 +1,68 @@
+"""
+test_table
+~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+
+import shutil
+from os.path import join
+from tempfile import mkdtemp
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from afplot.columns import AlleleTable
+from afplot.table import write_table, read_table, table_contigs
+
+
+@pytest.fixture
+def temp_dir():
+    the_dir = mkdtemp()
+    yield the_dir
+    shutil.rmtree(the_dir, ignore_errors=True)  # teardown
+
+
+def _frame(chrom, n):
+    return pd.DataFrame({"pos": range(n), "af": [0.5] * n,
+                         "label": ["het"] * n, "distance": [0.0] * n,
+                         "chromosome": [chrom] * n})
+
+
+class TestTable(object):
+
+    def test_parquet_row_groups(self, temp_dir):
+        path = join(temp_dir, "t.parquet")
+        frames = [_frame("chr1", 10), _frame("chr2", 5), _frame("chr3", 3)]
+        assert write_table(frames, path) == 18
+        assert pq.ParquetFile(path).num_row_groups == 3
+        assert table_contigs(path) == ["chr1", "chr2", "chr3"]
+        df = read_table(path, ["chr2"])
+        assert len(df) == 5
+        assert set(df.chromosome) == {"chr2"}
+        assert len(read_table(path)) == 18
+
+    def test_feather(self, temp_dir):
+        path = join(temp_dir, "t.feather")
+        write_table([_frame("chr1", 10), _frame("chr2", 5)], path)
+        assert table_contigs(path) == ["chr1", "chr2"]
+        assert len(read_table(path, ["chr1"])) == 10
+
+    @pytest.mark.parametrize("name", ["t.parquet", "t.feather"])
+    def test_compact_schema(self, temp_dir, name):
+        path = join(temp_dir, name)
+        a = AlleleTable(["het", "hom_alt"])
+        a.extend([1, 2], [0.5, 1.0], [0, 1], [0.0, 0.0])
+        b = AlleleTable(["x"])
+        b.extend([3], [0.25], 0, [0.25])
+        write_table([a.to_dataframe("chr1"), b.to_dataframe("chr2")], path)
+        df = read_table(path)
+        assert df.pos.dtype == np.int32
+        assert df.af.dtype == np.float32
+        assert df.distance.dtype == np.float32
+        assert list(df.label.cat.categories) == ["het", "hom_alt", "x"]
+        assert list(df.chromosome.cat.categories) == ["chr1", "chr2"]
+        assert list(df.label) == ["het", "hom_alt", "x"]
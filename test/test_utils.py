@@ -13,7 +13,8 @@ from unittest.mock import Mock
 import vcf
 
 from afplot.utils import region_key, Region, _is_vcf_version_at_least_0_6_8, \
-    get_contigs, get_longest_contig_list, bed_reader
+    get_contigs, get_longest_contig_list, bed_reader, group_small_contigs, \
+    facet_order, merge_regions
 
 long = join(dirname(realpath(__file__)), "data/header_vcf/test.vcf")
 short = join(dirname(realpath(__file__)), "data/header_vcf/test.autosomes.vcf")
@@ -63,3 +64,25 @@ class TestUtils(object):
         assert margin_regions[0] == Region("chr1", 0, 700)
         assert margin_regions[1] == Region("chr1", 500, 2500)
         assert margin_regions[2] == Region("chr1", 9500, 20500)
+
+    def test_group_small_contigs(self):
+        contigs = ["chr1", "chr2", "chrM", "chrUn"]
+        lengths = {"chr1": 1000, "chr2": 900, "chrM": 16}
+        counts = {"chr1": 50, "chr2": 2, "chrUn": 1}
+        assert group_small_contigs(contigs, lengths, counts) == {}
+        assert group_small_contigs(contigs, lengths, counts,
+                                   min_length=100) == {"chrM": "other"}
+        facets = group_small_contigs(contigs, lengths, counts,
+                                     min_length=100, min_records=10)
+        assert facets == {"chr2": "other", "chrM": "other",
+                          "chrUn": "other"}
+        assert facet_order(contigs, facets) == ["chr1", "other"]
+        assert facet_order(contigs, {}) == contigs
+
+    def test_merge_regions_max_length(self):
+        regions = [Region("chr1", 0, 100), Region("chr1", 150, 300),
+                   Region("chr1", 350, 400), Region("chr1", 500, 2000)]
+        assert merge_regions(regions, max_gap=100) == [
+            (0, 2000, [0, 1, 2, 3])]
+        assert merge_regions(regions, max_gap=100, max_length=300) == [
+            (0, 300, [0, 1]), (350, 400, [2]), (500, 2000, [3])]
@@ -8,10 +8,14 @@ test_variation
 
 from os.path import realpath, join, dirname
 
+import numpy as np
 import pytest
 import vcf
 
-from afplot.variation import get_variant_type, get_all_allele_freqs, get_distance_to_exp
+from afplot.variation import get_variant_type, get_all_allele_freqs, get_distance_to_exp, \
+    CALL_TYPES, records_to_arrays, get_batch_stats, get_all_allele_freqs_batch, \
+    get_variant_type_batch, get_distance_to_exp_batch, build_call_arrays, \
+    record_passed, is_snv, CallFilter, filter_calls
 
 mini_vcf = join(dirname(realpath(__file__)), "data/mini.vcf")
 
@@ -44,3 +48,66 @@ class TestVariation(object):
         assert get_distance_to_exp(vcf_records[2], "SAMPLE1") == [(50.0/85)-0.5, 0.5-(35.0/85)]
         assert get_distance_to_exp(vcf_records[3], "SAMPLE1") == [0, 0]
         assert get_distance_to_exp(vcf_records[4], "SAMPLE1") == []
+
+    def test_batch_matches_scalar(self, vcf_records):
+        arrays = records_to_arrays(vcf_records, "SAMPLE1")
+        freqs, types, dists = get_batch_stats(arrays)
+        for i, record in enumerate(vcf_records):
+            n = arrays.n_ad[i]
+            assert list(freqs[i, :n]) == get_all_allele_freqs(record,
+                                                              "SAMPLE1")
+            assert CALL_TYPES[types[i]] == get_variant_type(record,
+                                                            "SAMPLE1")
+            assert list(dists[i, :n]) == get_distance_to_exp(record,
+                                                             "SAMPLE1")
+
+    def test_batch_matrix_input(self):
+        ad = np.array([[10, 10, 0], [0, 5, 15], [4, 0, 0]])
+        n_ad = np.array([3, 3, 2])
+        gt = np.array([[0, 1], [1, 2], [-1, -1]])
+        gq = np.array([99, 99, 99])
+        freqs = get_all_allele_freqs_batch(ad, n_ad)
+        types = get_variant_type_batch(gt, gq)
+        dists = get_distance_to_exp_batch(freqs, gt, types)
+        assert [CALL_TYPES[x] for x in types] == ["het", "het", "no_call"]
+        assert list(freqs[2, :2]) == [1.0, 0.0]
+        assert list(dists[0]) == [0.0, 0.0, 0.0]
+        assert list(dists[1]) == [0.0, 0.25, 0.25]
+        assert list(dists[2]) == [0.0, 0.0, 0.0]
+
+    def test_batch_haploid(self):
+        gt = np.array([[0, 0], [2, 2]])
+        types = get_variant_type_batch(gt, np.array([-1, -1]))
+        assert [CALL_TYPES[x] for x in types] == ["hom_ref", "hom_alt"]
+
+    def test_record_passed(self):
+        assert record_passed([])  # PyVCF
+        assert record_passed(["PASS"])  # pysam
+        assert not record_passed(None)
+        assert not record_passed(["LowQual"])
+
+    def test_is_snv(self):
+        assert is_snv("A", ["C", "G"])
+        assert is_snv("A", [None])
+        assert not is_snv("AT", ["A"])
+        assert not is_snv("A", ["<DEL>"])
+
+    def test_filter_calls(self):
+        arrays = build_call_arrays(
+            pos=[1, 2, 3, 4], ref_len=[1, 1, 2, 1], n_alleles=[2, 3, 2, 2],
+            ads=[[10, 10], [0, 15, 15], [20, 20], [1, 2]],
+            gts=[[0, 1], [1, 2], [0, 1], [1, 1]], gq=[50, None, 60, 10],
+            passed=[True, True, True, False], snv=[True, True, False, True])
+        assert filter_calls(arrays) is arrays
+        assert filter_calls(arrays, CallFilter()) is arrays
+
+        def kept(**kwargs):
+            return list(filter_calls(arrays, CallFilter(**kwargs)).pos)
+
+        assert kept(min_depth=20) == [1, 2, 3]
+        assert kept(min_gq=20) == [1, 3]
+        assert kept(pass_only=True) == [1, 2, 3]
+        assert kept(call_types=("hom_alt",)) == [4]
+        assert kept(snv_only=True) == [1, 2, 4]
+        assert kept(biallelic_only=True) == [1, 3, 4]
+        assert kept(min_depth=20, snv_only=True, biallelic_only=True) == [1]
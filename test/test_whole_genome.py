@@ -0,0 +1,186 @@
+"""
+test_whole_genome
+~~~~~~~~~~~~~~~~~
+:copyright: (c) 2017 Sander Bollen
+:copyright: (c) 2017 Leiden University Medical Center
+:license: MIT
+"""
+
+from os.path import realpath, join, dirname
+import shutil
+from tempfile import mkdtemp
+
+import numpy as np
+import pandas as pd
+import pysam
+import pytest
+
+from afplot.cache import TableCache
+from afplot.columns import AlleleTable, histograms_from_dataframe
+from afplot.constants import BACKENDS
+from afplot.reader import open_reader
+from afplot.variation import CallFilter
+from afplot.whole_genome import get_array_for_chrom_all, \
+    get_arrays_for_chrom_multi, build_dataframe, build_histograms, clean_df
+
+mini_vcf = join(dirname(realpath(__file__)), "data/mini.vcf.gz")
+multi_vcf = join(dirname(realpath(__file__)), "data/multi.vcf.gz")
+filters_vcf = join(dirname(realpath(__file__)), "data/filters.vcf.gz")
+
+
+BEYOND_HEADER = """##fileformat=VCFv4.1
+##FORMAT=<ID=AD,Number=.,Type=Integer,Description="Allelic depths">
+##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">
+##contig=<ID=chr1,length=1000>
+#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tSAMPLE1
+"""
+
+
+@pytest.fixture
+def temp_dir():
+    the_dir = mkdtemp()
+    yield the_dir
+    shutil.rmtree(the_dir, ignore_errors=True)  # teardown
+
+
+class TestWholeGenome(object):
+
+    def test_windows_do_not_overlap(self):
+        reader = open_reader(mini_vcf)
+        full = get_array_for_chrom_all(reader, "chr1", progress=False)
+        # window edges fall in between and exactly on records
+        edges = [None, 100001, 100002, 100003, None]
+        parts = [get_array_for_chrom_all(reader, "chr1", progress=False,
+                                         start=s or 0, end=e)
+                 for s, e in zip(edges[:-1], edges[1:])]
+        joined = AlleleTable.concatenate(parts)
+        assert len(joined) == len(full) == 8
+        assert np.array_equal(joined.pos, full.pos)
+        assert np.array_equal(joined.af, full.af)
+        assert np.array_equal(joined.code, full.code)
+
+    @pytest.mark.parametrize("backend", BACKENDS)
+    def test_records_beyond_header_length(self, temp_dir, backend):
+        path = join(temp_dir, "beyond.vcf")
+        with open(path, "w") as handle:
+            handle.write(BEYOND_HEADER)
+            for pos in (100, 900, 1500):
+                handle.write("chr1\t{0}\t.\tA\tC\t100\tPASS\t.\tGT:AD\t"
+                             "0/1:10,10\n".format(pos))
+        reader = open_reader(pysam.tabix_index(path, preset="vcf"), backend)
+        full = get_array_for_chrom_all(reader, "chr1", progress=False)
+        last = get_array_for_chrom_all(reader, "chr1", progress=False,
+                                       start=400, end=None)
+        assert list(pd.unique(full.pos)) == [100, 900, 1500]
+        assert list(pd.unique(last.pos)) == [900, 1500]
+        args = ([reader], ["a"], ["SAMPLE1"], ["chr1"])
+        chunked = build_dataframe(*args, threads=2, chunk_size=400)
+        assert build_dataframe(*args).equals(chunked)
+
+    def test_chunked_parallel_dataframe(self):
+        reader = open_reader(mini_vcf)
+        sequential = build_dataframe([reader], ["a"], ["SAMPLE1"], ["chr1"])
+        chunked = build_dataframe([reader], ["a"], ["SAMPLE1"], ["chr1"],
+                                  threads=2, chunk_size=50000000)
+        assert sequential.equals(chunked)
+
+    def test_multi_sample_single_pass(self):
+        reader = open_reader(multi_vcf)
+        tables = get_arrays_for_chrom_multi(reader, "chr1",
+                                            ["SAMPLE2", "SAMPLE1"],
+                                            ["b", "a"], progress=False)
+        for table, sample, label in zip(tables, ["SAMPLE2", "SAMPLE1"],
+                                        ["b", "a"]):
+            single = get_array_for_chrom_all(reader, "chr1", label, sample,
+                                             progress=False)
+            assert table.labels == (label, )
+            assert np.array_equal(table.pos, single.pos)
+            assert np.array_equal(table.af, single.af)
+            assert np.array_equal(table.distance, single.distance)
+        assert not np.array_equal(tables[0].af, tables[1].af)
+
+    def test_multi_sample_dataframe(self):
+        reader = open_reader(multi_vcf)
+        df = build_dataframe([reader, reader], ["a", "b"],
+                             ["SAMPLE1", "SAMPLE2"], ["chr1"])
+        assert list(df.label.unique()) == ["a", "b"]
+        assert len(df) == 8 + 10
+
+    def test_streamed_histograms_match_dataframe(self):
+        reader = open_reader(multi_vcf)
+        args = ([reader, reader], ["a", "b"], ["SAMPLE1", "SAMPLE2"],
+                list(reader.contigs.keys()))
+        expected = histograms_from_dataframe(build_dataframe(*args),
+                                             args[3])
+        for threads in (1, 2):
+            hists = build_histograms(*args, threads=threads)
+            assert list(hists.keys()) == list(expected.keys())
+            for key in expected:
+                assert np.array_equal(hists[key].counts,
+                                      expected[key].counts)
+                assert np.allclose(hists[key].grid, expected[key].grid,
+                                   atol=1e-5)
+
+    def test_call_filter(self):
+        reader = open_reader(filters_vcf)
+        call_filter = CallFilter(pass_only=True, min_depth=20)
+        table = get_array_for_chrom_all(reader, "chr1", progress=False,
+                                        call_filter=call_filter)
+        assert list(pd.unique(table.pos)) == [100, 300, 400, 600, 800]
+        call_filter = CallFilter(min_gq=20, call_types=("het",),
+                                 snv_only=True, biallelic_only=True)
+        table = get_array_for_chrom_all(reader, "chr1", progress=False,
+                                        call_filter=call_filter)
+        assert list(pd.unique(table.pos)) == [100, 200, 700]
+        args = ([reader], ["a"], ["SAMPLE1"], ["chr1"])
+        sequential = build_dataframe(*args, call_filter=call_filter)
+        chunked = build_dataframe(*args, threads=2, chunk_size=250,
+                                  call_filter=call_filter)
+        assert sequential.equals(chunked)
+
+    def test_call_filter_cached_separately(self):
+        cache_dir = mkdtemp()
+        try:
+            cache = TableCache(cache_dir)
+            reader = open_reader(filters_vcf)
+            args = ([reader], ["a"], ["SAMPLE1"], ["chr1"])
+            full = build_dataframe(*args, cache=cache)
+            call_filter = CallFilter(pass_only=True)
+            filtered = build_dataframe(*args, cache=cache,
+                                       call_filter=call_filter)
+            assert len(cache.entries()) == 2
+            assert len(filtered) < len(full)
+            assert build_dataframe(*args, cache=cache,
+                                   call_filter=call_filter).equals(filtered)
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    def test_clean_df(self):
+        def reference(df, contigs):
+            tmp_dfs = []
+            for chrom in contigs:
+                t = df[df.chromosome == chrom]
+                for l in pd.unique(df.label):
+                    tt = t[t.label == l]
+                    if not all((x == 0 for x in tt.af)):
+                        tmp_dfs.append(tt)
+            return pd.concat(tmp_dfs)
+
+        rs = np.random.RandomState(1)
+        n = 2000
+        df = pd.DataFrame({
+            "pos": np.arange(n),
+            "af": np.where(rs.uniform(size=n) < 0.5, 0.0,
+                           rs.uniform(size=n)),
+            "label": rs.choice(["het", "hom_ref", "hom_alt"], size=n),
+            "chromosome": rs.choice(["chr1", "chr2", "chr3", "chrM"],
+                                    size=n)
+        })
+        # hom_ref of chr2 is all zero, chrM is not plotted
+        df.loc[(df.chromosome == "chr2") & (df.label == "hom_ref"),
+               "af"] = 0.0
+        contigs = ["chr2", "chr1", "chr3"]
+        cleaned = clean_df(df, contigs)
+        pd.testing.assert_frame_equal(cleaned, reference(df, contigs))
+        assert not ((cleaned.chromosome == "chr2") &
+                    (cleaned.label == "hom_ref")).any()